@@ -21,7 +21,7 @@ class MetricRetentionManager(RetentionManager):
     initial_start: datetime = timezone.now
     timezone: str = settings.TIME_ZONE
     if_not_exists: bool = True
-    drop_created_before: bool = True
+    drop_created_before: Interval = None
 
 
 class Metric(models.Model):
@@ -57,8 +57,8 @@ class MetricMaterializedView(ContinuousAggregateManager):
 
 class MetricCompression(CompressionManager):
     enable: bool = True
-    order_by: Optional[iter] = ["device", "time"]
-    segment_by: Optional[iter] = ["last_temperature"]
+    order_by: Optional[iter] = ["time"]
+    segment_by: Optional[iter] = ["device"]
     chunk_time_interval: Optional[Interval] = Interval("1 hour")
     # compression policy parameters
     schedule_interval: Optional[str] = Interval("2 hours")
@@ -74,7 +74,7 @@ class MetricAggregateRetentionManager(RetentionManager):
     initial_start: datetime = timezone.now
     timezone: str = settings.TIME_ZONE
     if_not_exists: bool = True
-    drop_created_before: bool = True
+    drop_created_before: Interval = None
 
 
 class MetricAggregate(ContinuousAggregateModel):
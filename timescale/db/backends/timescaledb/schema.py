@@ -1,13 +1,29 @@
 import logging
+from datetime import timedelta
+from typing import Dict, NamedTuple, Optional
 
 from django.conf import settings
+from django.db import InternalError, NotSupportedError, transaction
 from django.db.backends.postgresql.schema import DatabaseSchemaEditor
+from django.db.backends.utils import truncate_name
 
-from timescale.db.models.fields import TimescaleDateTimeField
+from timescale.db.models.expressions import Interval, interval_to_timedelta
+from timescale.db.models.fields import TimescaleDateTimeField, get_partition_field
+from timescale.db.models.routing import get_bucket, is_multiple
+from timescale.db.models.utils import select_names
+from timescale.db.models.managers import CompressionManager, ContinuousAggregateManager, RetentionManager
+from timescale.db.models.related import TimescaleRelatedForeignKey
 
 logger = logging.getLogger(__name__)
 
 
+class Hypertable(NamedTuple):
+    """ Metadata of a hypertable as loaded by the schema editor. """
+    schema: str
+    name: str
+    time_column: Optional[str]
+
+
 class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
     sql_is_hypertable = """
         SELECT * FROM timescaledb_information.hypertables  
@@ -27,6 +43,13 @@ class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
         END IF;
         END; $do$
     """
+    sql_hypertables = """
+        SELECT h.hypertable_schema, h.hypertable_name, d.column_name
+        FROM timescaledb_information.hypertables h
+        LEFT JOIN timescaledb_information.dimensions d ON d.hypertable_schema = h.hypertable_schema
+        AND d.hypertable_name = h.hypertable_name AND d.dimension_number = 1
+        WHERE TRUE%(extra_condition)s
+    """
     sql_add_hypertable = """
         SELECT create_hypertable(
         %(table)s, %(partition_column)s, 
@@ -39,9 +62,12 @@ class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
         AS %(definition)s 
         %(with_no_data)s 
     """
+    sql_alter_continuous_aggregate = "ALTER MATERIALIZED VIEW %(table)s SET (%(timescaledb_options)s)"
+    sql_delete_continuous_aggregate = "DROP MATERIALIZED VIEW %(table)s"
+    # every policy argument is rendered as ", name => value" or left out
     sql_add_continuous_aggregate_policy = """
         SELECT add_continuous_aggregate_policy(
-            %(table),
+            %(table)s
             %(start_offset)s
             %(end_offset)s
             %(schedule_interval)s
@@ -50,47 +76,140 @@ class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
             %(if_not_exists)s
         )
     """
+    sql_remove_continuous_aggregate_policy = "SELECT remove_continuous_aggregate_policy(%(table)s, if_exists => true)"
     sql_add_retention_policy = """
         SELECT add_retention_policy(
-            %(table)s, 
+            %(table)s
             %(drop_after)s
             %(schedule_interval)s
             %(initial_start)s
             %(timezone)s
             %(if_not_exists)s
-            %(drop_created_before)
+            %(drop_created_before)s
         )
     """
-    sql_remove_retention_policy = (
-        ""
-    )
+    sql_remove_retention_policy = "SELECT remove_retention_policy(%(table)s, if_exists => true)"
     sql_enable_compression = """
         ALTER TABLE %(table)s SET (timescaledb.compress=%(enable)s%(order_by)s%(segment_by)s%(chunk_time_interval)s)
     """
     sql_disable_compression = "ALTER TABLE %(table)s SET (timescaledb.compress=FALSE)"
+    sql_enable_continuous_aggregate_compression = """
+        ALTER MATERIALIZED VIEW %(table)s SET (timescaledb.compress=%(enable)s%(order_by)s%(segment_by)s)
+    """
+    sql_disable_continuous_aggregate_compression = "ALTER MATERIALIZED VIEW %(table)s SET (timescaledb.compress=FALSE)"
     sql_add_compression_policy = """
         SELECT add_compression_policy(
-            %(table)s, 
+            %(table)s
             %(compress_after)s
             %(schedule_interval)s
             %(initial_start)s
             %(timezone)s
             %(if_not_exists)s
-            %(compress_created_before)
+            %(compress_created_before)s
         )
     """
-    sql_remove_compression_policy = "SELECT remove_compression_policy(%(table)s%(if_exists)s)"
+    sql_remove_compression_policy = "SELECT remove_compression_policy(%(table)s, if_exists => true)"
     sql_decompress_table = "SELECT decompress_chunk(c, true) FROM show_chunks(%(table)s%(older_than)s%(newer_than)s) c"
-    sql_disable_scheduled_job = "SELECT alter_job(%(job_id)s, scheduled=FALSE)"
-    sql_enable_scheduled_job = "SELECT alter_job(%(job_id)s, scheduled=TRUE)"
+    sql_compress_table = "SELECT compress_chunk(c, true) FROM show_chunks(%(table)s%(older_than)s%(newer_than)s) c"
+    sql_decompress_chunk = "SELECT decompress_chunk(%(chunk)s, true)"
+    sql_compress_chunk = "SELECT compress_chunk(%(chunk)s, true)"
+    sql_disable_scheduled_job = "SELECT alter_job(%(job_id)s, scheduled => FALSE)"
+    sql_enable_scheduled_job = "SELECT alter_job(%(job_id)s, scheduled => TRUE)"
+    sql_add_dimension = "SELECT add_dimension(%(table)s, %(column)s, number_partitions => %(number_partitions)s)"
+    sql_set_number_partitions = "SELECT set_number_partitions(%(table)s, %(number_partitions)s, %(column)s)"
+    sql_attach_tablespace = "SELECT attach_tablespace(%(tablespace)s, %(table)s, if_not_attached => true)"
+    sql_detach_tablespace = "SELECT detach_tablespace(%(tablespace)s, %(table)s, if_attached => true)"
+    sql_create_table_like = "CREATE TABLE %(new_table)s (LIKE %(table)s INCLUDING ALL)"
+    sql_time_range = "SELECT min(%(column)s), max(%(column)s) FROM %(table)s"
+    sql_copy_time_range = """
+        INSERT INTO %(new_table)s SELECT * FROM %(table)s WHERE %(column)s >= %%s AND %(column)s < %%s
+    """
+    sql_copy_tail = "INSERT INTO %(new_table)s SELECT * FROM %(table)s WHERE %(column)s >= %%s"
+    sql_dependent_objects = """
+        SELECT DISTINCT r.ev_class::regclass::text FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.refobjid = %(table)s::regclass AND r.ev_class <> d.refobjid
+        UNION SELECT conrelid::regclass::text FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = %(table)s::regclass AND conrelid <> confrelid
+    """
+    # rows written while the table is copied are logged and replayed on the new table
+    sql_create_change_log = """
+        CREATE UNLOGGED TABLE %(log)s (id bigserial PRIMARY KEY, op text NOT NULL, old_row %(table)s, new_row %(table)s)
+    """
+    sql_create_change_log_function = """
+        CREATE FUNCTION %(function)s() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN
+        INSERT INTO %(log)s (op, old_row, new_row) VALUES (TG_OP, OLD, NEW);
+        RETURN NULL;
+        END $$
+    """
+    sql_create_change_log_trigger = """
+        CREATE TRIGGER %(function)s AFTER INSERT OR UPDATE OR DELETE ON %(table)s
+        FOR EACH ROW EXECUTE FUNCTION %(function)s()
+    """
+    sql_last_change = "SELECT max(id) FROM %(log)s"
+    # replaying a change deletes both versions of the row by key and inserts the new one, so it can be replayed twice
+    sql_replay_changes = """
+        DO $do$ DECLARE change record; BEGIN
+        FOR change IN SELECT * FROM %(log)s WHERE id <= %(last)s ORDER BY id LOOP
+            DELETE FROM %(new_table)s WHERE (%(key)s) IN ((%(old_key)s), (%(new_key)s));
+            IF change.op <> 'DELETE' THEN INSERT INTO %(new_table)s SELECT (change.new_row).*; END IF;
+        END LOOP;
+        DELETE FROM %(log)s WHERE id <= %(last)s;
+        END $do$
+    """
+    sql_drop_change_log_function = "DROP FUNCTION %(function)s() CASCADE"
+    sql_drop_change_log = "DROP TABLE %(log)s"
+    sql_lock_table_exclusive = "LOCK TABLE %(table)s IN EXCLUSIVE MODE"
+    sql_drop_table = "DROP TABLE %(table)s"
+    sql_sequences = """
+        SELECT a.attname, a.attidentity, pg_get_serial_sequence(%(table)s, a.attname)
+        FROM pg_attribute a WHERE a.attrelid = %(table)s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+        AND pg_get_serial_sequence(%(table)s, a.attname) IS NOT NULL
+    """
+    sql_set_identity_sequence = "SELECT setval(pg_get_serial_sequence(%(table)s, %(column)s), nextval(%(sequence)s), false)"
+    sql_alter_sequence_owner = "ALTER SEQUENCE %(sequence)s OWNED BY %(table)s.%(column)s"
+    sql_rename_index_if_exists = "ALTER INDEX IF EXISTS %(old_name)s RENAME TO %(new_name)s"
+    sql_create_index_if_not_exists = "CREATE INDEX IF NOT EXISTS %(name)s ON %(table)s (%(columns)s)"
+    sql_create_unique_index_if_not_exists = "CREATE UNIQUE INDEX IF NOT EXISTS %(name)s ON %(table)s (%(columns)s)"
     sql_set_chunk_time_interval = "SELECT set_chunk_time_interval(%(table)s, interval %(interval)s)"
     sql_hypertable_is_in_schema = "hypertable_schema = %(schema_name)s"
+    policy_intervals = {
+        'start_offset', 'end_offset', 'schedule_interval', 'drop_after', 'drop_created_before', 'compress_after',
+        'compress_created_before',
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._hypertables = None
 
     def get_hypertable_db_params(self, model):
         return {'table': self.quote_value(model._meta.db_table), 'extra_condition': self._get_extra_condition()}
 
+    @property
+    def hypertables(self) -> Dict[str, Hypertable]:
+        """
+        Metadata of all hypertables, loaded with a single query on first use and kept for the lifetime of the
+        editor (one migration). Methods of the editor creating, renaming or dropping hypertables update it.
+        """
+        if self._hypertables is None:
+            with self.connection.cursor() as cursor:
+                cursor.execute(self.sql_hypertables % {'extra_condition': self._get_extra_condition('h.')})
+                self._hypertables = {row[1]: Hypertable(*row) for row in cursor.fetchall()}
+        return self._hypertables
+
+    def get_hypertable(self, model) -> Optional[Hypertable]:
+        return self.hypertables.get(model._meta.db_table)
+
+    def _add_hypertable(self, model, field):
+        if self._hypertables is not None:
+            self._hypertables[model._meta.db_table] = Hypertable(
+                getattr(self.connection, 'schema_name', 'public'), model._meta.db_table, field.column)
+
     def _assert_is_hypertable(self, model):
         """ Assert if the table is a hyper table """
+        if not self.collect_sql:
+            if self.get_hypertable(model) is None:
+                raise InternalError(f'assert failed - {model._meta.db_table} should be a hyper table')
+            return
         db_params = self.get_hypertable_db_params(model)
         db_params['error_message'] = self.quote_value(
             f'assert failed - {model._meta.db_table} should be a hyper table')
@@ -99,27 +218,85 @@ class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
 
     def _assert_is_not_hypertable(self, model):
         """ Assert if the table is not a hyper table """
+        if not self.collect_sql:
+            if self.get_hypertable(model) is not None:
+                raise InternalError(f'assert failed - {model._meta.db_table} should not be a hyper table')
+            return
         db_params = self.get_hypertable_db_params(model)
         db_params['error_message'] = self.quote_value(
             f'assert failed - {model._meta.db_table} should not be a hyper table')
         sql = self.sql_assert_is_not_hypertable % db_params
         self.execute(sql)
 
-    def _drop_primary_key(self, model):
+    def _drop_primary_key(self, model, field, create_index=True):
         """
-        Hypertables can't partition if the primary key is not the partition column.
-        So we drop the mandatory primary key django creates.
+        Unique constraints of hypertables must include the partition column. A primary key including it (e.g a
+        CompositePrimaryKey) is kept, otherwise the primary key django creates is dropped and replaced by a unique
+        (pk, time) index, so rows are still found by primary key with an index scan in every chunk.
         """
+        if field in getattr(model._meta, 'pk_fields', [model._meta.pk]):
+            return
         sql = self.sql_delete_constraint % {
             'table': self.quote_name(model._meta.db_table), 'name': self.quote_name(f'{model._meta.db_table}_pkey')}
         self.execute(sql)
+        if create_index:
+            self._create_key_time_index(model, field)
+
+    def _create_key_time_index(self, model, field, table=None):
+        """
+        Unique (pk, time) index of a hypertable, including its space dimensions as TimescaleDB requires.
+        It is named after the model, also when created on `table`, a hypertable replacing the one of the model.
+        """
+        pk_fields = getattr(model._meta, 'pk_fields', [model._meta.pk])
+        if field in pk_fields:
+            return
+        columns = [pk_field.column for pk_field in pk_fields] + [field.column] + [
+            model._meta.get_field(name).column for name, _ in field.partition_by or ()]
+        columns = list(dict.fromkeys(columns))
+        self.execute(self.sql_create_unique_index_if_not_exists % {
+            'name': self.quote_name(self._create_index_name(model._meta.db_table, columns, suffix='_uniq')),
+            'table': self.quote_name(table or model._meta.db_table),
+            'columns': ', '.join(self.quote_name(column) for column in columns),
+        })
+
+    def _create_time_join_indexes(self, model, field):
+        """
+        Index both sides of the (key, time) join of a TimescaleRelatedForeignKey: (fk, time) on the referencing
+        table and the unique (pk, time) index on the referenced hypertable.
+        """
+        time_field = get_partition_field(model) or model._meta.get_field('time')
+        columns = [field.column, time_field.column]
+        self.execute(self.sql_create_index_if_not_exists % {
+            'name': self.quote_name(self._create_index_name(model._meta.db_table, columns, suffix='_time')),
+            'table': self.quote_name(model._meta.db_table),
+            'columns': ', '.join(self.quote_name(column) for column in columns),
+        })
+        related_model = field.remote_field.model
+        partition_field = get_partition_field(related_model)
+        if partition_field is not None:
+            self._create_key_time_index(related_model, partition_field)
+
+    def _replace_key_index(self, model, field):
+        """ Replace the single column index django created for a foreign key by the (key, time) join indexes. """
+        self.execute(self.sql_delete_index % {
+            'name': self.quote_name(self._create_index_name(model._meta.db_table, [field.column]))})
+        self._create_time_join_indexes(model, field)
+
+    def _restore_key_index(self, model, field):
+        """ Undo _replace_key_index, the unique (pk, time) index of the referenced hypertable is kept. """
+        columns = [field.column, (get_partition_field(model) or model._meta.get_field('time')).column]
+        self.execute(self.sql_create_index_if_not_exists % {
+            'name': self.quote_name(self._create_index_name(model._meta.db_table, [field.column])),
+            'table': self.quote_name(model._meta.db_table),
+            'columns': self.quote_name(field.column),
+        })
+        self.execute(self.sql_delete_index % {
+            'name': self.quote_name(self._create_index_name(model._meta.db_table, columns, suffix='_time'))})
 
     def _create_hypertable(self, model, field, should_migrate=False):
         """ Create the hypertable with the partition column being the field. """
         # assert that the table is not already a hypertable
         self._assert_is_not_hypertable(model)
-        # drop primary key of the table
-        self._drop_primary_key(model)
         db_params = {
             'partition_column': self.quote_value(field.column),
             'interval': self.quote_value(field.interval),
@@ -127,11 +304,189 @@ class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
             'migrate': "true" if should_migrate else "false"
         }
         if should_migrate and getattr(settings, "TIMESCALE_MIGRATE_HYPERTABLE_WITH_FRESH_TABLE", False):
-            # TODO migrate with fresh table [https://github.com/schlunsen/django-timescaledb/issues/16]
-            raise NotImplementedError()
+            self._create_hypertable_with_fresh_table(model, field)
         else:
+            # drop primary key of the table
+            self._drop_primary_key(model, field)
             sql = self.sql_add_hypertable % db_params
             self.execute(sql)
+            self._add_dimensions(model, field)
+        self._add_hypertable(model, field)
+
+    def _add_dimensions(self, model, field, table=None, old_field=None):
+        """ Add the space dimensions and tablespaces of the partition field missing from old_field. """
+        table = self.quote_value(table or model._meta.db_table)
+        old_partitions = dict(old_field.partition_by) if old_field is not None else {}
+        for name, number_partitions in field.partition_by:
+            params = {
+                'table': table,
+                'column': self.quote_value(model._meta.get_field(name).column),
+                'number_partitions': int(number_partitions),
+            }
+            if name not in old_partitions:
+                self.execute(self.sql_add_dimension % params)
+            elif old_partitions[name] != number_partitions:
+                self.execute(self.sql_set_number_partitions % params)
+        old_tablespaces = old_field.tablespaces if old_field is not None else ()
+        for tablespace in field.tablespaces:
+            if tablespace not in old_tablespaces:
+                self.execute(self.sql_attach_tablespace % {'table': table, 'tablespace': self.quote_value(tablespace)})
+
+    def _alter_dimensions(self, model, old_field, new_field):
+        """ Apply changes of the space dimensions and tablespaces of the partition field. """
+        removed = {name for name, _ in old_field.partition_by} - {name for name, _ in new_field.partition_by}
+        if removed:
+            raise NotSupportedError(
+                f'TimescaleDB can not remove the space dimensions {", ".join(sorted(removed))} '
+                f'of {model._meta.db_table}')
+        self._add_dimensions(model, new_field, old_field=old_field)
+        for tablespace in old_field.tablespaces:
+            if tablespace not in new_field.tablespaces:
+                self.execute(self.sql_detach_tablespace % {
+                    'table': self.quote_value(model._meta.db_table), 'tablespace': self.quote_value(tablespace)})
+
+    def _create_hypertable_with_fresh_table(self, model, field):
+        """
+        Convert a table holding data by copying it into a new hypertable and swapping the names, instead of
+        create_hypertable(migrate_data => true) rewriting the whole table in one transaction.
+
+        A trigger logs the rows written into the old table from then on. The rows are copied in time ordered
+        windows (TIMESCALE_MIGRATE_HYPERTABLE_BATCH_INTERVAL, the chunk interval by default) each committed on its
+        own, while the old table stays writable. The logged changes are replayed on the new table, then replayed
+        again under an EXCLUSIVE lock (reads are still allowed) before the tables are swapped. Views and foreign
+        keys depending on the table can't be carried over and make the conversion fail before anything is copied.
+        Runs inside a single transaction when the migration is atomic, set `atomic = False` on it to avoid that.
+        The statements depend on the data, so sqlmigrate shows the create_hypertable(migrate_data => true) call.
+        """
+        if self.collect_sql:
+            self._drop_primary_key(model, field)
+            self.execute(self.sql_add_hypertable % {
+                'table': self.quote_value(model._meta.db_table),
+                'partition_column': self.quote_value(field.column),
+                'interval': self.quote_value(field.interval),
+                'migrate': 'true',
+            })
+            self._add_dimensions(model, field)
+            return
+        table = model._meta.db_table
+        max_length = self.connection.ops.max_name_length()
+        new_table = truncate_name(f'{table}_new', max_length)
+        params = {
+            'table': self.quote_name(table), 'new_table': self.quote_name(new_table),
+            'column': self.quote_name(field.column),
+            'log': self.quote_name(truncate_name(f'{table}_changes', max_length)),
+            'function': self.quote_name(truncate_name(f'{table}_log_changes', max_length)),
+        }
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.sql_dependent_objects % {'table': self.quote_value(table)})
+            dependents = [row[0] for row in cursor.fetchall()]
+        if dependents:
+            raise NotSupportedError(
+                f'{table} can not be replaced by a new hypertable while {", ".join(dependents)} depend on it, '
+                f'drop them before the migration and create them again after it')
+        if self.connection.in_atomic_block:
+            logger.warning(
+                f'{table} is converted to a hypertable inside the migration transaction, '
+                f'writes are blocked until it commits')
+        key_columns = [pk_field.column for pk_field in getattr(model._meta, 'pk_fields', [model._meta.pk])]
+        key_columns = list(dict.fromkeys(key_columns + [field.column]))
+        params.update({
+            'key': ', '.join(self.quote_name(column) for column in key_columns),
+            'old_key': ', '.join(f'(change.old_row).{self.quote_name(column)}' for column in key_columns),
+            'new_key': ', '.join(f'(change.new_row).{self.quote_name(column)}' for column in key_columns),
+        })
+        self.execute(self.sql_create_table_like % params)
+        # the old table keeps its primary key until the swap, the new one gets the unique (pk, time) index
+        self._drop_copied_primary_key(model, field, new_table)
+        self.execute(self.sql_add_hypertable % {
+            'table': self.quote_value(new_table),
+            'partition_column': self.quote_value(field.column),
+            'interval': self.quote_value(field.interval),
+            'migrate': 'false',
+        })
+        self._add_dimensions(model, field, new_table)
+        self._create_key_time_index(model, field, new_table)
+        with transaction.atomic(using=self.connection.alias, savepoint=False):
+            self.execute(self.sql_create_change_log % params)
+            self.execute(self.sql_create_change_log_function % params)
+            self.execute(self.sql_create_change_log_trigger % params)
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.sql_time_range % params)
+            start, end = cursor.fetchone()
+        window = interval_to_timedelta(
+            getattr(settings, 'TIMESCALE_MIGRATE_HYPERTABLE_BATCH_INTERVAL', None) or field.interval)
+        first = start
+        while start is not None and start + window <= end:
+            with transaction.atomic(using=self.connection.alias, savepoint=False):
+                self.execute(self.sql_copy_time_range % params, (start, start + window))
+            start += window
+            logger.info(f'copied {table} into {new_table} up to {start} ({(start - first) / (end - first):.0%})')
+        if start is not None:
+            with transaction.atomic(using=self.connection.alias, savepoint=False):
+                self.execute(self.sql_copy_tail % params, (start,))
+        # most changes are replayed while the table is still writable, the lock only waits for the last ones
+        with transaction.atomic(using=self.connection.alias, savepoint=False):
+            self._replay_changes(params)
+        with transaction.atomic(using=self.connection.alias, savepoint=False):
+            self.execute(self.sql_lock_table_exclusive % params)
+            self._replay_changes(params)
+            self.execute(self.sql_drop_change_log_function % params)
+            self.execute(self.sql_drop_change_log % params)
+            self._swap_fresh_table(model, table, new_table)
+        logger.info(f'{table} converted to a hypertable')
+
+    def _drop_copied_primary_key(self, model, field, new_table):
+        """ Drop the primary key LIKE copied to the new table, named by PostgreSQL, unless it includes time. """
+        if field in getattr(model._meta, 'pk_fields', [model._meta.pk]):
+            return
+        with self.connection.cursor() as cursor:
+            constraints = self.connection.introspection.get_constraints(cursor, new_table)
+        for name, constraint in constraints.items():
+            if constraint['primary_key']:
+                self.execute(self.sql_delete_constraint % {
+                    'table': self.quote_name(new_table), 'name': self.quote_name(name)})
+
+    def _replay_changes(self, params):
+        """ Apply the changes logged so far to the new table and remove them from the log. """
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.sql_last_change % params)
+            last = cursor.fetchone()[0]
+        if last is not None:
+            self.execute(self.sql_replay_changes % {**params, 'last': int(last)})
+
+    def _swap_fresh_table(self, model, table, new_table):
+        """ Replace the old table by the new hypertable, keeping sequences, index and foreign key names. """
+        with self.connection.cursor() as cursor:
+            old_indexes = self.connection.introspection.get_constraints(cursor, table)
+            new_indexes = self.connection.introspection.get_constraints(cursor, new_table)
+            cursor.execute(self.sql_sequences % {'table': self.quote_value(table)})
+            sequences = cursor.fetchall()
+        for column, identity, sequence in sequences:
+            params = {'column': self.quote_value(column), 'sequence': self.quote_value(sequence)}
+            if identity:
+                self.execute(self.sql_set_identity_sequence % {'table': self.quote_value(new_table), **params})
+            else:
+                self.execute(self.sql_alter_sequence_owner % {
+                    'sequence': sequence, 'table': self.quote_name(new_table), 'column': self.quote_name(column)})
+        self.execute(self.sql_drop_table % {'table': self.quote_name(table)})
+        self.execute(self.sql_rename_table % {
+            'old_table': self.quote_name(new_table), 'new_table': self.quote_name(table)})
+        for name, definition in new_indexes.items():
+            old_name = next((
+                old_name for old_name, old in old_indexes.items()
+                if old['index'] and not old['primary_key'] and self._same_index(old, definition)), None)
+            if definition['index'] and old_name is not None:
+                old_indexes.pop(old_name)
+                self.execute(self.sql_rename_index_if_exists % {
+                    'old_name': self.quote_name(name), 'new_name': self.quote_name(old_name)})
+        for field in model._meta.local_fields:
+            if field.remote_field and field.db_constraint:
+                self.execute(self._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+
+    @staticmethod
+    def _same_index(index, other):
+        keys = ('columns', 'unique', 'type', 'orders')
+        return all(index.get(key) == other.get(key) for key in keys)
 
     def _set_chunk_time_interval(self, model, field):
         """ Change time interval for hypertable """
@@ -141,57 +496,255 @@ class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
             'table': self.quote_value(model._meta.db_table), 'interval': self.quote_value(field.interval)}
         self.execute(sql)
 
+    def _continuous_aggregate_options(self, manager, names=ContinuousAggregateManager.view_options):
+        # finalized = false creates the deprecated format, the option is only sent when asked for
+        return ', '.join(
+            f'timescaledb.{name} = {self.quote_value(bool(manager.get_setting(name)))}' for name in names
+            if name != 'finalized' or not manager.get_setting(name))
+
     def _create_continuous_aggregate(self, model):
-        definitions = model.continuous_aggregate.create_materialized_view()
-        sql = self.sql_create_continuous_aggregation % {
-            'table': self.quote_value(model._meta.db_table), 'definitions': definitions
-        }
-        self.execute(sql)
+        """ Create the materialized view of the continuous aggregate instead of a table, then its policies. """
+        manager = self._get_manager(model, ContinuousAggregateManager)
+        queryset = manager.create_materialized_view()
+        if queryset is None:
+            raise ValueError(f'{model._meta.label} does not define create_materialized_view()')
+        compiler = queryset.order_by().query.get_compiler(connection=self.connection)
+        sql, params = compiler.as_sql()
+        bucket_name, bucket = get_bucket(compiler.query)
+        self._check_continuous_aggregate_source(model, manager, queryset.model, bucket.source_expressions[0].value)
+        time_column = get_partition_field(model).column
+        columns = [
+            time_column if name == bucket_name else model._meta.get_field(name).column
+            for name in select_names(compiler)
+        ]
+        self.execute(self.sql_create_continuous_aggregation % {
+            'table': self.quote_name(model._meta.db_table),
+            'columns': f' ({", ".join(self.quote_name(column) for column in columns)})',
+            'timescaledb_options': f', {self._continuous_aggregate_options(manager)}',
+            'definition': self.connection.ops.compose_sql(sql, params),
+            'with_no_data': 'WITH NO DATA' if manager.with_no_data else 'WITH DATA',
+        })
+        self._add_policies(model)
+
+    def _check_continuous_aggregate_source(self, model, manager, source, interval):
+        """ A continuous aggregate built on another one must be finalized and roll up whole buckets of it. """
+        source_manager = self._get_manager(source, ContinuousAggregateManager)
+        if source_manager is None:
+            return
+        label, source_label = model._meta.label, source._meta.label
+        if not source_manager.finalized:
+            raise NotSupportedError(f'{source_label} must be finalized to build the continuous aggregate {label} on it')
+        _, source_bucket = get_bucket(source_manager.create_materialized_view().query)
+        source_interval = source_bucket.source_expressions[0].value
+        if not is_multiple(interval, source_interval):
+            raise NotSupportedError(
+                f'the bucket width {interval} of {label} is not a multiple of {source_interval} of {source_label}')
+        end_offset, source_end_offset = manager.end_offset, source_manager.end_offset
+        if isinstance(end_offset, Interval) and isinstance(source_end_offset, Interval) and \
+                interval_to_timedelta(end_offset) < interval_to_timedelta(source_end_offset):
+            logger.warning(
+                f'the refresh policy of {label} ends after the one of {source_label}, '
+                f'its newest buckets are materialized from buckets of {source_label} not materialized yet')
+
+    def _is_continuous_aggregate(self, model):
+        return self._get_manager(model, ContinuousAggregateManager) is not None
 
-    def _enable_compression(self, model):
+    def _enable_compression(self, model, manager=None):
+        manager = manager or self._get_manager(model, CompressionManager)
+        if self._is_continuous_aggregate(model):
+            self.execute(self.sql_enable_continuous_aggregate_compression % {
+                'table': self.quote_name(model._meta.db_table),
+                'enable': self.quote_value(bool(manager.enable)),
+                'order_by': manager.compress_order_by,
+                'segment_by': manager.compress_segment_by,
+            })
+            return
         sql = self.sql_enable_compression % {
-            'table': model._meta.db_table,
-            'enable': self.quote_value(model.compression.enable),
-            'order_by': model.compression.compress_order_by,
-            'segment_by': model.compression.compress_segment_by,
-            'chunk_time_interval': model.compression.compress_chunk_time_interval
+            'table': self.quote_name(model._meta.db_table),
+            'enable': self.quote_value(bool(manager.enable)),
+            'order_by': manager.compress_order_by,
+            'segment_by': manager.compress_segment_by,
+            'chunk_time_interval': manager.compress_chunk_time_interval
         }
         self.execute(sql)
 
     def _disable_compression(self, model):
-        self.execute(self.sql_disable_compression % {'table': model._meta.db_table})
+        if self._is_continuous_aggregate(model):
+            sql = self.sql_disable_continuous_aggregate_compression
+        else:
+            sql = self.sql_disable_compression
+        self.execute(sql % {'table': self.quote_name(model._meta.db_table)})
 
-    def _enable_retention(self, model):
-        sql = self.sql_add_retention_policy % {
+    def _show_chunks_params(self, model, newer_than=None, older_than=None):
+        return {
             'table': self.quote_value(model._meta.db_table),
-            'drop_after': self.quote_value(model.retention.drop_after),
-            'schedule_interval': self.quote_value(model.retention.schedule_interval.raw_sql),
-            'initial_start': self.quote_value(model.retention.initial_start),
-            'timezone': self.quote_value(model.retention.timezone),
-            'if_not_exists': self.quote_value(model.retention.if_not_exists),
-            'drop_created_before': self.quote_value(model.retention.drop_created_before)
+            'older_than': f', older_than => {self.quote_value(older_than)}' if older_than is not None else '',
+            'newer_than': f', newer_than => {self.quote_value(newer_than)}' if newer_than is not None else '',
         }
-        self.execute(sql)
+
+    def _decompress_chunks(self, model, newer_than=None, older_than=None):
+        """ Decompress the chunks of the hypertable with data only in [newer_than, older_than). """
+        self.execute(self.sql_decompress_table % self._show_chunks_params(model, newer_than, older_than))
+
+    def _compress_chunks(self, model, newer_than=None, older_than=None):
+        """ Compress the chunks of the hypertable with data only in [newer_than, older_than). """
+        self.execute(self.sql_compress_table % self._show_chunks_params(model, newer_than, older_than))
+
+    def _chunk_params(self, chunk):
+        return {'chunk': self.quote_value(f'{self.quote_name(chunk.schema)}.{self.quote_name(chunk.name)}')}
+
+    def _decompress_chunk(self, chunk):
+        """ Decompress one chunk, as returned by get_chunks(). """
+        self.execute(self.sql_decompress_chunk % self._chunk_params(chunk))
+
+    def _compress_chunk(self, chunk):
+        """ Compress one chunk, as returned by get_chunks(). """
+        self.execute(self.sql_compress_chunk % self._chunk_params(chunk))
+
+    def _disable_scheduled_job(self, job_id):
+        self.execute(self.sql_disable_scheduled_job % {'job_id': int(job_id)})
+
+    def _enable_scheduled_job(self, job_id):
+        self.execute(self.sql_enable_scheduled_job % {'job_id': int(job_id)})
+
+    @staticmethod
+    def _get_manager(model, manager_class):
+        return next((manager for manager in model._meta.managers if isinstance(manager, manager_class)), None)
+
+    def quote_interval(self, value):
+        """ Quote an interval given as Interval, string or timedelta, integers are kept for integer time columns. """
+        if isinstance(value, Interval):
+            value = value.value
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value)
+        if isinstance(value, timedelta):
+            value = f'{value.total_seconds()} seconds'
+        return f'interval {self.quote_value(str(value))}'
+
+    def _policy_params(self, model, manager, names, nullable=()):
+        params = {'table': self.quote_value(model._meta.db_table)}
+        for name in names:
+            value = manager.get_setting(name)
+            if callable(value):
+                value = value()
+            if value is None:
+                params[name] = f', {name} => NULL' if name in nullable else ''
+            elif name in self.policy_intervals:
+                params[name] = f', {name} => {self.quote_interval(value)}'
+            else:
+                params[name] = f', {name} => {self.quote_value(value)}'
+        return params
+
+    def _add_compression_policy(self, model, manager):
+        if manager.enable and (manager.compress_after is not None or manager.compress_created_before is not None):
+            self.execute(self.sql_add_compression_policy % self._policy_params(
+                model, manager, manager.compression_policy_settings))
+
+    def _remove_compression_policy(self, model):
+        self.execute(self.sql_remove_compression_policy % {'table': self.quote_value(model._meta.db_table)})
+
+    def _add_retention_policy(self, model, manager):
+        if manager.drop_after is not None or manager.drop_created_before is not None:
+            self.execute(self.sql_add_retention_policy % self._policy_params(model, manager, manager.policy_settings))
+
+    def _remove_retention_policy(self, model):
+        self.execute(self.sql_remove_retention_policy % {'table': self.quote_value(model._meta.db_table)})
+
+    def _add_refresh_policy(self, model, manager):
+        if manager.schedule_interval is not None:
+            self.execute(self.sql_add_continuous_aggregate_policy % self._policy_params(
+                model, manager, manager.refresh_policy_settings,
+                nullable=('start_offset', 'end_offset')))
+
+    def _remove_refresh_policy(self, model):
+        self.execute(self.sql_remove_continuous_aggregate_policy % {'table': self.quote_value(model._meta.db_table)})
+
+    def _add_policies(self, model):
+        """ Enable compression and add the compression, retention and refresh policies of the model managers. """
+        compression = self._get_manager(model, CompressionManager)
+        if compression is not None and compression.enable:
+            self._enable_compression(model, compression)
+            self._add_compression_policy(model, compression)
+        retention = self._get_manager(model, RetentionManager)
+        if retention is not None:
+            self._add_retention_policy(model, retention)
+        continuous_aggregate = self._get_manager(model, ContinuousAggregateManager)
+        if continuous_aggregate is not None:
+            self._add_refresh_policy(model, continuous_aggregate)
+
+    def alter_policies(self, from_model, to_model):
+        """ Apply the changes between the compression, retention and refresh policy managers of two model states. """
+        old, new = self._get_manager(from_model, CompressionManager), self._get_manager(to_model, CompressionManager)
+        old_enabled, new_enabled = bool(old and old.enable), bool(new and new.enable)
+        if old != new:
+            if old_enabled:
+                self._remove_compression_policy(to_model)
+            compression_settings = CompressionManager.compression_settings
+            if ((old.get_settings(compression_settings) if old else None)
+                    != (new.get_settings(compression_settings) if new else None)):
+                if new_enabled:
+                    self._enable_compression(to_model, new)
+                elif old_enabled:
+                    self._disable_compression(to_model)
+            if new_enabled:
+                self._add_compression_policy(to_model, new)
+        old, new = self._get_manager(from_model, RetentionManager), self._get_manager(to_model, RetentionManager)
+        if old != new:
+            if old is not None:
+                self._remove_retention_policy(to_model)
+            if new is not None:
+                self._add_retention_policy(to_model, new)
+        old = self._get_manager(from_model, ContinuousAggregateManager)
+        new = self._get_manager(to_model, ContinuousAggregateManager)
+        if old is not None and new is not None:
+            # the other view options can only be set on creation
+            changed = ['materialized_only'] if old.materialized_only != new.materialized_only else []
+            if changed:
+                self.execute(self.sql_alter_continuous_aggregate % {
+                    'table': self.quote_name(to_model._meta.db_table),
+                    'timescaledb_options': self._continuous_aggregate_options(new, changed),
+                })
+        refresh_settings = ContinuousAggregateManager.refresh_policy_settings
+        if (old.get_settings(refresh_settings) if old else None) != (new.get_settings(refresh_settings) if new else None):
+            if old is not None:
+                self._remove_refresh_policy(to_model)
+            if new is not None:
+                self._add_refresh_policy(to_model, new)
 
     def create_model(self, model):
         """ Find TimescaleDateTimeField in the model and use it as partition when creating hypertable """
-        super().create_model(model)
-        if getattr(model, 'compression', False):
-            self._enable_compression(model)
-        if getattr(model, 'continuous_aggregate', False):
+        if self._is_continuous_aggregate(model):
             return self._create_continuous_aggregate(model)
-        if getattr(model, 'retention', False):
-            self._enable_retention(model)
+        super().create_model(model)
         for field in model._meta.local_fields:
             if isinstance(field, TimescaleDateTimeField):
                 self._create_hypertable(model, field)
+                self._add_policies(model)
                 break
+        for field in model._meta.local_fields:
+            if isinstance(field, TimescaleRelatedForeignKey):
+                self._create_time_join_indexes(model, field)
+
+    def delete_model(self, model):
+        if self._is_continuous_aggregate(model):
+            self.execute(self.sql_delete_continuous_aggregate % {'table': self.quote_name(model._meta.db_table)})
+        else:
+            super().delete_model(model)
+        if self._hypertables is not None:
+            self._hypertables.pop(model._meta.db_table, None)
+
+    def alter_db_table(self, model, old_db_table, new_db_table):
+        super().alter_db_table(model, old_db_table, new_db_table)
+        if self._hypertables is not None and old_db_table in self._hypertables:
+            self._hypertables[new_db_table] = self._hypertables.pop(old_db_table)._replace(name=new_db_table)
 
     def add_field(self, model, field):
         """ When adding field to table if it is TimescaleDateTimeField use it to create hypertable """
         super().add_field(model, field)
         if isinstance(field, TimescaleDateTimeField):
             self._create_hypertable(model, field, True)
+        elif isinstance(field, TimescaleRelatedForeignKey):
+            self._create_time_join_indexes(model, field)
 
     def alter_field(self, model, old_field, new_field, strict=False):
         super().alter_field(model, old_field, new_field, strict)
@@ -200,13 +753,20 @@ class TimescaleBaseSchemaEditor(DatabaseSchemaEditor):
         elif isinstance(old_field, TimescaleDateTimeField) and isinstance(new_field, TimescaleDateTimeField) \
                 and old_field.interval != new_field.interval:
             self._set_chunk_time_interval(model, new_field)
+        if isinstance(old_field, TimescaleDateTimeField) and isinstance(new_field, TimescaleDateTimeField) and \
+                (old_field.partition_by, old_field.tablespaces) != (new_field.partition_by, new_field.tablespaces):
+            self._alter_dimensions(model, old_field, new_field)
+        if isinstance(new_field, TimescaleRelatedForeignKey) and (
+                not isinstance(old_field, TimescaleRelatedForeignKey) or old_field.db_index):
+            # the single column index was dropped by django when db_index changed to False
+            self._create_time_join_indexes(model, new_field)
 
-    def _get_extra_condition(self):
+    def _get_extra_condition(self, alias=''):
         extra_condition = ''
         if hasattr(self.connection, 'schema_name'):
             schema = self.sql_hypertable_is_in_schema % {
                 'schema_name': self.quote_value(self.connection.schema_name)}
-            extra_condition = f' AND {schema}'
+            extra_condition = f' AND {alias}{schema}'
         else:
             logger.debug(f'no extra conditions required')
         return extra_condition
@@ -0,0 +1,35 @@
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.operations import AlterModelManagers, CreateModel
+
+from timescale.db.migrations.operations import AlterTimescaleManagers
+from timescale.db.models.managers import ContinuousAggregateManager, PolicyManagerMixin
+
+try:
+    from django.db.migrations.autodetector import OperationDependency
+except ImportError:  # Django < 5.1
+    OperationDependency = None
+
+
+def created_dependency(app_label, model_name):
+    if OperationDependency is None:
+        return app_label, model_name, None, True
+    return OperationDependency(app_label, model_name, None, OperationDependency.Type.CREATE)
+
+
+class TimescaleAutodetector(MigrationAutodetector):
+    """
+    Autodetector emitting AlterTimescaleManagers when the managers of a model define policies, and creating
+    continuous aggregates after the model their view reads.
+    """
+
+    def add_operation(self, app_label, operation, dependencies=None, beginning=False):
+        if isinstance(operation, CreateModel):
+            for _, manager in operation.managers:
+                source = manager.get_source_model() if isinstance(manager, ContinuousAggregateManager) else None
+                if source is not None:
+                    dependencies = list(dependencies or []) + [
+                        created_dependency(source._meta.app_label, source._meta.model_name)]
+        if type(operation) is AlterModelManagers and \
+                any(isinstance(manager, PolicyManagerMixin) for _, manager in operation.managers):
+            operation = AlterTimescaleManagers(name=operation.name, managers=operation.managers)
+        super().add_operation(app_label, operation, dependencies, beginning)
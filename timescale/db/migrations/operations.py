@@ -0,0 +1,47 @@
+from django.db.migrations.operations import AlterModelManagers
+from django.db.migrations.operations.fields import FieldOperation
+
+
+class AlterTimescaleManagers(AlterModelManagers):
+    """
+    AlterModelManagers that also applies the changes of the compression, retention and continuous aggregate
+    refresh policies the managers of the model define.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        to_model = to_state.apps.get_model(app_label, self.name)
+        if self.allow_migrate_model(schema_editor.connection.alias, to_model) and \
+                hasattr(schema_editor, 'alter_policies'):
+            schema_editor.alter_policies(from_state.apps.get_model(app_label, self.name), to_model)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f'Change managers and policies on {self.name}'
+
+
+class ReplaceForeignKeyIndex(FieldOperation):
+    """
+    Replace the single column index of a TimescaleRelatedForeignKey created before it defaulted to
+    db_index=False by the (fk, time) index, and the unique (pk, time) index on the referenced hypertable.
+    The migration state is not changed.
+    """
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model) and \
+                hasattr(schema_editor, '_replace_key_index'):
+            schema_editor._replace_key_index(model, model._meta.get_field(self.name))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model) and \
+                hasattr(schema_editor, '_restore_key_index'):
+            schema_editor._restore_key_index(model, model._meta.get_field(self.name))
+
+    def describe(self):
+        return f'Replace the index of {self.model_name}.{self.name} by the (key, time) join indexes'
@@ -0,0 +1,265 @@
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.utils import truncate_name
+from django.db.migrations import AlterField
+from django.utils import timezone
+
+from timescale.db.models.expressions import interval_to_timedelta
+from timescale.db.models.fields import get_partition_field
+from timescale.db.models.information import ChunkSize, get_chunk_sizes, get_chunks, get_shared_buffers
+
+# intervals recommended chunk intervals are rounded down to
+CHUNK_INTERVALS = [
+    '1 minute', '5 minutes', '10 minutes', '15 minutes', '30 minutes',
+    '1 hour', '2 hours', '3 hours', '4 hours', '6 hours', '8 hours', '12 hours',
+    '1 day', '2 days', '3 days', '7 days', '14 days', '28 days',
+]
+
+
+class ChunkIntervalAdvice(NamedTuple):
+    model: type
+    current: str
+    recommended: str
+    rows_per_second: float
+    row_bytes: float
+    index_bytes_per_row: float
+    bytes_per_second: float
+    target_bytes: int
+    sampled_chunks: int
+
+    def __str__(self):
+        return (
+            f'{self.model._meta.label}: chunk interval {self.current} -> {self.recommended} '
+            f'({self.rows_per_second:.1f} rows/s, {self.row_bytes:.0f} bytes/row + {self.index_bytes_per_row:.0f} '
+            f'index bytes/row, target {self.target_bytes / 2 ** 20:.0f} MiB per chunk, '
+            f'sampled {self.sampled_chunks} chunks)'
+        )
+
+
+def round_chunk_interval(interval: timedelta) -> str:
+    """ Round an interval down to the closest of CHUNK_INTERVALS. """
+    rounded = CHUNK_INTERVALS[0]
+    for candidate in CHUNK_INTERVALS:
+        if interval_to_timedelta(candidate) <= interval:
+            rounded = candidate
+    return rounded
+
+
+def recommend_chunk_interval(
+        model, chunks: List[ChunkSize], memory_bytes: int, memory_fraction: float) -> ChunkIntervalAdvice:
+    """
+    Recommend the interval whose chunks, indexes included, fill `memory_fraction` of `memory_bytes`. With space
+    partitioning, the chunks of one time range are written together and their sizes add up.
+    """
+    if not chunks:
+        raise ValueError(f'{model._meta.label} has no complete uncompressed chunks to sample')
+    ranges = Counter((chunk.range_start, chunk.range_end) for chunk in chunks)
+    oldest = min(ranges)
+    if len(ranges) > 1 and ranges[oldest] < max(ranges.values()):
+        # the sample cut the oldest time range, only some of its partitions were sampled
+        chunks = [chunk for chunk in chunks if (chunk.range_start, chunk.range_end) != oldest]
+        del ranges[oldest]
+    seconds = sum((end - start).total_seconds() for start, end in ranges)
+    rows = sum(max(chunk.rows, 0) for chunk in chunks) or 1
+    bytes_per_second = sum(chunk.total_bytes for chunk in chunks) / seconds
+    target_bytes = int(memory_bytes * memory_fraction)
+    recommended = timedelta(seconds=target_bytes / bytes_per_second) if bytes_per_second else timedelta.max
+    return ChunkIntervalAdvice(
+        model=model,
+        current=get_partition_field(model).interval,
+        recommended=round_chunk_interval(recommended),
+        rows_per_second=rows / seconds,
+        row_bytes=sum(chunk.table_bytes for chunk in chunks) / rows,
+        index_bytes_per_row=sum(chunk.index_bytes for chunk in chunks) / rows,
+        bytes_per_second=bytes_per_second,
+        target_bytes=target_bytes,
+        sampled_chunks=len(chunks),
+    )
+
+
+def advise_chunk_interval(
+        model, using: str = DEFAULT_DB_ALIAS, memory_bytes: Optional[int] = None,
+        memory_fraction: Optional[float] = None, sample: int = 10) -> ChunkIntervalAdvice:
+    """
+    Recommend a chunk interval for the hypertable of the model from the size of its recent chunks, so that
+    the chunks being written, indexes included, fit in a fraction (TIMESCALE_CHUNK_MEMORY_FRACTION, 0.25
+    by default) of memory (shared_buffers by default).
+    """
+    if memory_fraction is None:
+        memory_fraction = getattr(settings, 'TIMESCALE_CHUNK_MEMORY_FRACTION', 0.25)
+    if memory_bytes is None:
+        memory_bytes = get_shared_buffers(using)
+    return recommend_chunk_interval(model, get_chunk_sizes(model, using, sample), memory_bytes, memory_fraction)
+
+
+def alter_chunk_interval_operation(model, interval: str) -> AlterField:
+    """ The migration operation changing the chunk interval of the hypertable of the model. """
+    field = get_partition_field(model)
+    name, path, args, kwargs = field.deconstruct()
+    kwargs['interval'] = interval
+    return AlterField(model_name=model._meta.model_name, name=name, field=field.__class__(*args, **kwargs))
+
+
+# at least this many rows per segment, TimescaleDB compresses up to 1000 rows per segment into one batch
+MIN_ROWS_PER_SEGMENT = 100
+# columns whose rank correlation with time within segments is above this are already in order when sorted by time
+ORDERED_CORRELATION = 0.9
+SEGMENT_BY_TYPES = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveBigIntegerField', 'PositiveSmallIntegerField', 'BooleanField',
+    'CharField', 'TextField', 'SlugField', 'UUIDField', 'ForeignKey', 'OneToOneField',
+}
+
+sql_sample_statistics = "SELECT count(*), {distinct} FROM {scratch}"
+sql_create_scratch_table = "CREATE TABLE {scratch} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+sql_create_scratch_hypertable = "SELECT create_hypertable(%s, %s, chunk_time_interval => interval '100 years')"
+sql_copy_sample = """
+    INSERT INTO {scratch} SELECT * FROM {table} WHERE {column} >= %s AND {column} < %s ORDER BY {column} DESC LIMIT %s
+"""
+# Spearman correlation of a column with time within the segments, from the ranks of both in every segment
+sql_rank_correlation = """
+    SELECT corr(time_rank, value_rank) FROM (
+        SELECT rank() OVER (PARTITION BY {segment_by} ORDER BY {time}) time_rank,
+        rank() OVER (PARTITION BY {segment_by} ORDER BY {column}) value_rank
+        FROM {scratch}
+    ) ranks
+"""
+sql_decompress_scratch = "SELECT decompress_chunk(c, true) FROM show_chunks(%s) c"
+sql_compress_scratch = "SELECT compress_chunk(c, true) FROM show_chunks(%s) c"
+sql_set_compression = """
+    ALTER TABLE {scratch} SET (timescaledb.compress, timescaledb.compress_segmentby = %s,
+    timescaledb.compress_orderby = %s)
+"""
+sql_compression_stats = """
+    SELECT before_compression_total_bytes, after_compression_total_bytes FROM hypertable_compression_stats(%s)
+"""
+
+
+class CompressionCandidate(NamedTuple):
+    segment_by: Tuple[str, ...]
+    order_by: Tuple[str, ...]
+    rows_per_segment: float
+    before_bytes: int
+    after_bytes: int
+    correlation: Optional[float] = None
+
+    @property
+    def ratio(self) -> float:
+        return self.before_bytes / self.after_bytes if self.after_bytes else 0.0
+
+    def __str__(self):
+        return (
+            f'segment_by={list(self.segment_by)} order_by={list(self.order_by)}: ratio {self.ratio:.1f}x '
+            f'({self.before_bytes / 2 ** 20:.1f} MiB -> {self.after_bytes / 2 ** 20:.1f} MiB), '
+            f'{self.rows_per_segment:.0f} rows decompressed per segment filter'
+            + (f', {self.order_by[0]} correlates {self.correlation:.2f} with time' if self.correlation is not None else '')
+        )
+
+
+def get_segment_by_fields(model) -> List:
+    """ Fields that may be used as segment_by, floats, timestamps and documents make poor segments. """
+    time_field = get_partition_field(model)
+    return [
+        field for field in model._meta.concrete_fields
+        if field.get_internal_type() in SEGMENT_BY_TYPES and field is not time_field and not field.primary_key
+    ]
+
+
+def get_candidates(model, rows: int, cardinality: Dict[str, int], max_candidates: int = 8,
+                   correlations: Optional[Dict[Tuple[str, ...], Dict[str, float]]] = None) -> List[tuple]:
+    """
+    Candidate (segment_by, order_by) pairs of field names: no segments, every field with at least
+    MIN_ROWS_PER_SEGMENT rows per value and the pair of the two best, each ordered by time and, for a single
+    segment_by, also by another field then time. With the `correlations` of the fields with time within each
+    segment_by, that field is the least correlated one, fields correlated above ORDERED_CORRELATION are already
+    ordered by time. Without, it is the field with the most values.
+    """
+    time_name = f'-{get_partition_field(model).name}'
+    eligible = sorted(
+        (name for name, distinct in cardinality.items() if 1 < distinct <= rows / MIN_ROWS_PER_SEGMENT),
+        key=lambda name: cardinality[name], reverse=True,
+    )
+    candidates = [((), (time_name,))]
+    for name in eligible:
+        candidates.append(((name,), (time_name,)))
+        others = [other for other in eligible if other != name]
+        if correlations is not None:
+            correlation = correlations.get((name,), {})
+            others = sorted(
+                (other for other in others if abs(correlation.get(other) or 0) < ORDERED_CORRELATION),
+                key=lambda other: abs(correlation.get(other) or 0))
+        if others:
+            candidates.append(((name,), (others[0], time_name)))
+    if len(eligible) > 1 and rows / (cardinality[eligible[0]] * cardinality[eligible[1]]) >= MIN_ROWS_PER_SEGMENT:
+        candidates.append(((eligible[0], eligible[1]), (time_name,)))
+    return candidates[:max_candidates]
+
+
+def get_correlations(cursor, scratch: str, columns: Dict[str, str], time_column: str,
+                     names: List[str], qn) -> Dict[Tuple[str, ...], Dict[str, float]]:
+    """ Rank correlation with time of every field of `names`, within the segments of each other field. """
+    correlations = {}
+    for segment in names:
+        correlations[(segment,)] = {}
+        for name in names:
+            if name == segment:
+                continue
+            cursor.execute(sql_rank_correlation.format(
+                segment_by=qn(columns[segment]), time=qn(time_column), column=qn(columns[name]), scratch=qn(scratch)))
+            correlations[(segment,)][name] = cursor.fetchone()[0]
+    return correlations
+
+
+def analyze_compression(model, using: str = DEFAULT_DB_ALIAS, sample: int = 100000,
+                        max_candidates: int = 8) -> List[CompressionCandidate]:
+    """
+    Measure the compression of candidate segment_by/order_by settings on a sample of the most recent complete
+    chunk of the hypertable of the model. The sample is copied into a scratch hypertable, the correlations of its
+    columns with time within segments pick the order_by candidates, then it is compressed once per candidate and
+    rolled back at the end. Returns the candidates, best compression ratio first.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    time_field = get_partition_field(model)
+    chunks = [chunk for chunk in get_chunks(model, using) if chunk.range_end <= timezone.now()]
+    if not chunks:
+        raise ValueError(f'{model._meta.label} has no complete chunks to sample')
+    chunk = chunks[-1]
+    fields = get_segment_by_fields(model)
+    params = {'table': qn(model._meta.db_table), 'column': qn(time_field.column)}
+    scratch = truncate_name(f'{model._meta.db_table}_compression_analysis', connection.ops.max_name_length())
+    columns = {field.name: field.column for field in model._meta.concrete_fields}
+    results = []
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(sql_create_scratch_table.format(scratch=qn(scratch), **params))
+        cursor.execute(sql_create_scratch_hypertable, (scratch, time_field.column))
+        cursor.execute(
+            sql_copy_sample.format(scratch=qn(scratch), **params), (chunk.range_start, chunk.range_end, sample))
+        distinct = ', '.join(f'count(DISTINCT {qn(field.column)})' for field in fields) or '0'
+        cursor.execute(sql_sample_statistics.format(scratch=qn(scratch), distinct=distinct))
+        rows, *counts = cursor.fetchone()
+        cardinality = {field.name: count for field, count in zip(fields, counts)}
+        eligible = [name for name, distinct in cardinality.items() if 1 < distinct <= rows / MIN_ROWS_PER_SEGMENT]
+        correlations = get_correlations(cursor, scratch, columns, time_field.column, eligible, qn)
+        for segment_by, order_by in get_candidates(model, rows, cardinality, max_candidates, correlations):
+            cursor.execute(sql_decompress_scratch, (scratch,))
+            cursor.execute(sql_set_compression.format(scratch=qn(scratch)), (
+                ','.join(qn(columns[name]) for name in segment_by),
+                ','.join(f'{qn(columns[name.lstrip("-")])} {"DESC" if name.startswith("-") else "ASC"}'
+                         for name in order_by),
+            ))
+            cursor.execute(sql_compress_scratch, (scratch,))
+            cursor.execute(sql_compression_stats, (scratch,))
+            before, after = cursor.fetchone()
+            segments = 1
+            for name in segment_by:
+                segments *= cardinality[name]
+            correlation = correlations.get(segment_by, {}).get(order_by[0]) if len(order_by) > 1 else None
+            results.append(CompressionCandidate(
+                segment_by, order_by, rows / segments, before or 0, after or 0, correlation))
+        transaction.set_rollback(True, using=using)
+    return sorted(results, key=lambda candidate: candidate.ratio, reverse=True)
@@ -0,0 +1,120 @@
+import asyncio
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models.query import ValuesIterable
+
+from timescale.db.models.utils import select_names
+
+try:
+    import psycopg
+    from psycopg import sql
+except ImportError:
+    psycopg = None
+
+try:
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    AsyncConnectionPool = None
+
+# pools and semaphores belong to the event loop they are created on, per database alias
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_connection_kwargs(connection) -> dict:
+    options = connection.settings_dict['OPTIONS']
+    params = connection.get_connection_params()
+    params['cursor_factory'] = psycopg.AsyncCursor if options.get('server_side_binding') else psycopg.AsyncClientCursor
+    return {**params, 'autocommit': True}
+
+
+async def configure(connection, aconnection):
+    """ Apply the time zone and role of a Django connection to an AsyncConnection. """
+    options = connection.settings_dict['OPTIONS']
+    if connection.timezone_name:
+        await aconnection.execute(connection.ops.set_time_zone_sql(), [connection.timezone_name])
+    if options.get('assume_role'):
+        await aconnection.execute(sql.SQL('SET ROLE {}').format(sql.Identifier(options['assume_role'])))
+
+
+async def connect(connection):
+    """
+    Open a psycopg AsyncConnection with the settings of a Django connection,
+    so queries run on the event loop instead of a thread of the sync_to_async pool.
+    """
+    aconnection = await psycopg.AsyncConnection.connect(**get_connection_kwargs(connection))
+    await configure(connection, aconnection)
+    return aconnection
+
+
+@asynccontextmanager
+async def aconnect(connection):
+    """
+    Borrow an AsyncConnection for a Django connection. At most TIMESCALE_ASYNC_MAX_CONNECTIONS (10 by default)
+    are open per event loop and database: with psycopg_pool installed they are pooled and reused, otherwise
+    every query opens its own connection once fewer are open.
+    """
+    max_size = getattr(settings, 'TIMESCALE_ASYNC_MAX_CONNECTIONS', 10)
+    per_loop = _pools.setdefault(asyncio.get_running_loop(), {})
+    if AsyncConnectionPool is not None:
+        pool = per_loop.get(connection.alias)
+        if pool is None:
+            pool = per_loop[connection.alias] = AsyncConnectionPool(
+                kwargs=get_connection_kwargs(connection), min_size=1, max_size=max_size, open=False,
+                configure=lambda aconnection: configure(connection, aconnection),
+                name=f'timescale-{connection.alias}')
+            await pool.open()
+        async with pool.connection() as aconnection:
+            yield aconnection
+        return
+    semaphore = per_loop.setdefault(connection.alias, asyncio.Semaphore(max_size))
+    async with semaphore:
+        async with await connect(connection) as aconnection:
+            yield aconnection
+
+
+async def aiterate(queryset, chunk_size: int = 2000):
+    """
+    Asynchronously iterate a values queryset (time_bucket, time_bucket_gapfill, histogram) over a named cursor
+    on a native psycopg 3 async connection. Other querysets, or psycopg 2, fall back to QuerySet.aiterator().
+    """
+    if psycopg is None or not issubclass(queryset._iterable_class, ValuesIterable):
+        async for row in queryset.aiterator(chunk_size=chunk_size):
+            yield row
+        return
+    queryset._check_time_bound()
+    # cached or real-time rows are merged in Python
+    rows = await sync_to_async(queryset._fetch_merged)()
+    if rows is not None:
+        for row in rows:
+            yield row
+        return
+    queryset = queryset._routed()
+    connection = connections[queryset.db]
+    compiler = queryset.query.get_compiler(queryset.db)
+    try:
+        query, params = compiler.as_sql()
+    except EmptyResultSet:
+        return
+    expressions = [select[0] for select in compiler.select[:compiler.col_count]]
+    names = select_names(compiler)
+    converters = compiler.get_converters(expressions)
+    async with aconnect(connection) as aconnection:
+        # named cursors bind parameters server side, so interpolate them like Django's client side cursor does
+        query = psycopg.AsyncClientCursor(aconnection).mogrify(query, params)
+        async with aconnection.transaction():
+            async with aconnection.cursor(name=f'_timescale_curs_{uuid.uuid4().hex}') as cursor:
+                await cursor.execute(query)
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    if converters:
+                        rows = compiler.apply_converters(rows, converters)
+                    for row in rows:
+                        yield dict(zip(names, row))
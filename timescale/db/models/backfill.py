@@ -0,0 +1,80 @@
+import bisect
+import logging
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.db import connections, transaction
+
+from timescale.db.models.bulk import _copy_batch, get_copy_fields, prepare_rows
+from timescale.db.models.fields import get_partition_field
+from timescale.db.models.information import get_chunks, get_jobs
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_prepared(model, fields, rows, connection, batch_size: int):
+    for position in range(0, len(rows), batch_size):
+        _copy_batch(model, fields, rows[position:position + batch_size], connection)
+
+
+def backfill_rows(model, rows: Iterable, using: str, batch_size: int = 5000,
+                  fields: Optional[Iterable[str]] = None) -> int:
+    """
+    Insert model instances, dicts or tuples into the hypertable of the model, including time ranges whose
+    chunks are already compressed. Rows are grouped by the time range of the compressed chunks they fall in,
+    the compressed chunks of every range are decompressed, loaded with COPY and compressed again in its own
+    transaction, while the compression policy is paused. Other rows are copied in one go. All rows are held in
+    memory. Returns the number of rows inserted.
+    """
+    connection = connections[using]
+    fields = get_copy_fields(model, fields)
+    time_field = get_partition_field(model)
+    if time_field is None:
+        raise ValueError(f'{model._meta.label} is not a hypertable, it has no TimescaleDateTimeField')
+    if time_field not in fields:
+        raise ValueError(f'{time_field.name} must be copied to backfill {model._meta.label}')
+    index = fields.index(time_field)
+    rows = prepare_rows(fields, list(rows), connection)
+    if not rows:
+        return 0
+    times = [row[index] for row in rows]
+    # only the chunks compressed before the backfill are compressed again, e.g. not other space partitions
+    chunks = {}
+    for chunk in get_chunks(model, using, min(times), max(times) + timedelta(microseconds=1)):
+        if chunk.is_compressed:
+            chunks.setdefault((chunk.range_start, chunk.range_end), []).append(chunk)
+    ranges = sorted(chunks)
+    starts = [start for start, _ in ranges]
+    compressed = {time_range: [] for time_range in ranges}
+    uncompressed = []
+    for row in rows:
+        position = bisect.bisect_right(starts, row[index]) - 1
+        if position >= 0 and row[index] < ranges[position][1]:
+            compressed[ranges[position]].append(row)
+        else:
+            uncompressed.append(row)
+
+    with transaction.atomic(using=using, savepoint=False):
+        _copy_prepared(model, fields, uncompressed, connection, batch_size)
+    if not ranges:
+        return len(rows)
+    jobs = [job for job in get_jobs(model, using, 'policy_compression') if job.scheduled]
+    with connection.schema_editor(atomic=False) as editor:
+        for job in jobs:
+            editor._disable_scheduled_job(job.job_id)
+        try:
+            for (start, end), chunk_rows in compressed.items():
+                with transaction.atomic(using=using, savepoint=False):
+                    for chunk in chunks[(start, end)]:
+                        editor._decompress_chunk(chunk)
+                    _copy_prepared(model, fields, chunk_rows, connection, batch_size)
+                    for chunk in chunks[(start, end)]:
+                        editor._compress_chunk(chunk)
+                logger.info(f'backfilled {len(chunk_rows)} rows into compressed chunks of '
+                            f'{model._meta.db_table} from {start} to {end}')
+        finally:
+            # pausing the jobs is rolled back with a failed outer transaction
+            if not connection.needs_rollback:
+                for job in jobs:
+                    editor._enable_scheduled_job(job.job_id)
+    return len(rows)
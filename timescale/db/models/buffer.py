@@ -0,0 +1,171 @@
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import connections
+
+from timescale.db.models.bulk import copy_rows
+
+logger = logging.getLogger(__name__)
+
+
+class _Marker:
+    """ Queued behind the rows to write before it, set once they are written. """
+    def __init__(self, stop: bool = False):
+        self.stop = stop
+        self.written = threading.Event()
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer for model instances, dicts or tuples, shared by threads and coroutines. A worker thread
+    writes the queued rows with COPY on its own connection, once `max_rows` are queued or `interval` seconds after
+    the first row of a batch. Producers block while `max_pending` rows wait, and the rows left are written when
+    the buffer is closed or the interpreter exits. Like bulk_copy, no signals are sent. Rows of a failed batch are
+    logged and dropped.
+    """
+    def __init__(self, model, using: str, max_rows: int = 1000, interval: float = 1.0, max_pending: int = 100000,
+                 fields: Optional[Iterable[str]] = None):
+        self.model = model
+        self.using = using
+        self.max_rows = max_rows
+        self.interval = interval
+        self.fields = fields
+        self.written = 0
+        self.failed = 0
+        self.closed = False
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        # producers putting outside the lock, the stop marker is queued once there are none left
+        self._producers = 0
+        self._idle = threading.Condition(self._lock)
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start(self):
+        # called with the lock held, so no row is queued once the buffer is closed
+        if self.closed:
+            raise RuntimeError(f'the write buffer of {self.model._meta.label} is closed')
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=f'timescale-buffer-{self.model._meta.db_table}', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _enqueue(self, item, block: bool = True, timeout: Optional[float] = None):
+        # the lock is only held to register the producer, never while waiting on a full queue
+        with self._lock:
+            self._start()
+            self._producers += 1
+        try:
+            self._queue.put(item, block, timeout)
+        finally:
+            with self._lock:
+                self._producers -= 1
+                if not self._producers:
+                    self._idle.notify_all()
+
+    def put(self, row, block: bool = True, timeout: Optional[float] = None):
+        """ Queue a row, waiting while the buffer is full. Raises queue.Full when it is still full after timeout. """
+        self._enqueue(row, block, timeout)
+
+    async def aput(self, row, timeout: Optional[float] = None):
+        """ Coroutine version of put(), only waiting on a thread while the buffer is full. """
+        try:
+            self.put(row, block=False)
+        except queue.Full:
+            await asyncio.to_thread(self.put, row, timeout=timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """ Write the rows queued so far, returns False when they are not written within timeout. """
+        with self._lock:
+            if self._thread is None:
+                return True
+            if not self._thread.is_alive():
+                return self.closed
+            stopping = self.closed
+        if stopping:
+            # the worker stops once it has written the rows left
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        marker = _Marker()
+        try:
+            self._enqueue(marker)
+        except RuntimeError:
+            # closed meanwhile
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return marker.written.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """ Write the rows left and stop the worker thread, rows can't be queued afterwards. """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self._thread is None:
+                return
+            atexit.unregister(self.close)
+            while self._producers:
+                self._idle.wait()
+        # no producer is left and none can start, the stop marker is the last item queued
+        self._queue.put(_Marker(stop=True))
+        self._thread.join(timeout)
+
+    def _collect(self) -> Tuple[list, Optional[_Marker]]:
+        batch, deadline = [], None
+        while len(batch) < self.max_rows:
+            try:
+                row = self._queue.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if isinstance(row, _Marker):
+                return batch, row
+            batch.append(row)
+            if deadline is None:
+                deadline = time.monotonic() + self.interval
+        return batch, None
+
+    def _write(self, batch: list):
+        try:
+            self.written += copy_rows(self.model, batch, self.using, len(batch), self.fields)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception(f'dropped {len(batch)} buffered rows of {self.model._meta.db_table}')
+            connections[self.using].close_if_unusable_or_obsolete()
+
+    def _run(self):
+        try:
+            while True:
+                batch, marker = self._collect()
+                if batch:
+                    self._write(batch)
+                if marker is not None:
+                    marker.written.set()
+                    if marker.stop:
+                        break
+        finally:
+            # the connection of the worker thread
+            connections[self.using].close()
+
+
+_buffers: Dict[Tuple, WriteBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(model, using: str, **options) -> WriteBuffer:
+    """ The write buffer of a model on a database, created with `options` on first use or once closed. """
+    with _buffers_lock:
+        buffer = _buffers.get((model, using))
+        if buffer is None or buffer.closed:
+            buffer = _buffers[(model, using)] = WriteBuffer(model, using, **options)
+    return buffer
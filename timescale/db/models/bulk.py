@@ -0,0 +1,243 @@
+from datetime import date, datetime, time
+from io import StringIO
+from itertools import islice
+from typing import Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.backends.utils import truncate_name
+
+from timescale.db.models.expressions import interval_to_timedelta
+from timescale.db.models.fields import get_chunk_number, get_partition_field
+
+NOT_PROVIDED = object()
+
+
+def get_copy_fields(model, fields: Optional[Iterable[str]] = None) -> List:
+    """ Return the concrete fields written by COPY, skipping the auto generated primary key. """
+    opts = model._meta
+    if fields is not None:
+        return [opts.get_field(name) for name in fields]
+    return [
+        field for field in opts.concrete_fields
+        if field is not opts.auto_field and not getattr(field, 'generated', False)
+    ]
+
+
+def prepare_rows(fields, rows, connection) -> List[tuple]:
+    """
+    Convert a batch of model instances, dicts or tuples into tuples of database values.
+    Tuples must follow the order of `fields`, dicts may be keyed by field name or attname and
+    missing keys fall back to the field default. The per field converters are resolved once per batch.
+    """
+    columns = []
+    for index, field in enumerate(fields):
+        values = []
+        for row in rows:
+            if isinstance(row, dict):
+                value = row.get(field.name, row.get(field.attname, NOT_PROVIDED))
+                if value is NOT_PROVIDED:
+                    value = field.get_default()
+            elif isinstance(row, (tuple, list)):
+                value = row[index]
+            else:
+                value = field.pre_save(row, True)
+            values.append(value)
+        prep = field.get_db_prep_save
+        columns.append([prep(value, connection) for value in values])
+    return list(zip(*columns))
+
+
+def copy_sql(model, fields, connection, binary=False, table: Optional[str] = None) -> str:
+    qn = connection.ops.quote_name
+    return 'COPY %(table)s (%(columns)s) FROM STDIN%(options)s' % {
+        'table': qn(table or model._meta.db_table),
+        'columns': ', '.join(qn(field.column) for field in fields),
+        'options': ' (FORMAT BINARY)' if binary else '',
+    }
+
+
+def get_binary_types(fields, cursor, connection) -> Optional[List[str]]:
+    """ Return the psycopg type names of the fields or None when a field can't be copied in binary format. """
+    if not settings.USE_TZ:
+        # naive datetimes can't be dumped as binary timestamptz
+        return None
+    types = []
+    for field in fields:
+        db_type = field.db_type(connection)
+        if db_type is None:
+            return None
+        name = db_type.split('(')[0].strip()
+        if cursor.connection.adapters.types.get(name) is None:
+            return None
+        types.append(name)
+    return types
+
+
+def _copy_text(value) -> str:
+    """ Format a value for the PostgreSQL COPY text format. """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date, time)):
+        value = value.isoformat()
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def _copy_batch(model, fields, batch, connection, table: Optional[str] = None):
+    with connection.cursor() as cursor:
+        if is_psycopg3:
+            types = get_binary_types(fields, cursor.cursor, connection)
+            with cursor.cursor.copy(copy_sql(model, fields, connection, types is not None, table)) as copy:
+                if types is not None:
+                    copy.set_types(types)
+                for row in batch:
+                    copy.write_row(row)
+        else:
+            buffer = StringIO()
+            for row in batch:
+                buffer.write('\t'.join(_copy_text(value) for value in row))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.cursor.copy_expert(copy_sql(model, fields, connection, table=table), buffer)
+
+
+def copy_rows(model, rows, using: str, batch_size: int = 5000, fields: Optional[Iterable[str]] = None) -> int:
+    """
+    Stream model instances, dicts or tuples into the table of the model with `COPY ... FROM STDIN`.
+    Rows are consumed lazily in batches of `batch_size`, so any iterable or generator can be passed.
+    Like bulk_create, no signals are sent and no primary keys are set on the instances.
+    Returns the number of rows copied.
+    """
+    connection = connections[using]
+    fields = get_copy_fields(model, fields)
+    rows = iter(rows)
+    copied = 0
+    with transaction.atomic(using=using, savepoint=False):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            _copy_batch(model, fields, prepare_rows(fields, batch, connection), connection)
+            copied += len(batch)
+    return copied
+
+
+class UpsertResult(NamedTuple):
+    inserted: int
+    updated: int
+
+
+# xmax is only set on rows that already existed, the counts are computed in the database
+sql_upsert = """
+    WITH upserted AS (
+        INSERT INTO {table} ({columns}) {source}
+        ON CONFLICT ({unique_columns}) DO {action}
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+"""
+# only the written columns, the NOT NULL of an identity primary key would reject every copied row
+sql_create_staging_table = "CREATE TEMPORARY TABLE {staging} AS SELECT {columns} FROM {table} WITH NO DATA"
+sql_drop_staging_table = "DROP TABLE {staging}"
+# PostgreSQL binds at most 65535 parameters per statement
+MAX_PARAMETERS = 65535
+
+
+def split_by_chunk(rows: List[tuple], index: int, chunk_interval, batch_size: int) -> List[List[tuple]]:
+    """ Split rows sorted by time into batches of at most batch_size rows, each within one chunk interval. """
+    batches, batch, current = [], [], None
+    for row in rows:
+        chunk = get_chunk_number(row[index], chunk_interval) if chunk_interval is not None else None
+        if batch and (chunk != current or len(batch) >= batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(row)
+        current = chunk
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def upsert_sql(model, fields, unique_fields, update_fields, connection, source: str) -> str:
+    qn = connection.ops.quote_name
+    if update_fields:
+        action = 'UPDATE SET ' + ', '.join(f'{qn(field.column)} = EXCLUDED.{qn(field.column)}' for field in update_fields)
+    else:
+        action = 'NOTHING'
+    return sql_upsert.format(
+        table=qn(model._meta.db_table),
+        columns=', '.join(qn(field.column) for field in fields),
+        source=source,
+        unique_columns=', '.join(qn(field.column) for field in unique_fields),
+        action=action,
+    )
+
+
+def upsert_rows(model, rows: Iterable, unique_fields: Iterable[str], update_fields: Optional[Iterable[str]],
+                using: str, batch_size: int = 5000, fields: Optional[Iterable[str]] = None,
+                staging_threshold: Optional[int] = None) -> UpsertResult:
+    """
+    Insert model instances, dicts or tuples into the hypertable of the model, updating `update_fields` (every
+    other field by default, none with an empty list) of the rows that conflict on `unique_fields`. Those must
+    match a unique index, which includes the time column on hypertables. Rows repeating a key keep the last
+    one. Rows are sorted by time and written in batches that each stay in one chunk. From `staging_threshold`
+    rows (TIMESCALE_UPSERT_STAGING_THRESHOLD, 100000 by default) they are copied into a temporary table first
+    and upserted from it in one statement. All rows are held in memory.
+    Returns how many rows were inserted and updated.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    fields = get_copy_fields(model, fields)
+    unique_fields = [model._meta.get_field(name) for name in unique_fields]
+    time_field = get_partition_field(model)
+    if time_field is not None and time_field not in unique_fields:
+        raise ValueError(f'unique_fields must include {time_field.name}, unique indexes of hypertables include it')
+    if any(field not in fields for field in unique_fields):
+        raise ValueError('unique_fields must be written')
+    if update_fields is None:
+        update_fields = [field for field in fields if field not in unique_fields]
+    else:
+        update_fields = [model._meta.get_field(name) for name in update_fields]
+    key = [fields.index(field) for field in unique_fields]
+    rows = list({tuple(row[index] for index in key): row for row in prepare_rows(fields, list(rows), connection)}.values())
+    if not rows:
+        return UpsertResult(0, 0)
+    chunk_interval = None
+    if time_field is not None:
+        time_index = fields.index(time_field)
+        rows.sort(key=lambda row: row[time_index])
+        chunk_interval = interval_to_timedelta(time_field.interval)
+    if staging_threshold is None:
+        staging_threshold = getattr(settings, 'TIMESCALE_UPSERT_STAGING_THRESHOLD', 100000)
+
+    inserted = updated = 0
+    with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+        if len(rows) >= staging_threshold:
+            staging = truncate_name(f'{model._meta.db_table}_upsert', connection.ops.max_name_length())
+            columns = ', '.join(qn(field.column) for field in fields)
+            cursor.execute(sql_create_staging_table.format(
+                staging=qn(staging), columns=columns, table=qn(model._meta.db_table)))
+            for position in range(0, len(rows), batch_size):
+                _copy_batch(model, fields, rows[position:position + batch_size], connection, staging)
+            order_by = f' ORDER BY {qn(time_field.column)}' if time_field is not None else ''
+            source = f'SELECT {columns} FROM {qn(staging)}{order_by}'
+            cursor.execute(upsert_sql(model, fields, unique_fields, update_fields, connection, source))
+            inserted, updated = cursor.fetchone()
+            cursor.execute(sql_drop_staging_table.format(staging=qn(staging)))
+            return UpsertResult(inserted, updated)
+        placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        batch_size = min(batch_size, MAX_PARAMETERS // len(fields))
+        for batch in split_by_chunk(rows, time_index if time_field is not None else 0, chunk_interval, batch_size):
+            source = 'VALUES ' + ', '.join([placeholders] * len(batch))
+            cursor.execute(
+                upsert_sql(model, fields, unique_fields, update_fields, connection, source),
+                [value for row in batch for value in row])
+            batch_inserted, batch_updated = cursor.fetchone()
+            inserted += batch_inserted
+            updated += batch_updated
+    return UpsertResult(inserted, updated)
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.core import signing
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import EmptyResultSet
+from django.db.models.expressions import Col
+from django.db.models.query import ValuesIterable
+
+from timescale.db.models.aggregates import GapFillFunction
+from timescale.db.models.expressions import TimeBucket, TimeBucketGapFill
+from timescale.db.models.parallel import sort_rows
+
+logger = logging.getLogger(__name__)
+
+CURSOR_SALT = 'timescale.time_bucket_since'
+
+
+def get_bucket_field(query) -> Optional[Tuple[str, object]]:
+    """ Return the alias of the time_bucket(_gapfill) annotation and the field it buckets, if any. """
+    for name, annotation in query.annotations.items():
+        if isinstance(annotation, (TimeBucket, TimeBucketGapFill)):
+            source = annotation.source_expressions[1]
+            if isinstance(source, Col):
+                return name, source.target
+    return None
+
+
+def is_cacheable(queryset) -> bool:
+    """ Buckets can only be split in closed and open buckets for values querysets grouped by a bucket. """
+    query = queryset.query
+    return (
+        issubclass(queryset._iterable_class, ValuesIterable)
+        and get_bucket_field(query) is not None
+        # last observation carried forward and interpolation depend on buckets before the open one
+        and not any(isinstance(annotation, GapFillFunction) for annotation in query.annotations.values())
+    )
+
+
+def get_cache_key(queryset) -> str:
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    digest = hashlib.sha256(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+    return f'timescale:buckets:{digest}'
+
+
+def split_buckets(rows: List[dict], bucket: str) -> Tuple[List[dict], Optional[object]]:
+    """ Split rows in the closed buckets and the start of the newest (open) bucket. """
+    buckets = [row[bucket] for row in rows if row[bucket] is not None]
+    if not buckets:
+        return [], None
+    newest = max(buckets)
+    return [row for row in rows if row[bucket] is not None and row[bucket] < newest], newest
+
+
+def fetch_cached(queryset, timeout, cache_alias: str) -> List[dict]:
+    """
+    Fetch bucketed rows, reusing the closed buckets cached for the same SQL and parameters and only
+    querying the database from the start of the newest bucket of the previous fetch onwards.
+    The cache entry expires `timeout` seconds after the first fetch, refreshing it does not extend it.
+    """
+    uncached = queryset._chain()
+    uncached._timescale_options.pop('cache', None)
+    # the time bound of the query was already checked
+    uncached._timescale_options['unbounded'] = True
+    # buckets are merged over the whole query, the slice is applied afterwards
+    uncached.query.clear_limits()
+    if not is_cacheable(uncached):
+        logger.debug('%s query can not be cached by bucket', queryset.model._meta.label)
+        return list(uncached)[queryset.query.low_mark:queryset.query.high_mark]
+    try:
+        key = get_cache_key(uncached)
+    except EmptyResultSet:
+        return []
+    bucket, field = get_bucket_field(uncached.query)
+    cache = caches[cache_alias]
+    cached = cache.get(key)
+    if cached is not None and cached[2] is not None and cached[2] <= time.time():
+        cached = None
+    if cached is None:
+        rows = list(uncached)
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = cache.default_timeout
+        expires = None if timeout is None else time.time() + timeout
+    else:
+        closed, watermark, expires = cached
+        tail = uncached.filter(**{f'{field.name}__gte': watermark})
+        rows = sort_rows(closed + [row for row in tail if row[bucket] is not None and row[bucket] >= watermark],
+                         uncached.query.order_by)
+    closed, watermark = split_buckets(rows, bucket)
+    remaining = None if expires is None else expires - time.time()
+    if watermark is not None and (remaining is None or remaining > 0):
+        # buckets that left a window relative to now() are kept until the entry expires
+        cache.set(key, (closed, watermark, expires), remaining)
+    return rows[queryset.query.low_mark:queryset.query.high_mark]
+
+
+def digest_rows(rows: List[dict]) -> str:
+    return hashlib.sha256(repr(sorted(repr(sorted(row.items())) for row in rows)).encode()).hexdigest()
+
+
+def dump_cursor(watermark: datetime, rows: List[dict]) -> str:
+    """ Signed token holding the start of the newest bucket a client received and a digest of its rows. """
+    return signing.dumps({'watermark': watermark.isoformat(), 'digest': digest_rows(rows)}, salt=CURSOR_SALT)
+
+
+def load_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature as error:
+        raise ValueError(f'Invalid cursor {cursor!r}') from error
+    return datetime.fromisoformat(data['watermark']), data['digest']
+
+
+def fetch_since(queryset, field: str, bucket: str, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch the buckets from the newest bucket a client received onwards, leaving that bucket out when
+    its rows did not change, and return them with the cursor for the next poll.
+    """
+    watermark = digest = None
+    if cursor is not None:
+        watermark, digest = load_cursor(cursor)
+        queryset = queryset.filter(**{f'{field}__gte': watermark})
+    rows = list(queryset)
+    if watermark is not None:
+        previous = [row for row in rows if row[bucket] == watermark]
+        if previous and digest_rows(previous) == digest:
+            rows = [row for row in rows if row[bucket] != watermark]
+    _, newest = split_buckets(rows, bucket)
+    if newest is None:
+        return rows, cursor
+    return rows, dump_cursor(newest, [row for row in rows if row[bucket] == newest])
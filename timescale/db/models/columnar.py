@@ -0,0 +1,97 @@
+from datetime import timezone
+from typing import Dict, List, Optional
+
+from django.db import models
+from django.db.models.sql.constants import MULTI
+
+from timescale.db.models.utils import select_names
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def get_dtype(field):
+    """ Numpy dtype used to store the values of a selected expression. """
+    if isinstance(field, models.DateTimeField):
+        return 'datetime64[us]'
+    if isinstance(field, models.DateField):
+        return 'datetime64[D]'
+    if isinstance(field, (models.IntegerField, models.FloatField, models.DecimalField)):
+        return 'float64'
+    return 'object'
+
+
+def _naive_utc(values):
+    """ Numpy has no timezone support, so aware datetimes are stored as naive UTC. """
+    return [
+        value.astimezone(timezone.utc).replace(tzinfo=None) if getattr(value, 'tzinfo', None) else value
+        for value in values
+    ]
+
+
+def to_arrays(queryset, batch_size: int = 10000, size: Optional[int] = None, dtypes: Optional[Dict] = None,
+              rows: Optional[List] = None):
+    """
+    Fetch the rows of the queryset in batches and fill one numpy array per selected column.
+    Arrays are preallocated for `size` rows (or `batch_size` when unknown) and grown geometrically,
+    rows are never turned into dicts or model instances. Rows already fetched for the queryset, e.g. merged
+    from a continuous aggregate and the hypertable, can be given instead.
+    """
+    if np is None:
+        raise ImportError('numpy is required to export querysets to arrays.')
+    compiler = queryset.query.get_compiler(queryset.db)
+    if rows is None:
+        results = compiler.execute_sql(MULTI, chunked_fetch=True, chunk_size=batch_size)
+    else:
+        compiler.setup_query()
+    expressions = [select[0] for select in compiler.select[:compiler.col_count]]
+    names = select_names(compiler)
+    dtypes = [(dtypes or {}).get(name, get_dtype(expression.output_field)) for name, expression in zip(names, expressions)]
+    if rows is None:
+        converters = compiler.get_converters(expressions)
+    else:
+        # fetched rows are converted already
+        results, converters = [[tuple(row[name] for name in names) if isinstance(row, dict) else row
+                                for row in rows]], None
+        size = size or len(rows)
+    capacity = size or batch_size
+    arrays = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+    count = 0
+    for rows in results or ():
+        if converters:
+            rows = list(compiler.apply_converters(rows, converters))
+        end = count + len(rows)
+        if end > capacity:
+            capacity = max(end, capacity * 2)
+            for index, array in enumerate(arrays):
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:count] = array[:count]
+                arrays[index] = grown
+        for array, values in zip(arrays, zip(*rows)):
+            if array.dtype.kind == 'M':
+                values = _naive_utc(values)
+            if array.dtype.kind == 'O':
+                # assign one by one so sequences (e.g. histograms) are not broadcast
+                for offset, value in enumerate(values, start=count):
+                    array[offset] = value
+            else:
+                array[count:end] = values
+        count = end
+    return {name: array[:count] for name, array in zip(names, arrays)}
+
+
+def to_dataframe(queryset, index: Optional[str] = None, **kwargs):
+    """ Build a pandas DataFrame from the columnar export of the queryset. """
+    if pd is None:
+        raise ImportError('pandas is required to export querysets to a DataFrame.')
+    dataframe = pd.DataFrame(to_arrays(queryset, **kwargs))
+    if index is not None:
+        dataframe = dataframe.set_index(index)
+    return dataframe
@@ -1,6 +1,55 @@
+import re
+from datetime import timedelta
+from typing import Tuple, Union
 from django.db import models
 from timescale.db.models.fields import TimescaleDateTimeField
 
+INTERVAL_UNITS = {
+    'microsecond': timedelta(microseconds=1), 'us': timedelta(microseconds=1),
+    'millisecond': timedelta(milliseconds=1), 'ms': timedelta(milliseconds=1),
+    'second': timedelta(seconds=1), 'sec': timedelta(seconds=1), 's': timedelta(seconds=1),
+    'minute': timedelta(minutes=1), 'min': timedelta(minutes=1), 'm': timedelta(minutes=1),
+    'hour': timedelta(hours=1), 'h': timedelta(hours=1),
+    'day': timedelta(days=1), 'd': timedelta(days=1),
+    'week': timedelta(weeks=1), 'w': timedelta(weeks=1),
+}
+MONTH_UNITS = {'month': 1, 'mon': 1, 'year': 12, 'y': 12}
+INTERVAL_PART = re.compile(r'\s*(-?\d+(?:\.\d+)?)\s*([a-z]+)\s*')
+
+
+def parse_interval(interval: Union[str, timedelta, models.Value, 'Interval']) -> Tuple[int, timedelta]:
+    """ Parse an interval like '1 day', '6 hours' or '1 month 2 days' into (months, timedelta). """
+    if isinstance(interval, timedelta):
+        return 0, interval
+    if isinstance(interval, (models.Value, Interval)):
+        interval = interval.value
+    text = str(interval).strip().lower()
+    months, delta, position = 0, timedelta(), 0
+    for match in INTERVAL_PART.finditer(text):
+        if match.start() != position:
+            break
+        amount, unit = match.groups()
+        if unit not in INTERVAL_UNITS and unit not in MONTH_UNITS and unit.endswith('s'):
+            unit = unit[:-1]
+        if unit in MONTH_UNITS and float(amount).is_integer():
+            months += int(float(amount)) * MONTH_UNITS[unit]
+        elif unit in INTERVAL_UNITS:
+            delta += INTERVAL_UNITS[unit] * float(amount)
+        else:
+            break
+        position = match.end()
+    if not text or position != len(text):
+        raise ValueError(f'Invalid interval {interval!r}')
+    return months, delta
+
+
+def interval_to_timedelta(interval: Union[str, timedelta, models.Value, 'Interval']) -> timedelta:
+    """ Convert a fixed length interval to a timedelta, intervals with months or years have no fixed length. """
+    months, delta = parse_interval(interval)
+    if months:
+        raise ValueError(f'Interval {interval!r} has no fixed length')
+    return delta
+
 
 class Interval(models.Func):
     """
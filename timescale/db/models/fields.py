@@ -1,12 +1,51 @@
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
 from django.db.models import DateTimeField
 
+# chunks of timestamptz dimensions are aligned to the unix epoch
+CHUNK_ORIGIN = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 
 class TimescaleDateTimeField(DateTimeField):
-    def __init__(self, *args, interval, **kwargs):
+    """
+    Partition column of a hypertable. `partition_by` adds hash partitioned space dimensions, either one
+    ('device', 4) or several (('device', 4), ('sensor', 2)) (field name, number of partitions) pairs, and
+    `tablespaces` spreads the chunks over the given tablespaces.
+    """
+    def __init__(self, *args, interval, partition_by=None, tablespaces=None, **kwargs):
         self.interval = interval
+        self.partition_by = normalise_partition_by(partition_by)
+        self.tablespaces = tuple(tablespaces or ())
         super().__init__(*args, **kwargs)
 
     def deconstruct(self):
         name, path, args, kwargs = super().deconstruct()
         kwargs['interval'] = self.interval
+        if self.partition_by:
+            kwargs['partition_by'] = self.partition_by
+        if self.tablespaces:
+            kwargs['tablespaces'] = self.tablespaces
         return name, path, args, kwargs
+
+
+def normalise_partition_by(partition_by) -> Tuple[Tuple[str, int], ...]:
+    if not partition_by:
+        return ()
+    if isinstance(partition_by[0], str):
+        partition_by = (partition_by,)
+    return tuple((str(name), int(number_partitions)) for name, number_partitions in partition_by)
+
+
+def get_partition_field(model):
+    """ Return the TimescaleDateTimeField the hypertable of the model is partitioned by, if any. """
+    for field in model._meta.concrete_fields:
+        if isinstance(field, TimescaleDateTimeField):
+            return field
+    return None
+
+
+def get_chunk_number(value: datetime, chunk_interval: timedelta) -> int:
+    """ Number of the chunk interval a datetime falls in, counted from the unix epoch. """
+    origin = CHUNK_ORIGIN if value.tzinfo is not None else CHUNK_ORIGIN.replace(tzinfo=None)
+    return (value - origin) // chunk_interval
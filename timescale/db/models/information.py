@@ -0,0 +1,143 @@
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Chunk(NamedTuple):
+    schema: str
+    name: str
+    range_start: datetime
+    range_end: datetime
+    is_compressed: bool
+
+
+sql_chunks = """
+    SELECT chunk_schema, chunk_name, range_start, range_end, is_compressed
+    FROM timescaledb_information.chunks
+    WHERE hypertable_name = %s{extra_condition}
+    ORDER BY range_start, chunk_name
+"""
+
+
+def hypertable_condition(connection, params: list, column: str = 'hypertable_schema') -> str:
+    """ Restrict information views to the schema of the connection when one is set (e.g. django-tenants). """
+    if hasattr(connection, 'schema_name'):
+        params.append(connection.schema_name)
+        return f' AND {column} = %s'
+    return ''
+
+
+def get_chunks(
+        model, using: str = DEFAULT_DB_ALIAS, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> List[Chunk]:
+    """ Return the chunks of the hypertable of the model, optionally only those overlapping [start, end). """
+    connection = connections[using]
+    params = [model._meta.db_table]
+    extra_condition = hypertable_condition(connection, params)
+    if start is not None:
+        extra_condition += ' AND range_end > %s'
+        params.append(start)
+    if end is not None:
+        extra_condition += ' AND range_start < %s'
+        params.append(end)
+    with connection.cursor() as cursor:
+        cursor.execute(sql_chunks.format(extra_condition=extra_condition), params)
+        return [Chunk(*row) for row in cursor.fetchall()]
+
+
+class Job(NamedTuple):
+    job_id: int
+    proc_name: str
+    scheduled: bool
+
+
+sql_jobs = """
+    SELECT job_id, proc_name, scheduled
+    FROM timescaledb_information.jobs
+    WHERE hypertable_name = %s{extra_condition}
+    ORDER BY job_id
+"""
+
+
+def get_jobs(model, using: str = DEFAULT_DB_ALIAS, proc_name: Optional[str] = None) -> List[Job]:
+    """ Return the background jobs (policies) of the hypertable of the model. """
+    connection = connections[using]
+    params = [model._meta.db_table]
+    extra_condition = hypertable_condition(connection, params)
+    if proc_name is not None:
+        extra_condition += ' AND proc_name = %s'
+        params.append(proc_name)
+    with connection.cursor() as cursor:
+        cursor.execute(sql_jobs.format(extra_condition=extra_condition), params)
+        return [Job(*row) for row in cursor.fetchall()]
+
+
+# end of the materialized buckets of a continuous aggregate (TimescaleDB 2.12+),
+# NULL instead of -infinity when nothing is materialized yet, psycopg can't load infinite datetimes
+sql_watermark = """
+    SELECT NULLIF(
+        _timescaledb_functions.to_timestamp(_timescaledb_functions.cagg_watermark(mat_hypertable_id)),
+        '-infinity'::timestamptz
+    )
+    FROM _timescaledb_catalog.continuous_agg
+    WHERE user_view_name = %s{extra_condition}
+"""
+
+
+def watermark_sql(model, using: str = DEFAULT_DB_ALIAS) -> Tuple[str, list]:
+    connection = connections[using]
+    params = [model._meta.db_table]
+    extra_condition = hypertable_condition(connection, params, 'user_view_schema')
+    return sql_watermark.format(extra_condition=extra_condition), params
+
+
+def get_watermark(model, using: str = DEFAULT_DB_ALIAS) -> Optional[datetime]:
+    """ Return the end of the materialized buckets of the continuous aggregate of the model, None before any. """
+    sql, params = watermark_sql(model, using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class ChunkSize(NamedTuple):
+    name: str
+    range_start: datetime
+    range_end: datetime
+    rows: int
+    table_bytes: int
+    index_bytes: int
+    total_bytes: int
+
+
+sql_chunk_sizes = """
+    SELECT c.chunk_name, c.range_start, c.range_end,
+    (SELECT reltuples::bigint FROM pg_class WHERE oid = format('%%I.%%I', c.chunk_schema, c.chunk_name)::regclass),
+    s.table_bytes, s.index_bytes, s.total_bytes
+    FROM timescaledb_information.chunks c
+    JOIN chunks_detailed_size(%s::regclass) s ON s.chunk_schema = c.chunk_schema AND s.chunk_name = c.chunk_name
+    WHERE c.hypertable_name = %s AND NOT c.is_compressed AND c.range_end <= now(){extra_condition}
+    ORDER BY c.range_start DESC
+    LIMIT %s
+"""
+
+
+def get_chunk_sizes(model, using: str = DEFAULT_DB_ALIAS, limit: int = 10) -> List[ChunkSize]:
+    """ Return the size of the most recent complete, uncompressed chunks of the hypertable of the model. """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    if hasattr(connection, 'schema_name'):
+        table = f'{connection.ops.quote_name(connection.schema_name)}.{table}'
+    params = [table, model._meta.db_table]
+    extra_condition = hypertable_condition(connection, params, 'c.hypertable_schema')
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql_chunk_sizes.format(extra_condition=extra_condition), params)
+        return [ChunkSize(*row) for row in cursor.fetchall()]
+
+
+def get_shared_buffers(using: str = DEFAULT_DB_ALIAS) -> int:
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT pg_size_bytes(current_setting('shared_buffers'))")
+        return cursor.fetchone()[0]
@@ -1,8 +1,9 @@
-from datetime import datetime
-from django.db import models
+from datetime import datetime, timedelta
+from django.db import models, router
+from timescale.db.models.buffer import WriteBuffer, get_buffer
 from timescale.db.models.expressions import Interval
 from timescale.db.models.querysets import TimescaleQuerySet
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple, Union
 
 
 class TimescaleManager(models.Manager):
@@ -16,6 +17,9 @@ class TimescaleManager(models.Manager):
     def time_bucket(self, field, interval):
         return self.get_queryset().time_bucket(field, interval)
 
+    def time_bucket_since(self, field: str, interval: str, cursor: Optional[str] = None, annotations: Optional[dict] = None):
+        return self.get_queryset().time_bucket_since(field, interval, cursor, annotations)
+
     def time_bucket_gapfill(
             self, field: str, interval: str, start: datetime, end: datetime, datapoints: Optional[int] = None):
         return self.get_queryset().time_bucket_gapfill(field, interval, start, end, datapoints)
@@ -23,26 +27,120 @@ class TimescaleManager(models.Manager):
     def histogram(self, field: str, min_value: float, max_value: float, num_of_buckets: int = 5):
         return self.get_queryset().histogram(field, min_value, max_value, num_of_buckets)
 
+    async def atime_bucket(
+            self, field: str, interval: str, annotations: Optional[dict] = None, normalise_datetimes: bool = False):
+        return await self.get_queryset().atime_bucket(field, interval, annotations, normalise_datetimes)
+
+    async def atime_bucket_gapfill(
+            self, field: str, interval: str, start: datetime, end: datetime, datapoints: Optional[int] = None,
+            annotations: Optional[dict] = None, normalise_datetimes: bool = False):
+        return await self.get_queryset().atime_bucket_gapfill(
+            field, interval, start, end, datapoints, annotations, normalise_datetimes)
+
+    async def ahistogram(
+            self, field: str, min_value: float, max_value: float, num_of_buckets: int = 5,
+            annotations: Optional[dict] = None):
+        return await self.get_queryset().ahistogram(field, min_value, max_value, num_of_buckets, annotations)
+
+    def between(self, start: datetime, end: datetime):
+        return self.get_queryset().between(start, end)
+
+    def last(self, interval: Union[str, timedelta, Interval, None] = None):
+        return self.get_queryset().last(interval)
+
+    def real_time(self, enabled: bool = True):
+        return self.get_queryset().real_time(enabled)
+
+    def materialized_only(self):
+        return self.get_queryset().materialized_only()
+
+    def watermark(self) -> Optional[datetime]:
+        return self.get_queryset().watermark()
 
-class ContinuousAggregateManager(TimescaleManager):
+    def bulk_copy(self, rows: Iterable, batch_size: int = 5000, fields: Optional[Iterable[str]] = None):
+        return self.get_queryset().copy_from(rows, batch_size, fields)
+
+    def backfill(self, rows: Iterable, batch_size: int = 5000, fields: Optional[Iterable[str]] = None):
+        return self.get_queryset().backfill(rows, batch_size, fields)
+
+    def bulk_upsert(self, rows: Iterable, unique_fields: List[str], update_fields: Optional[List[str]] = None,
+                    batch_size: int = 5000, fields: Optional[Iterable[str]] = None):
+        return self.get_queryset().bulk_upsert(rows, unique_fields, update_fields, batch_size, fields)
+
+    def buffered(self, using: Optional[str] = None, **options) -> WriteBuffer:
+        """
+        The write-behind buffer of the model, shared by every caller. `options` (max_rows, interval,
+        max_pending, fields) apply when it is created.
+        """
+        return get_buffer(self.model, using or self._db or router.db_for_write(self.model), **options)
+
+
+class PolicyManagerMixin:
+    """
+    Manager configured by class attributes listed in `policy_settings`, keyword arguments override them.
+    The settings are part of deconstruct(), so migrations record them and changes are detected.
+    """
+    policy_settings: Tuple[str, ...] = ()
+
+    def __init__(self, **kwargs):
+        unknown = set(kwargs) - set(self.policy_settings)
+        if unknown:
+            raise TypeError(f'{type(self).__name__} got unexpected settings: {", ".join(sorted(unknown))}')
+        super().__init__()
+        self.__dict__.update(kwargs)
+
+    def get_setting(self, name: str):
+        # read from the class so functions like timezone.now are not bound to the manager
+        return self.__dict__[name] if name in self.__dict__ else getattr(type(self), name)
+
+    def get_settings(self, names: Optional[Iterable[str]] = None) -> dict:
+        return {name: self.get_setting(name) for name in (names or self.policy_settings)}
+
+    def deconstruct(self):
+        as_manager, path, queryset_class, args, kwargs = super().deconstruct()
+        return as_manager, path, queryset_class, args, self.get_settings()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.get_settings() == other.get_settings()
+
+    def __hash__(self):
+        return id(self)
+
+
+class ContinuousAggregateManager(PolicyManagerMixin, TimescaleManager):
     """ Custom manager to define materialized view and refresh policy """
     use_in_migrations = True  # required so it is included in migrations and can be called to generate query for view
     materialized_only = True
     create_group_indexes = False
-    finalized = False
+    finalized = True
+    with_no_data = True
     # continuous aggregate policy
     start_offset: (Interval, int) = None
     end_offset: (Interval, int) = None
     schedule_interval: Interval = None
     initial_start: datetime = None
     timezone: str = None
+    if_not_exists: bool = True
+
+    # options of the materialized view, only materialized_only can be changed after creation
+    view_options = ('materialized_only', 'create_group_indexes', 'finalized')
+    view_settings = view_options + ('with_no_data',)
+    refresh_policy_settings = (
+        'start_offset', 'end_offset', 'schedule_interval', 'initial_start', 'timezone', 'if_not_exists',
+    )
+    policy_settings = view_settings + refresh_policy_settings
 
     def create_materialized_view(self):
         """ define materialized view for continuous aggregation that will produce its parent table """
         pass
 
+    def get_source_model(self):
+        """ The hypertable model, or for hierarchical aggregates the continuous aggregate model, the view reads. """
+        queryset = self.create_materialized_view()
+        return queryset.model if queryset is not None else None
 
-class CompressionManager(models.Manager):
+
+class CompressionManager(PolicyManagerMixin, models.Manager):
     """ custom manager to define compression of table and its policy """
     use_in_migrations = True
     enable: bool = True
@@ -57,34 +155,50 @@ class CompressionManager(models.Manager):
     if_not_exists: Optional[bool] = True
     compress_created_before: Optional[Interval] = None
 
+    compression_settings = ('enable', 'order_by', 'segment_by', 'chunk_time_interval')
+    compression_policy_settings = (
+        'compress_after', 'schedule_interval', 'initial_start', 'timezone', 'if_not_exists',
+        'compress_created_before',
+    )
+    policy_settings = compression_settings + compression_policy_settings
+
+    def _column(self, name):
+        return '"%s"' % self.model._meta.get_field(name).column
+
     @property
     def compress_order_by(self):
-        if self.order_by is None:
+        if not self.order_by:
             return ''
-        order_by = []
-        for order_field in self.order_by:
-            if order_field.startswith('-'):
-                order_field = f'{order_field} ASC'
-            order_by.append(order_field)
-        return ', compress_orderby = ' + ",".join(order_by)
+        order_by = ', '.join(
+            f'{self._column(name[1:])} DESC' if name.startswith('-') else f'{self._column(name)} ASC'
+            for name in self.order_by
+        )
+        return f", timescaledb.compress_orderby = '{order_by}'"
 
     @property
     def compress_segment_by(self):
         if self.segment_by is None:
             return ''
-        return ', compress_segmentby = ' + ",".join(self.segment_by)
+        return f", timescaledb.compress_segmentby = '{', '.join(self._column(name) for name in self.segment_by)}'"
 
     @property
     def compress_chunk_time_interval(self):
         if self.chunk_time_interval is None:
             return ''
-        return f", compress_chunk_time_interval = '{self.chunk_time_interval.value}'"
+        interval = getattr(self.chunk_time_interval, 'value', self.chunk_time_interval)
+        return f", timescaledb.compress_chunk_time_interval = '{interval}'"
 
 
-class RetentionManager(models.Manager):
+class RetentionManager(PolicyManagerMixin, models.Manager):
+    """ custom manager to define the retention policy of the table """
+    use_in_migrations = True
     drop_after: Interval = None
     schedule_interval: Interval = None
     initial_start: datetime = None
     timezone: str = None
     if_not_exists: bool = False
-    drop_created_before: bool = False
+    drop_created_before: Interval = None
+
+    policy_settings = (
+        'drop_after', 'schedule_interval', 'initial_start', 'timezone', 'if_not_exists', 'drop_created_before',
+    )
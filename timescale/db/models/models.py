@@ -1,9 +1,10 @@
-from django.db import models
+from django.db import models, router
 from django.utils import timezone
-from django.db import connection
-from timescale.db.models.fields import TimescaleDateTimeField
+from timescale.db.models.expressions import interval_to_timedelta
+from timescale.db.models.fields import TimescaleDateTimeField, get_partition_field
 from timescale.db.models.managers import TimescaleManager, CompressionManager, ContinuousAggregateManager
 from timescale.db.models.managers import RetentionManager
+from timescale.db.models.refresh import refresh_in_windows
 
 
 class TimescaleModel(models.Model):
@@ -23,6 +24,46 @@ class TimescaleModel(models.Model):
         abstract = True
         required_db_vendor = 'postgresql'
 
+    @classmethod
+    def _get_key_time_field(cls):
+        """ The partition field when it is not part of the primary key, so rows are matched on (pk, time). """
+        field = get_partition_field(cls)
+        if field is None or field in getattr(cls._meta, 'pk_fields', [cls._meta.pk]):
+            return None
+        return field
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        field = cls._get_key_time_field()
+        if field is not None and field.attname in instance.__dict__:
+            instance._saved_time = getattr(instance, field.attname)
+        return instance
+
+    def _save_table(self, *args, **kwargs):
+        updated = super()._save_table(*args, **kwargs)
+        field = self._get_key_time_field()
+        if field is not None:
+            self._saved_time = getattr(self, field.attname)
+        return updated
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # the time the row was saved with lets TimescaleDB exclude the other chunks
+        field = self._get_key_time_field()
+        if field is not None and '_saved_time' in self.__dict__:
+            base_qs = base_qs.filter(**{field.attname: self._saved_time})
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        field = self._get_key_time_field()
+        if field is not None and '_saved_time' in self.__dict__:
+            if from_queryset is None:
+                from_queryset = type(self)._base_manager.db_manager(using, hints={'instance': self})
+            from_queryset = from_queryset.filter(**{field.attname: self._saved_time})
+        super().refresh_from_db(using, fields, from_queryset)
+        if field is not None and field.attname in self.__dict__:
+            self._saved_time = getattr(self, field.attname)
+
 
 class ContinuousAggregateModel(models.Model):
     """ Model to create and query timescaledb continuous aggregates """
@@ -37,16 +78,22 @@ class ContinuousAggregateModel(models.Model):
         abstract = True
         required_db_vendor = 'postgresql'
 
-    def refresh_continuous_aggregate(self, start_datetime=None, end_datetime=None):
+    @classmethod
+    def refresh_continuous_aggregate(cls, start_datetime=None, end_datetime=None, cascade=True, using=None,
+                                     window=None, workers=1, done=(), callback=None):
+        """
+        Refresh the continuous aggregate from start to end in bucket aligned windows, see refresh_in_windows.
+        The continuous aggregates below this one are refreshed first when cascade is set.
+        """
+        using = using or router.db_for_write(cls)
         if end_datetime is None:
             end_datetime = timezone.now()
         if start_datetime is None:
-            interval = self._meta.get_field('time').interval.split(' ')  # turns '6 hours' into ['6', 'hours']
             # needs at least double the time interval to aggregate into buckets
-            start_datetime = end_datetime - timezone.timedelta(**{interval[1]: int(interval[0])*2})
-        cursor = connection.cursor()
-        cursor.execute(
-            "call refresh_continuous_aggregate('%s', '%s', '%s')" %
-            (self._meta.db_table, start_datetime.isoformat(), end_datetime.isoformat())
-        )
-        connection.commit()
+            start_datetime = end_datetime - 2 * interval_to_timedelta(get_partition_field(cls).interval)
+        source = cls.continuous_aggregate.get_source_model()
+        if cascade and source is not None and issubclass(source, ContinuousAggregateModel):
+            source.refresh_continuous_aggregate(
+                start_datetime, end_datetime, using=using, window=window, workers=workers, done=done,
+                callback=callback)
+        return refresh_in_windows(cls, start_datetime, end_datetime, using, window, workers, done, callback)
@@ -0,0 +1,146 @@
+import math
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connections
+from django.db.transaction import TransactionManagementError
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.query import ValuesIterable
+
+from timescale.db.models.aggregates import First, Last
+from timescale.db.models.expressions import TimeBucketGapFill
+from timescale.db.models.fields import get_partition_field
+from timescale.db.models.information import get_chunks
+
+
+def _add(earlier, later):
+    if earlier is None:
+        return later
+    if later is None:
+        return earlier
+    return earlier + later
+
+
+def _min(earlier, later):
+    return min((value for value in (earlier, later) if value is not None), default=None)
+
+
+def _max(earlier, later):
+    return max((value for value in (earlier, later) if value is not None), default=None)
+
+
+# how partial aggregates of consecutive time ranges are merged, the first argument is from the earlier range
+MERGE_FUNCTIONS = {
+    Count: _add,
+    Sum: _add,
+    Min: _min,
+    Max: _max,
+    First: lambda earlier, later: earlier,
+    Last: lambda earlier, later: later,
+}
+
+
+def get_merge_functions(query) -> Dict:
+    """ Return the merge function of every aggregate annotation, raising for aggregates that can't be merged. """
+    merge_functions = {}
+    for name, annotation in query.annotation_select.items():
+        if isinstance(annotation, TimeBucketGapFill):
+            raise ValueError('time_bucket_gapfill queries can not be split into time ranges.')
+        if not annotation.contains_aggregate:
+            continue
+        merge = MERGE_FUNCTIONS.get(type(annotation))
+        if merge is None or getattr(annotation, 'distinct', False):
+            raise ValueError(
+                f'{name} can not be merged across time ranges, only count, sum, min, max, first and last are supported.'
+            )
+        merge_functions[name] = merge
+    return merge_functions
+
+
+def split_time_range(chunks, start: Optional[datetime], end: Optional[datetime], parts: int) -> List[Tuple]:
+    """ Split [start, end) along chunk boundaries into at most `parts` consecutive ranges. """
+    slices = sorted({(chunk.range_start, chunk.range_end) for chunk in chunks})
+    boundaries = sorted({boundary for time_slice in slices for boundary in time_slice})
+    if start is not None:
+        boundaries = [start] + [boundary for boundary in boundaries if boundary > start]
+    if end is not None:
+        boundaries = [boundary for boundary in boundaries if boundary < end] + [end]
+    if len(boundaries) < 2:
+        return []
+    step = math.ceil((len(boundaries) - 1) / parts)
+    edges = boundaries[::step]
+    if edges[-1] != boundaries[-1]:
+        edges.append(boundaries[-1])
+    return list(zip(edges, edges[1:]))
+
+
+def merge_rows(partials: List[List[Dict]], merge_functions: Dict) -> List[Dict]:
+    """ Merge the rows of consecutive time ranges that share the same bucket and group by values. """
+    merged = {}
+    for rows in partials:
+        for row in rows:
+            key = tuple(value for name, value in row.items() if name not in merge_functions)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = row
+                continue
+            for name, merge in merge_functions.items():
+                current[name] = merge(current[name], row[name])
+    return list(merged.values())
+
+
+def sort_rows(rows: List[Dict], ordering) -> List[Dict]:
+    """ Sort merged rows on the ordering of the query, for the columns present in the rows. """
+    ordering = [name for name in ordering if isinstance(name, str) and name.lstrip('-') in (rows[0] if rows else {})]
+    if not ordering and rows and 'bucket' in rows[0]:
+        ordering = ['bucket']
+    for name in reversed(ordering):
+        column = name.lstrip('-')
+        rows.sort(
+            key=lambda row: (row[column] is None, 0 if row[column] is None else row[column]),
+            reverse=name.startswith('-')
+        )
+    return rows
+
+
+def _fetch(tasks: queue.SimpleQueue, partials: list, using: str):
+    """ Fetch sub-queries until none is left, all on the connection of this worker thread. """
+    try:
+        while True:
+            try:
+                index, queryset = tasks.get_nowait()
+            except queue.Empty:
+                return
+            partials[index] = list(queryset)
+    finally:
+        connections[using].close()
+
+
+def execute_parallel(queryset, workers: int = 4, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    Run a values queryset (e.g time_bucket + annotate) as one sub-query per range of chunks on a pool of threads,
+    each with its own database connection, and merge the partial aggregates back in bucket order.
+    The sub-queries only see committed rows, so it can't run inside a transaction of the calling thread.
+    """
+    if not issubclass(queryset._iterable_class, ValuesIterable):
+        raise ValueError('parallel() requires a values() queryset, e.g. time_bucket().annotate().')
+    if connections[queryset.db].in_atomic_block:
+        raise TransactionManagementError(
+            'parallel() can not run inside atomic(), its connections do not see the rows of the transaction.')
+    merge_functions = get_merge_functions(queryset.query)
+    field = get_partition_field(queryset.model)
+    if start is None and end is None:
+        start, end = queryset._timescale_options.get('time_range', (None, None))
+    ranges = split_time_range(get_chunks(queryset.model, queryset.db, start, end), start, end, workers * 4)
+    tasks = queue.SimpleQueue()
+    for index, (range_start, range_end) in enumerate(ranges):
+        tasks.put((index, queryset.filter(**{f'{field.name}__gte': range_start, f'{field.name}__lt': range_end})))
+    partials = [[] for _ in ranges]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_fetch, tasks, partials, queryset.db) for _ in range(min(workers, len(ranges)))]
+        for future in futures:
+            future.result()
+    rows = merge_rows(partials, merge_functions)
+    return sort_rows(rows, queryset.query.order_by)
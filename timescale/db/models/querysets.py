@@ -1,17 +1,283 @@
+import logging
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django.db import models
-from timescale.db.models.expressions import TimeBucket, TimeBucketGapFill
+from django.db.models.expressions import RawSQL
+from django.db.models.sql.where import AND, WhereNode
+from django.utils import timezone
+from timescale.db.models.expressions import Interval, TimeBucket, TimeBucketGapFill, parse_interval
 from timescale.db.models.aggregates import Histogram
-from typing import Dict, Optional
-from datetime import datetime
+from timescale.db.models.aio import aiterate
+from timescale.db.models.backfill import backfill_rows
+from timescale.db.models.bulk import copy_rows, upsert_rows
+from timescale.db.models.cache import fetch_cached, fetch_since
+from timescale.db.models.columnar import to_arrays, to_dataframe
+from timescale.db.models.fields import get_partition_field
+from timescale.db.models.information import get_watermark, watermark_sql
+from timescale.db.models.parallel import execute_parallel, get_merge_functions, merge_rows, sort_rows
+from timescale.db.models.routing import find_plan, get_bucket, plan_query
+from typing import Dict, Iterable, List, Optional, Union
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# lookups on the partition column that TimescaleDB can use to exclude chunks
+TIME_BOUND_LOOKUPS = {'exact', 'in', 'gt', 'gte', 'lt', 'lte', 'range'}
+
+
+class UnboundedTimeRangeError(Exception):
+    """ Raised when a hypertable is queried without any time bound and TIMESCALE_REQUIRE_TIME_BOUND is 'raise'. """
+
+
+def normalise_bucket(row):
+    """ Replace the bucket datetime of a time_bucket row by its isoformat in place. """
+    if isinstance(row, dict) and isinstance(row.get("bucket"), datetime):
+        row["bucket"] = row["bucket"].isoformat()
+    return row
+
+
+def is_time_bounded(node, field) -> bool:
+    """ Check if a where node restricts the partition column, so chunk exclusion can be applied. """
+    if isinstance(node, WhereNode):
+        if node.negated:
+            return False
+        bounded = [is_time_bounded(child, field) for child in node.children]
+        if node.connector == AND:
+            return any(bounded)
+        return bool(bounded) and all(bounded)
+    target = getattr(getattr(node, 'lhs', None), 'target', None)
+    return target == field and getattr(node, 'lookup_name', None) in TIME_BOUND_LOOKUPS
 
 
 class TimescaleQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # timescale specific options that have to survive chaining
+        self._timescale_options = {}
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._timescale_options = {**self._timescale_options}
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._check_time_bound()
+            if self._timescale_options.get('cache'):
+                self._result_cache = fetch_cached(self, *self._timescale_options['cache'])
+            else:
+                plan = self.continuous_aggregate_plan()
+                if plan is not None:
+                    self._result_cache = self._read_plan(plan)
+        super()._fetch_all()
+
+    def iterator(self, chunk_size=None):
+        self._check_time_bound()
+        rows = self._fetch_merged()
+        if rows is not None:
+            return iter(rows)
+        queryset = self._routed()
+        if queryset is not self:
+            return queryset.iterator(chunk_size=chunk_size)
+        return super().iterator(chunk_size=chunk_size)
+
+    def count(self):
+        if self._result_cache is None:
+            plan = self.continuous_aggregate_plan()
+            if plan is not None:
+                if self._timescale_options.get('real_time') is not None:
+                    return len(self._read_plan(plan))
+                return plan.queryset.count()
+        return super().count()
+
+    def exists(self):
+        if self._result_cache is None:
+            plan = self.continuous_aggregate_plan()
+            if plan is not None:
+                if self._timescale_options.get('real_time') is not None:
+                    return bool(self._read_plan(plan))
+                return plan.queryset.exists()
+        return super().exists()
+
+    def _fetch_merged(self) -> Optional[list]:
+        """
+        Rows merged in Python, from the bucket cache or split at the watermark of a continuous aggregate by
+        real_time() or materialized_only(). None when the query is read from one cursor, see _routed().
+        """
+        if self._timescale_options.get('cache'):
+            return fetch_cached(self, *self._timescale_options['cache'])
+        if self._timescale_options.get('real_time') is not None:
+            plan = self.continuous_aggregate_plan()
+            if plan is not None:
+                return self._read_plan(plan)
+        return None
+
+    def _read_plan(self, plan) -> list:
+        """
+        Rows of a query answered from a continuous aggregate. When the freshness asked with real_time() or
+        materialized_only() differs from the mode of the aggregate, the query is split at its watermark:
+        materialized buckets come from the aggregate, newer ones from the hypertable (real-time) or not at all.
+        """
+        real_time = self._timescale_options.get('real_time')
+        if real_time is None or real_time != plan.view.model.continuous_aggregate.materialized_only:
+            return list(plan.queryset)
+        watermark = get_watermark(plan.view.model, self.db)
+        field = get_partition_field(self.model).name
+        unsliced = self._chain()
+        unsliced.query.clear_limits()
+        rows = []
+        if watermark is not None:
+            rows = list(plan_query(unsliced.filter(**{f'{field}__lt': watermark}), plan.view).queryset)
+        if real_time:
+            raw = unsliced.use_continuous_aggregates(False)
+            if watermark is not None:
+                raw = raw.filter(**{f'{field}__gte': watermark})
+            names = [*self.query.extra_select, *self.query.values_select, *self.query.annotation_select]
+            partials = [[{name: row[name] for name in names} for row in rows], list(raw)]
+            if parse_interval(get_bucket(self.query)[1].source_expressions[0].value) == parse_interval(plan.view.interval):
+                # the watermark is aligned to the buckets of the aggregate, every bucket is on one side of it
+                rows = partials[0] + partials[1]
+            else:
+                rows = merge_rows(partials, get_merge_functions(self.query))
+            rows = sort_rows(rows, self.query.order_by)
+        return rows[self.query.low_mark:self.query.high_mark]
+
+    def _routed(self):
+        """ The queryset that is actually executed, the rewrite over a continuous aggregate when one applies. """
+        plan = self.continuous_aggregate_plan()
+        return self if plan is None else plan.queryset
+
+    def continuous_aggregate_plan(self):
+        """
+        Return the ContinuousAggregatePlan used to answer this query from a continuous aggregate, or None when
+        the query runs on the hypertable itself.
+        """
+        # routing is opt-in, globally or per query, choosing real_time() or materialized_only() opts in too
+        enabled = self._timescale_options.get('continuous_aggregates')
+        if enabled is None:
+            enabled = self._timescale_options.get('real_time') is not None or getattr(
+                settings, 'TIMESCALE_CONTINUOUS_AGGREGATE_ROUTING', False)
+        if not enabled:
+            return None
+        plan = find_plan(self)
+        if plan is not None:
+            logger.debug('%s query answered by %s', self.model._meta.label, plan)
+        return plan
+
+    def use_continuous_aggregates(self, enabled: bool = True):
+        """ Enable or disable answering this query from a matching continuous aggregate. """
+        clone = self._chain()
+        clone._timescale_options['continuous_aggregates'] = enabled
+        return clone
+
+    def _is_continuous_aggregate(self) -> bool:
+        from timescale.db.models.managers import ContinuousAggregateManager
+        return isinstance(getattr(self.model, 'continuous_aggregate', None), ContinuousAggregateManager)
+
+    def real_time(self, enabled: bool = True):
+        """
+        Include the buckets not materialized yet when this query is answered from a continuous aggregate,
+        aggregating the raw rows after its watermark, whatever the materialized_only setting of the aggregate.
+        On a continuous aggregate model, only aggregates that are not materialized_only can be read in real-time.
+        """
+        if self._is_continuous_aggregate():
+            if enabled and self.model.continuous_aggregate.materialized_only:
+                raise ValueError(
+                    f'{self.model._meta.label} is materialized_only, query its source model with real_time() instead')
+            return self if enabled else self.materialized_only()
+        clone = self._chain()
+        clone._timescale_options['real_time'] = enabled
+        return clone
+
+    def materialized_only(self):
+        """ Only read materialized buckets, fast but possibly stale, see real_time(). """
+        if not self._is_continuous_aggregate():
+            return self.real_time(False)
+        field = get_partition_field(self.model)
+        sql, params = watermark_sql(self.model, self.db)
+        return self.filter(**{f'{field.name}__lt': RawSQL(sql, params, output_field=field)})
+
+    def watermark(self) -> Optional[datetime]:
+        """
+        End of the materialized buckets of this continuous aggregate model, or of the continuous aggregate
+        answering this query. None when the query is not answered from a continuous aggregate.
+        """
+        if self._is_continuous_aggregate():
+            return get_watermark(self.model, self.db)
+        plan = self.continuous_aggregate_plan()
+        return None if plan is None else get_watermark(plan.view.model, self.db)
+
+    def cache(self, timeout=DEFAULT_TIMEOUT, cache_alias: str = DEFAULT_CACHE_ALIAS):
+        """
+        Cache the closed buckets of this bucketed query in Django's cache framework, keyed on the compiled SQL.
+        Later evaluations of the same query only fetch the newest (open) bucket and the ones after it.
+        """
+        clone = self._chain()
+        clone._timescale_options['cache'] = (timeout, cache_alias)
+        return clone
+
+    def _check_time_bound(self):
+        """ Warn about or refuse queries scanning every chunk, depending on TIMESCALE_REQUIRE_TIME_BOUND. """
+        mode = getattr(settings, 'TIMESCALE_REQUIRE_TIME_BOUND', False)
+        if not mode or self._timescale_options.get('unbounded'):
+            return
+        field = get_partition_field(self.model)
+        if field is None or is_time_bounded(self.query.where, field):
+            return
+        message = f'{self.model._meta.label} is queried without a bound on {field.name}, all chunks will be scanned.'
+        if mode == 'raise':
+            raise UnboundedTimeRangeError(message)
+        logger.warning(message)
+
+    def unbounded(self):
+        """ Allow this query to scan all chunks regardless of TIMESCALE_REQUIRE_TIME_BOUND. """
+        clone = self._chain()
+        clone._timescale_options['unbounded'] = True
+        return clone
+
+    def between(self, start: datetime, end: datetime):
+        """
+        Restrict the query to the half open range [start, end) of the partition column,
+        as plain range predicates TimescaleDB can use to exclude chunks.
+        """
+        field = get_partition_field(self.model)
+        clone = self.filter(**{f'{field.name}__gte': start, f'{field.name}__lt': end})
+        clone._timescale_options['time_range'] = (start, end)
+        return clone
+
+    def last(self, interval: Union[str, timedelta, Interval, None] = None):
+        """
+        Restrict the query to the last interval (e.g '1 day' or a timedelta) of the partition column.
+        Without an interval this is QuerySet.last().
+        """
+        if interval is None:
+            return super().last()
+        field = get_partition_field(self.model)
+        if isinstance(interval, timedelta):
+            start = timezone.now() - interval
+        else:
+            if not isinstance(interval, Interval):
+                interval = Interval(interval)
+            # now() rather than Django's STATEMENT_TIMESTAMP(), TimescaleDB constifies it to exclude chunks at plan time
+            now = models.Func(function='now', output_field=models.DateTimeField())
+            start = models.ExpressionWrapper(now - interval, output_field=models.DateTimeField())
+        return self.filter(**{f'{field.name}__gte': start})
+
     def time_bucket(self, field: str, interval: str, annotations: Dict = None):
         """ Wraps the TimescaleDB time_bucket function into a queryset method. """
         if annotations:
             return self.values(bucket=TimeBucket(field, interval)).order_by('-bucket').annotate(**annotations)
         return self.values(bucket=TimeBucket(field, interval)).order_by('-bucket')
 
+    def time_bucket_since(self, field: str, interval: str, cursor: Optional[str] = None, annotations: Dict = None):
+        """
+        Polling variant of time_bucket for live charts. Returns the buckets that are new or changed since the
+        cursor of the previous call, and the cursor to pass to the next one (None on the first call).
+        Late data for buckets older than the newest one the client received is not detected.
+        """
+        return fetch_since(self.time_bucket(field, interval, annotations), field, 'bucket', cursor)
+
     def time_bucket_gapfill(self, field: str, interval: str, start: datetime, end: datetime, datapoints: Optional[int] = None):
         """ Wraps the TimescaleDB time_bucket_gapfill function into a queryset method. """
         return self.values(bucket=TimeBucketGapFill(field, interval, start, end, datapoints))
@@ -21,10 +287,95 @@ class TimescaleQuerySet(models.QuerySet):
         return self.values(histogram=Histogram(field, min_value, max_value, num_of_buckets))
 
     def to_list(self, normalise_datetimes: bool = False):
+        rows = list(self)
         if normalise_datetimes:
-            normalised = []
-            for b in list(self):
-                b["bucket"] = b["bucket"].isoformat()
-                normalised.append(b)
-            return normalised
-        return list(self)
+            for row in rows:
+                normalise_bucket(row)
+        return rows
+
+    def parallel(self, workers: int = 4, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """
+        Execute the aggregation as sub-queries over ranges of chunks on `workers` threads with separate connections
+        and return the merged rows. Only count, sum, min, max, first and last aggregates can be merged.
+        The time range defaults to the one given to between(), otherwise all chunks are covered.
+        The other connections only see committed rows, so it raises inside atomic().
+        """
+        return execute_parallel(self, workers=workers, start=start, end=end)
+
+    def stream(self, chunk_size: int = 2000, normalise_datetimes: bool = False):
+        """
+        Lazily yield the rows of the queryset, fetched `chunk_size` at a time from a named server-side cursor
+        so memory stays flat regardless of the time range. Buckets are normalised in place.
+        """
+        for row in self.iterator(chunk_size=chunk_size):
+            if normalise_datetimes:
+                normalise_bucket(row)
+            yield row
+
+    def to_arrays(self, batch_size: int = 10000, size: Optional[int] = None, dtypes: Optional[Dict] = None):
+        """
+        Return a dict of numpy arrays, one per selected column, e.g. datetime64 for the bucket and float64
+        for aggregates. Requires numpy.
+        """
+        self._check_time_bound()
+        rows = self._fetch_merged()
+        if rows is not None:
+            return to_arrays(self, batch_size=batch_size, size=size, dtypes=dtypes, rows=rows)
+        return to_arrays(self._routed(), batch_size=batch_size, size=size, dtypes=dtypes)
+
+    def to_dataframe(self, index: Optional[str] = None, batch_size: int = 10000, size: Optional[int] = None):
+        """ Return the columnar export of the queryset as a pandas DataFrame. Requires pandas. """
+        self._check_time_bound()
+        rows = self._fetch_merged()
+        if rows is not None:
+            return to_dataframe(self, index=index, batch_size=batch_size, size=size, rows=rows)
+        return to_dataframe(self._routed(), index=index, batch_size=batch_size, size=size)
+
+    async def astream(self, chunk_size: int = 2000, normalise_datetimes: bool = False):
+        """ Async counterpart of stream(), rows are fetched on a native async connection when psycopg 3 is used. """
+        async for row in aiterate(self, chunk_size=chunk_size):
+            if normalise_datetimes:
+                normalise_bucket(row)
+            yield row
+
+    async def ato_list(self, normalise_datetimes: bool = False, chunk_size: int = 2000):
+        return [row async for row in self.astream(chunk_size=chunk_size, normalise_datetimes=normalise_datetimes)]
+
+    async def atime_bucket(
+            self, field: str, interval: str, annotations: Dict = None, normalise_datetimes: bool = False):
+        """ Async counterpart of time_bucket() returning the list of buckets. """
+        return await self.time_bucket(field, interval, annotations).ato_list(normalise_datetimes)
+
+    async def atime_bucket_gapfill(
+            self, field: str, interval: str, start: datetime, end: datetime, datapoints: Optional[int] = None,
+            annotations: Dict = None, normalise_datetimes: bool = False):
+        """ Async counterpart of time_bucket_gapfill() returning the list of buckets. """
+        queryset = self.time_bucket_gapfill(field, interval, start, end, datapoints)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return await queryset.ato_list(normalise_datetimes)
+
+    async def ahistogram(
+            self, field: str, min_value: float, max_value: float, num_of_buckets: int = 5, annotations: Dict = None):
+        """ Async counterpart of histogram() returning the list of histograms. """
+        queryset = self.histogram(field, min_value, max_value, num_of_buckets)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return await queryset.ato_list()
+
+    def copy_from(self, rows: Iterable, batch_size: int = 5000, fields: Optional[Iterable[str]] = None):
+        """ Bulk insert instances, dicts or tuples into the table with COPY, returns the number of rows copied. """
+        self._for_write = True
+        return copy_rows(self.model, rows, using=self.db, batch_size=batch_size, fields=fields)
+
+    def backfill(self, rows: Iterable, batch_size: int = 5000, fields: Optional[Iterable[str]] = None):
+        """ Like copy_from, but decompresses and compresses again the compressed chunks the rows fall in. """
+        self._for_write = True
+        return backfill_rows(self.model, rows, using=self.db, batch_size=batch_size, fields=fields)
+
+    def bulk_upsert(self, rows: Iterable, unique_fields: List[str], update_fields: Optional[List[str]] = None,
+                    batch_size: int = 5000, fields: Optional[Iterable[str]] = None):
+        """ Insert rows or update the ones conflicting on unique_fields, returns the inserted and updated counts. """
+        self._for_write = True
+        return upsert_rows(
+            self.model, rows, unique_fields, update_fields, using=self.db, batch_size=batch_size, fields=fields)
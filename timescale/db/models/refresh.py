@@ -0,0 +1,133 @@
+import logging
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from django.db import connections
+
+from timescale.db.models.expressions import parse_interval
+from timescale.db.models.fields import get_partition_field
+from timescale.db.models.routing import BUCKET_ORIGIN, get_bucket
+
+logger = logging.getLogger(__name__)
+
+# CALL can not run in a transaction block, every window is refreshed in its own transaction
+sql_refresh_continuous_aggregate = "CALL refresh_continuous_aggregate(%s, %s, %s)"
+
+
+class RefreshWindow(NamedTuple):
+    table: str
+    start: datetime
+    end: datetime
+
+
+def get_bucket_interval(model) -> str:
+    """ The bucket width of the materialized view of a continuous aggregate model. """
+    _, bucket = get_bucket(model.continuous_aggregate.create_materialized_view().query)
+    return bucket.source_expressions[0].value
+
+
+def align_to_bucket(value: datetime, width: timedelta, up: bool = False) -> datetime:
+    offset = (value - BUCKET_ORIGIN) % width
+    if not offset:
+        return value
+    return value - offset + (width if up else timedelta(0))
+
+
+def split_refresh_windows(table: str, start: datetime, end: datetime, bucket: str, window: str) -> List[RefreshWindow]:
+    """
+    Split [start, end), widened to whole buckets, into windows of whole buckets of about `window` each.
+    Buckets of months have no fixed width and are refreshed in one window.
+    """
+    months, width = parse_interval(bucket)
+    if months:
+        return [RefreshWindow(table, start, end)]
+    size = parse_interval(window)[1]
+    size = max(width, size - size % width)
+    start, end = align_to_bucket(start, width), align_to_bucket(end, width, up=True)
+    windows = []
+    while start < end:
+        windows.append(RefreshWindow(table, start, min(start + size, end)))
+        start += size
+    return windows
+
+
+def refresh_window(window: RefreshWindow, using: str) -> float:
+    """ Refresh one window and return how long it took in seconds. """
+    began = time.monotonic()
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql_refresh_continuous_aggregate, (window.table, window.start, window.end))
+    return time.monotonic() - began
+
+
+def _refresh_windows(tasks: queue.SimpleQueue, results: queue.SimpleQueue, using: str):
+    """ Refresh windows until none is left, all on the connection of this worker thread. """
+    try:
+        while True:
+            try:
+                refresh = tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results.put((refresh, refresh_window(refresh, using), None))
+            except Exception as error:
+                results.put((refresh, None, error))
+                return
+    finally:
+        connections[using].close()
+
+
+def refresh_in_windows(model, start: datetime, end: datetime, using: str, window: Optional[str] = None,
+                       workers: int = 1, done: Iterable[RefreshWindow] = (),
+                       callback: Optional[Callable[[RefreshWindow, float], None]] = None) -> List[RefreshWindow]:
+    """
+    Refresh the continuous aggregate of the model from start to end in bucket aligned windows, the chunk
+    interval of its time field by default. Each window is refreshed in its own transaction. With several
+    workers, windows are refreshed in parallel, each worker on its own connection. Windows in `done` are
+    skipped, so an interrupted refresh can be resumed. `callback` is called with every refreshed window and
+    its duration, in the order they finish. Returns the refreshed windows.
+    """
+    done = set(done)
+    windows = [
+        refresh for refresh in split_refresh_windows(
+            model._meta.db_table, start, end, get_bucket_interval(model), window or get_partition_field(model).interval)
+        if refresh not in done
+    ]
+    if workers > 1:
+        tasks, results = queue.SimpleQueue(), queue.SimpleQueue()
+        for refresh in windows:
+            tasks.put(refresh)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        for _ in range(min(workers, len(windows))):
+            executor.submit(_refresh_windows, tasks, results, using)
+
+        def finished():
+            for _ in windows:
+                refresh, seconds, error = results.get()
+                if error is not None:
+                    raise error
+                yield refresh, seconds
+    else:
+        executor = None
+
+        def finished():
+            for refresh in windows:
+                yield refresh, refresh_window(refresh, using)
+    try:
+        for position, (refresh, seconds) in enumerate(finished(), 1):
+            logger.info(f'refreshed {refresh.table} from {refresh.start} to {refresh.end} in {seconds:.1f}s '
+                        f'({position}/{len(windows)})')
+            if callback is not None:
+                callback(refresh, seconds)
+    finally:
+        if executor is not None:
+            # workers stop after the window they are refreshing
+            while not tasks.empty():
+                try:
+                    tasks.get_nowait()
+                except queue.Empty:
+                    break
+            executor.shutdown()
+    return windows
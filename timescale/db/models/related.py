@@ -1,15 +1,84 @@
-from django.db import models
+from datetime import timedelta
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
 from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor, ReverseManyToOneDescriptor
 from django.db.models.fields.related_descriptors import create_reverse_many_to_one_manager
 from django.db.models.sql.where import WhereNode, AND
 from django.utils.functional import cached_property
 
+from timescale.db.models.expressions import interval_to_timedelta
+from timescale.db.models.fields import get_chunk_number, get_partition_field
+
+# most time ranges a prefetch is restricted to, the closest ranges are merged beyond
+PREFETCH_MAX_RANGES = 8
+
+sql_time_pairs = "({key}, {time}) IN (SELECT * FROM unnest(%s::{key_type}[], %s::{time_type}[]))"
+
+
+def merge_time_ranges(times, chunk_interval: timedelta, max_ranges: int = PREFETCH_MAX_RANGES) -> List[Tuple]:
+    """
+    Collapse timestamps into at most `max_ranges` closed [first, last] ranges. Timestamps in the same or in
+    adjacent chunks share a range, so every range scans a run of chunks and the chunks between ranges are excluded.
+    """
+    ranges = []
+    for time in sorted(times):
+        chunk = get_chunk_number(time, chunk_interval)
+        if ranges and chunk - ranges[-1][2] <= 1:
+            ranges[-1][1:] = [time, chunk]
+        else:
+            ranges.append([time, time, chunk])
+    while len(ranges) > max_ranges:
+        position = min(range(len(ranges) - 1), key=lambda index: ranges[index + 1][0] - ranges[index][1])
+        ranges[position][1:] = ranges.pop(position + 1)[1:]
+    return [(first, last) for first, last, _ in ranges]
+
+
+def filter_time_pairs(queryset, key_field, pairs):
+    """
+    Restrict a queryset to the rows matching (key, time) pairs: ranges of the time column TimescaleDB can exclude
+    chunks with, and a join on the pairs unnested from two arrays. Small sets are filtered with time IN (...).
+    """
+    pairs = {(key, time) for key, time in pairs if key is not None and time is not None}
+    times = {time for _, time in pairs}
+    if len(times) <= getattr(settings, 'TIMESCALE_PREFETCH_IN_LIMIT', 100):
+        return queryset.filter(time__in=times)
+    time_field = queryset.model._meta.get_field('time')
+    partition_field = get_partition_field(queryset.model)
+    if partition_field is not None:
+        ranges = merge_time_ranges(times, interval_to_timedelta(partition_field.interval))
+    else:
+        ranges = [(min(times), max(times))]
+    restriction = models.Q()
+    for first, last in ranges:
+        restriction |= models.Q(time__gte=first, time__lte=last)
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    table = qn(queryset.model._meta.db_table)
+    sql = sql_time_pairs.format(
+        key=f'{table}.{qn(key_field.column)}', time=f'{table}.{qn(time_field.column)}',
+        key_type=key_field.rel_db_type(connection), time_type=time_field.db_type(connection),
+    )
+    keys, pair_times = zip(*pairs)
+    return queryset.filter(
+        restriction, RawSQL(sql, (list(keys), list(pair_times)), output_field=models.BooleanField()))
+
 
 class TimeBasedPrefetchMixin:
+    def get_prefetch_pairs(self, instances) -> Tuple[models.Field, List[Tuple]]:
+        """ The field matched on the prefetched model and the (key, time) pairs of the instances. """
+        raise NotImplementedError
+
+    def get_prefetch_base_queryset(self):
+        """ The queryset of the prefetched model, not restricted to a single instance. """
+        return super().get_queryset()
+
     def get_prefetch_querysets(self, instances, querysets=None):
-        queryset = querysets[0] if querysets else super().get_queryset()
-        times = set(instance.time for instance in instances)
-        queryset = queryset.filter(time__in=times)
+        queryset = querysets[0] if querysets else self.get_prefetch_base_queryset()
+        key_field, pairs = self.get_prefetch_pairs(instances)
+        queryset = filter_time_pairs(queryset, key_field, pairs)
         return super().get_prefetch_querysets(instances, [queryset])
 
 
@@ -23,6 +92,14 @@ class TimescaleRelatedReverseManyToOneDescriptor(ReverseManyToOneDescriptor):
                     queryset = queryset.filter(time=self.instance.time)
                 return queryset
 
+            def get_prefetch_base_queryset(self):
+                # the queryset of the related manager is restricted to its instance
+                return self.model._default_manager.all()
+
+            def get_prefetch_pairs(self, instances):
+                attname = self.field.target_field.attname
+                return self.field, [(getattr(instance, attname), instance.time) for instance in instances]
+
         return TimescaleRelatedManager
 
 
@@ -34,8 +111,18 @@ class TimescaleRelatedForwardManyToOneDescriptor(TimeBasedPrefetchMixin, Forward
             queryset = queryset.filter(time=instance.time)
         return queryset
 
+    def get_prefetch_pairs(self, instances):
+        attname = self.field.attname
+        return self.field.target_field, [(getattr(instance, attname), instance.time) for instance in instances]
+
 
 class TimescaleRelatedForeignKey(models.ForeignKey):
+    def __init__(self, *args, **kwargs):
+        # the schema editor creates the (fk, time) index, which serves lookups on the key alone too. Fields
+        # created with the single column index get the join indexes with the ReplaceForeignKeyIndex operation
+        kwargs.setdefault('db_index', False)
+        super().__init__(*args, **kwargs)
+
     def contribute_to_class(self, cls, name, **kwargs):
         super().contribute_to_class(cls, name, **kwargs)
         setattr(cls, self.name, TimescaleRelatedForwardManyToOneDescriptor(self))
@@ -0,0 +1,235 @@
+import functools
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from django.apps import apps
+from django.core.signals import setting_changed
+from django.db.models.signals import class_prepared
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.expressions import Col
+from django.db.models.query import ValuesIterable
+from django.db.models.sql.where import WhereNode
+
+from timescale.db.models.aggregates import First, Last
+from timescale.db.models.expressions import TimeBucket, parse_interval
+from timescale.db.models.fields import get_partition_field
+
+logger = logging.getLogger(__name__)
+
+# default origin of time_bucket, buckets of continuous aggregates start at multiples of the width from it
+BUCKET_ORIGIN = datetime(2000, 1, 3, tzinfo=timezone.utc)
+MONTH_BUCKET_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+# time lookups that keep their meaning when applied to bucket starts aligned to the bucket width
+BUCKET_TIME_LOOKUPS = {'gte', 'lt'}
+
+
+class NotRoutable(Exception):
+    pass
+
+
+class ContinuousAggregateView(NamedTuple):
+    """ The rollup a continuous aggregate model materializes from its source model. """
+    model: type
+    source: type
+    time_field: str
+    interval: str
+    group_by: List[str]
+    aggregates: Dict[str, object]
+
+
+class ContinuousAggregatePlan(NamedTuple):
+    """ How a query on a source model is answered from a continuous aggregate. """
+    view: ContinuousAggregateView
+    rollup: bool
+    queryset: object
+
+    def __str__(self):
+        mode = 'rollup of' if self.rollup else 'read from'
+        return f'{mode} continuous aggregate {self.view.model._meta.label} ({self.view.model._meta.db_table})'
+
+
+# how aggregates are computed again from the materialized buckets of a continuous aggregate
+ROLLUPS = {
+    Count: lambda column, time: Sum(column),
+    Sum: lambda column, time: Sum(column),
+    Min: lambda column, time: Min(column),
+    Max: lambda column, time: Max(column),
+    First: lambda column, time: First(column, time),
+    Last: lambda column, time: Last(column, time),
+}
+
+
+def get_bucket(query):
+    """ Return the alias and the expression of the only time_bucket annotation of a query. """
+    buckets = [(name, annotation) for name, annotation in query.annotations.items() if type(annotation) is TimeBucket]
+    if len(buckets) != 1:
+        raise NotRoutable('query has no single time_bucket annotation')
+    return buckets[0]
+
+
+def get_view(model) -> Optional[ContinuousAggregateView]:
+    """ Describe the materialized view of a continuous aggregate model from its create_materialized_view(). """
+    manager = getattr(model, 'continuous_aggregate', None)
+    definition = manager.create_materialized_view() if manager is not None else None
+    if definition is None:
+        return None
+    query = definition.query
+    time_field = get_partition_field(model)
+    try:
+        bucket_name, bucket = get_bucket(query)
+    except NotRoutable:
+        return None
+    interval, source = bucket.source_expressions
+    if time_field is None or not isinstance(source, Col) or source.target != get_partition_field(definition.model):
+        return None
+    field_names = {field.name for field in model._meta.concrete_fields}
+    aggregates = {
+        name: annotation for name, annotation in query.annotations.items() if annotation.contains_aggregate
+    }
+    if not set(query.values_select) | set(aggregates) <= field_names:
+        return None
+    return ContinuousAggregateView(
+        model=model,
+        source=definition.model,
+        time_field=time_field.name,
+        interval=interval.value,
+        group_by=list(query.values_select),
+        aggregates=aggregates,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_views() -> List[ContinuousAggregateView]:
+    """ Registry of the views of every installed continuous aggregate model, built on first use. """
+    from timescale.db.models.managers import ContinuousAggregateManager
+    views = []
+    for model in apps.get_models():
+        if isinstance(getattr(model, 'continuous_aggregate', None), ContinuousAggregateManager):
+            view = get_view(model)
+            if view is not None:
+                views.append(view)
+    return views
+
+
+def clear_views(**kwargs):
+    """ Forget the registry of views when models are registered or INSTALLED_APPS change. """
+    if kwargs.get('setting', 'INSTALLED_APPS') == 'INSTALLED_APPS':
+        get_views.cache_clear()
+
+
+class_prepared.connect(clear_views, dispatch_uid='timescale_clear_views')
+setting_changed.connect(clear_views, dispatch_uid='timescale_clear_views')
+
+
+def is_multiple(interval: str, of: str) -> bool:
+    """ Check if buckets of `interval` are made of whole buckets of `of`. """
+    months, delta = parse_interval(interval)
+    of_months, of_delta = parse_interval(of)
+    if months or of_months:
+        return not delta and not of_delta and of_months and months % of_months == 0
+    return bool(of_delta) and delta % of_delta == timedelta(0)
+
+
+def is_bucket_aligned(value, interval: str) -> bool:
+    if not isinstance(value, datetime) or value.tzinfo is None:
+        return False
+    months, delta = parse_interval(interval)
+    if months:
+        value = value.astimezone(timezone.utc)
+        elapsed = (value.year - MONTH_BUCKET_ORIGIN.year) * 12 + value.month - 1
+        return value == value.replace(day=1, hour=0, minute=0, second=0, microsecond=0) and elapsed % months == 0
+    return (value - BUCKET_ORIGIN) % delta == timedelta(0)
+
+
+def where_to_q(node, translate) -> Q:
+    """ Rebuild a where node as a Q object, `translate` maps every lookup to a (field name, value) pair. """
+    if isinstance(node, WhereNode):
+        children = [where_to_q(child, translate) for child in node.children]
+        return Q(*children, _connector=node.connector, _negated=node.negated)
+    name, value = translate(node)
+    return Q(**{f'{name}__{node.lookup_name}': value})
+
+
+def translate_filters(query, view: ContinuousAggregateView) -> Q:
+    """ Translate the filters of a query on the source model into filters on the continuous aggregate. """
+    source_time_field = get_partition_field(view.source)
+
+    def translate(lookup):
+        lhs, rhs = getattr(lookup, 'lhs', None), getattr(lookup, 'rhs', None)
+        if not isinstance(lhs, Col) or lhs.target.model is not view.source or hasattr(rhs, 'resolve_expression'):
+            raise NotRoutable('only lookups of columns against values can be translated')
+        if lhs.target.name in view.group_by:
+            return lhs.target.name, rhs
+        if lhs.target == source_time_field and lookup.lookup_name in BUCKET_TIME_LOOKUPS \
+                and is_bucket_aligned(rhs, view.interval):
+            return view.time_field, rhs
+        raise NotRoutable(f'filter on {lhs.target.name} can not be answered from the materialized buckets')
+
+    return where_to_q(query.where, translate)
+
+
+def plan_query(queryset, view: ContinuousAggregateView) -> ContinuousAggregatePlan:
+    """ Rewrite a time_bucket values queryset on the source model into a query on the continuous aggregate. """
+    query = queryset.query
+    if queryset.model is not view.source:
+        raise NotRoutable('different source')
+    if not issubclass(queryset._iterable_class, ValuesIterable) or query.extra or query.distinct \
+            or query.combinator or not query.group_by:
+        raise NotRoutable('only plain aggregations are routed')
+    bucket_name, bucket = get_bucket(query)
+    interval, source = bucket.source_expressions
+    if not isinstance(source, Col) or source.target != get_partition_field(view.source):
+        raise NotRoutable('bucket is not on the partition column')
+    if not is_multiple(interval.value, view.interval):
+        raise NotRoutable(f'bucket width {interval.value} is not a multiple of {view.interval}')
+    if not set(query.values_select) <= set(view.group_by):
+        raise NotRoutable('grouped by columns that are not materialized')
+    columns = {}
+    for name, annotation in query.annotations.items():
+        if name == bucket_name:
+            continue
+        column = next((column for column, aggregate in view.aggregates.items() if aggregate == annotation), None)
+        if column is None:
+            raise NotRoutable(f'{name} is not materialized')
+        columns[name] = (column, annotation)
+    if any(not isinstance(name, str) or name.lstrip('-') not in (*query.values_select, *query.annotations)
+           for name in query.order_by):
+        raise NotRoutable('only ordering on selected columns is routed')
+    filters = translate_filters(query, view)
+
+    rollup = parse_interval(interval.value) != parse_interval(view.interval) or \
+        set(query.values_select) != set(view.group_by)
+    rewritten = view.model._base_manager.using(queryset.db).filter(filters)
+    field_names = {field.name for field in view.model._meta.concrete_fields}
+    if rollup:
+        aggregates = {}
+        for name, (column, annotation) in columns.items():
+            rollup_function = ROLLUPS.get(type(annotation))
+            if rollup_function is None or getattr(annotation, 'distinct', False) or name in field_names:
+                raise NotRoutable(f'{name} can not be rolled up from the materialized buckets')
+            aggregates[name] = rollup_function(column, view.time_field)
+        rewritten = rewritten.values(
+            *query.values_select, **{bucket_name: TimeBucket(view.time_field, interval.value)}
+        ).annotate(**aggregates)
+    else:
+        positional = [name for name, (column, _) in columns.items() if name == column]
+        renamed = {name: F(column) for name, (column, _) in columns.items() if name != column}
+        rewritten = rewritten.values(
+            *query.values_select, *positional, **{bucket_name: F(view.time_field)}, **renamed
+        )
+    rewritten = rewritten.order_by(*query.order_by)
+    rewritten.query.set_limits(query.low_mark, query.high_mark)
+    return ContinuousAggregatePlan(view=view, rollup=rollup, queryset=rewritten)
+
+
+def find_plan(queryset) -> Optional[ContinuousAggregatePlan]:
+    """ Return the plan over the first continuous aggregate able to answer the queryset, if any. """
+    for view in get_views():
+        if view.source is not queryset.model:
+            continue
+        try:
+            return plan_query(queryset, view)
+        except NotRoutable as reason:
+            logger.debug('not routed to %s: %s', view.model._meta.label, reason)
+    return None
@@ -0,0 +1,9 @@
+def select_names(compiler):
+    """
+    Return the names of the selected columns of a compiled query, using the alias of
+    expressions and the attname of plain columns. Only valid once the query was compiled.
+    """
+    return [
+        alias or expression.target.attname
+        for expression, _, alias in compiler.select[:compiler.col_count]
+    ]
@@ -0,0 +1,19 @@
+from django.core.management.commands import makemigrations
+
+from timescale.db.migrations.autodetector import TimescaleAutodetector
+
+
+class Command(makemigrations.Command):
+    """ makemigrations detecting changes of compression, retention and refresh policies. """
+    autodetector = TimescaleAutodetector
+
+    def handle(self, *args, **options):
+        if hasattr(makemigrations.Command, 'autodetector'):
+            return super().handle(*args, **options)
+        # before Django 5.2 the autodetector can only be replaced in the module
+        autodetector = makemigrations.MigrationAutodetector
+        makemigrations.MigrationAutodetector = TimescaleAutodetector
+        try:
+            return super().handle(*args, **options)
+        finally:
+            makemigrations.MigrationAutodetector = autodetector
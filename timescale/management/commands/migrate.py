@@ -0,0 +1,8 @@
+from django.core.management.commands import migrate
+
+from timescale.db.migrations.autodetector import TimescaleAutodetector
+
+
+class Command(migrate.Command):
+    """ migrate using the same autodetector as makemigrations. """
+    autodetector = TimescaleAutodetector
@@ -0,0 +1,65 @@
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.migrations import Migration
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from timescale.db.models.advisor import advise_chunk_interval, alter_chunk_interval_operation
+from timescale.db.models.fields import get_partition_field
+
+
+class Command(BaseCommand):
+    help = 'Recommend a chunk interval for hypertables from the size of their recent chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='app_label.ModelName, all hypertable models by default')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--memory', type=int, help='memory in bytes, shared_buffers by default')
+        parser.add_argument('--memory-fraction', type=float, help='fraction of memory a chunk may use')
+        parser.add_argument('--sample', type=int, default=10, help='number of recent chunks to sample')
+        parser.add_argument(
+            '--migration', action='store_true', help='write a migration altering the chunk interval')
+
+    def handle(self, *args, **options):
+        if options['models']:
+            try:
+                models = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as error:
+                raise CommandError(error)
+        else:
+            models = [model for model in apps.get_models() if get_partition_field(model) is not None]
+        for model in models:
+            if get_partition_field(model) is None:
+                raise CommandError(f'{model._meta.label} is not a hypertable model')
+            try:
+                advice = advise_chunk_interval(
+                    model, options['database'], options['memory'], options['memory_fraction'], options['sample'])
+            except ValueError as error:
+                self.stderr.write(str(error))
+                continue
+            self.stdout.write(str(advice))
+            if options['migration'] and advice.recommended != advice.current:
+                path = self.write_migration(model, advice.recommended)
+                self.stdout.write(self.style.SUCCESS(
+                    f'  wrote {path}, update the interval of {model._meta.object_name}.'
+                    f'{get_partition_field(model).name} to {advice.recommended!r} as well'))
+
+    def write_migration(self, model, interval):
+        app_label = model._meta.app_label
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaves = loader.graph.leaf_nodes(app_label)
+        if len(leaves) != 1:
+            raise CommandError(f'{app_label} needs exactly one leaf migration, found {len(leaves)}')
+        number = (MigrationAutodetector.parse_number(leaves[0][1]) or 0) + 1
+        migration = Migration(f'{number:04d}_{model._meta.model_name}_chunk_interval', app_label)
+        migration.dependencies = leaves
+        migration.operations = [alter_chunk_interval_operation(model, interval)]
+        writer = MigrationWriter(migration)
+        os.makedirs(os.path.dirname(writer.path), exist_ok=True)
+        with open(writer.path, 'w', encoding='utf-8') as file:
+            file.write(writer.as_string())
+        return writer.path
@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from timescale.db.models.advisor import analyze_compression
+from timescale.db.models.fields import get_partition_field
+
+
+class Command(BaseCommand):
+    help = 'Measure the compression of segment_by/order_by candidates on a sample of a hypertable.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='app_label.ModelName')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--sample', type=int, default=100000, help='number of rows to sample')
+        parser.add_argument('--max-candidates', type=int, default=8)
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as error:
+            raise CommandError(error)
+        if get_partition_field(model) is None:
+            raise CommandError(f'{model._meta.label} is not a hypertable model')
+        try:
+            candidates = analyze_compression(
+                model, options['database'], options['sample'], options['max_candidates'])
+        except ValueError as error:
+            raise CommandError(error)
+        for candidate in candidates:
+            self.stdout.write(str(candidate))
+        best = candidates[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'best: segment_by = {list(best.segment_by)}, order_by = {list(best.order_by)}'))
@@ -0,0 +1,66 @@
+import json
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from timescale.db.models.models import ContinuousAggregateModel
+from timescale.db.models.refresh import RefreshWindow
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        return [RefreshWindow(table, parse_datetime(start), parse_datetime(end)) for table, start, end in json.load(file)]
+
+
+def write_checkpoint(path, windows):
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump([[window.table, window.start.isoformat(), window.end.isoformat()] for window in windows], file)
+    os.replace(f'{path}.tmp', path)
+
+
+class Command(BaseCommand):
+    help = 'Refresh a continuous aggregate in bucket aligned windows, each in its own transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='app_label.ModelName')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--start', help='ISO 8601 datetime, twice the chunk interval before --end by default')
+        parser.add_argument('--end', help='ISO 8601 datetime, now by default')
+        parser.add_argument('--window', help='interval refreshed per transaction, the chunk interval by default')
+        parser.add_argument('--workers', type=int, default=1, help='windows refreshed in parallel')
+        parser.add_argument('--no-cascade', action='store_true', help='do not refresh the aggregates below first')
+        parser.add_argument(
+            '--checkpoint', help='file recording the refreshed windows, an interrupted refresh resumes from it')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as error:
+            raise CommandError(error)
+        if not issubclass(model, ContinuousAggregateModel):
+            raise CommandError(f'{model._meta.label} is not a continuous aggregate model')
+        start, end = (parse_datetime(options[name]) if options[name] else None for name in ('start', 'end'))
+        if (options['start'] and start is None) or (options['end'] and end is None):
+            raise CommandError('--start and --end must be ISO 8601 datetimes')
+        start, end = (make_aware(value) if value and is_naive(value) else value for value in (start, end))
+        path = options['checkpoint']
+        done = read_checkpoint(path)
+
+        def record(window, seconds):
+            self.stdout.write(f'{window.table}: {window.start} - {window.end} in {seconds:.1f}s')
+            if path:
+                done.append(window)
+                write_checkpoint(path, done)
+
+        model.refresh_continuous_aggregate(
+            start, end, cascade=not options['no_cascade'], using=options['database'], window=options['window'],
+            workers=options['workers'], done=list(done), callback=record)
+        if path and os.path.exists(path):
+            os.remove(path)
+        self.stdout.write(self.style.SUCCESS(f'refreshed {model._meta.label}'))
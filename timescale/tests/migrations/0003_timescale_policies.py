@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+import django.db.models.manager
+import django.utils.timezone
+import timescale.db.migrations.operations
+import timescale.db.models.expressions
+import timescale.tests.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0002_initial'),
+    ]
+
+    operations = [
+        timescale.db.migrations.operations.AlterTimescaleManagers(
+            name='metric',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('compression', timescale.tests.models.MetricCompressionManager(chunk_time_interval=timescale.db.models.expressions.Interval('1 hour'), compress_after=None, compress_created_before=None, enable=True, if_not_exists=True, initial_start=None, order_by=['time'], schedule_interval=timescale.db.models.expressions.Interval('2 hours'), segment_by=['device'], timezone=None)),
+                ('retention', timescale.tests.models.MetricRetentionManager(drop_after=timescale.db.models.expressions.Interval('1 day'), drop_created_before=None, if_not_exists=True, initial_start=django.utils.timezone.now, schedule_interval=timescale.db.models.expressions.Interval('1 hour'), timezone='UTC')),
+            ],
+        ),
+        timescale.db.migrations.operations.AlterTimescaleManagers(
+            name='metricaggregate',
+            managers=[
+                ('continuous_aggregate', timescale.tests.models.MetricMaterializedView(create_group_indexes=False, end_offset=None, finalized=False, initial_start=None, materialized_only=True, schedule_interval=None, start_offset=None, timezone=None)),
+                ('compression', timescale.tests.models.MetricCompression(chunk_time_interval=timescale.db.models.expressions.Interval('1 hour'), compress_after=None, compress_created_before=None, enable=True, if_not_exists=True, initial_start=None, order_by=['time'], schedule_interval=timescale.db.models.expressions.Interval('2 hours'), segment_by=['device'], timezone=None)),
+                ('retention', timescale.tests.models.MetricAggregateRetentionManager(drop_after=timescale.db.models.expressions.Interval('1 day'), drop_created_before=None, if_not_exists=True, initial_start=django.utils.timezone.now, schedule_interval=timescale.db.models.expressions.Interval('1 hour'), timezone='UTC')),
+            ],
+        ),
+    ]
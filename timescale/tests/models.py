@@ -15,13 +15,13 @@ class MetricRetentionManager(RetentionManager):
     initial_start = timezone.now
     timezone = settings.TIME_ZONE
     if_not_exists = True
-    drop_created_before = True
+    drop_created_before = None
 
 
 class MetricCompressionManager(CompressionManager):
     enable = True
-    order_by = ['device', 'time']
-    segment_by = ['last_temperature']
+    order_by = ['time']
+    segment_by = ['device']
     chunk_time_interval = Interval('1 hour')
     # compression policy parameters
     schedule_interval = Interval('2 hours')
@@ -62,8 +62,8 @@ class MetricMaterializedView(ContinuousAggregateManager):
 
 class MetricCompression(CompressionManager):
     enable = True
-    order_by = ['device', 'time']
-    segment_by = ['last_temperature']
+    order_by = ['time']
+    segment_by = ['device']
     chunk_time_interval = Interval('1 hour')
     # compression policy parameters
     schedule_interval = Interval('2 hours')
@@ -79,7 +79,7 @@ class MetricAggregateRetentionManager(RetentionManager):
     initial_start: datetime = timezone.now
     timezone = settings.TIME_ZONE
     if_not_exists = True
-    drop_created_before = True
+    drop_created_before = None
 
 
 class MetricAggregate(ContinuousAggregateModel):
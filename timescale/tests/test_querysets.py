@@ -0,0 +1,692 @@
+import asyncio
+import os
+import queue
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest import mock, skipIf
+from zoneinfo import ZoneInfo
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models
+from django.db.models import Avg, Count, Max, Q
+from django.db.models.sql.compiler import SQLCompiler
+from django.db.transaction import TransactionManagementError
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import isolate_apps
+from timescale.db.models import backfill, columnar
+from timescale.db.models.aggregates import First, Last
+from timescale.db.models.expressions import parse_interval
+from timescale.db.models.information import Chunk, Job
+from timescale.db.models.parallel import get_merge_functions, merge_rows, sort_rows, split_time_range
+from timescale.db.models import aio, buffer, bulk
+from timescale.db.models.bulk import UpsertResult, copy_sql, get_copy_fields, prepare_rows
+from timescale.db.models.querysets import UnboundedTimeRangeError, normalise_bucket
+from timescale.db.models.refresh import RefreshWindow, split_refresh_windows
+from timescale.db.models.related import filter_time_pairs, merge_time_ranges
+from timescale.tests.models import Metric, MetricAggregate
+
+
+class CopyFromTest(SimpleTestCase):
+    def test_copy_fields_skip_auto_primary_key(self):
+        fields = get_copy_fields(Metric)
+        self.assertEqual([field.name for field in fields], ['time', 'temperature', 'device'])
+
+    def test_copy_sql(self):
+        fields = get_copy_fields(Metric)
+        self.assertEqual(
+            copy_sql(Metric, fields, connection, binary=True),
+            'COPY "tests_metric" ("time", "temperature", "device") FROM STDIN (FORMAT BINARY)'
+        )
+
+    def test_prepare_rows_accepts_instances_dicts_and_tuples(self):
+        time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        fields = get_copy_fields(Metric)
+        rows = prepare_rows(fields, [
+            Metric(time=time, temperature=1.5, device=2),
+            {'time': time, 'temperature': 1.5, 'device': 2},
+            (time, 1.5, 2),
+        ], connection)
+        self.assertEqual(rows, [(time, 1.5, 2)] * 3)
+
+    def test_prepare_rows_uses_field_defaults(self):
+        time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = prepare_rows(get_copy_fields(Metric), [{'time': time}], connection)
+        self.assertEqual(rows, [(time, 0.0, 0)])
+
+
+class BulkUpsertTest(SimpleTestCase):
+    def upsert(self, rows, **kwargs):
+        cursor = mock.MagicMock()
+        cursor.fetchone.return_value = (1, 1)
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'cursor') as database_cursor, \
+                mock.patch.object(bulk, 'transaction'), mock.patch.object(bulk, '_copy_batch') as copy_batch:
+            database_cursor.return_value.__enter__.return_value = cursor
+            result = Metric.timescale.bulk_upsert(rows, **kwargs)
+        return result, [call[0] for call in cursor.execute.call_args_list], copy_batch
+
+    def test_rows_are_sorted_deduplicated_and_batched_by_chunk(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        result, statements, _ = self.upsert([
+            {'time': start + timedelta(minutes=12), 'temperature': 1.0, 'device': 1},
+            {'time': start + timedelta(minutes=1), 'temperature': 2.0, 'device': 1},
+            {'time': start + timedelta(minutes=12), 'temperature': 3.0, 'device': 1},
+        ], unique_fields=['time', 'device'], update_fields=['temperature'])
+        self.assertEqual(result, UpsertResult(inserted=2, updated=2))
+        self.assertEqual([params for _, params in statements], [
+            [start + timedelta(minutes=1), 2.0, 1], [start + timedelta(minutes=12), 3.0, 1],
+        ])
+        sql = ' '.join(statements[0][0].split())
+        self.assertIn(
+            'INSERT INTO "tests_metric" ("time", "temperature", "device") VALUES (%s, %s, %s) '
+            'ON CONFLICT ("time", "device") DO UPDATE SET "temperature" = EXCLUDED."temperature" '
+            'RETURNING xmax = 0 AS inserted', sql)
+
+    @override_settings(TIMESCALE_UPSERT_STAGING_THRESHOLD=2)
+    def test_large_batches_are_staged(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = [(start + timedelta(minutes=minute), 1.0, 1) for minute in range(3)]
+        _, statements, copy_batch = self.upsert(
+            rows, unique_fields=['time', 'device'], update_fields=[])
+        # the auto primary key is not written, so it is left out of the staging table
+        self.assertEqual(
+            statements[0][0],
+            'CREATE TEMPORARY TABLE "tests_metric_upsert" AS SELECT "time", "temperature", "device" '
+            'FROM "tests_metric" WITH NO DATA')
+        self.assertEqual(copy_batch.call_args[0][4], 'tests_metric_upsert')
+        self.assertIn('SELECT "time", "temperature", "device" FROM "tests_metric_upsert" ORDER BY "time" '
+                      'ON CONFLICT ("time", "device") DO NOTHING', ' '.join(statements[1][0].split()))
+        self.assertEqual(statements[2][0], 'DROP TABLE "tests_metric_upsert"')
+
+    def test_unique_fields_include_time(self):
+        with self.assertRaises(ValueError):
+            Metric.timescale.bulk_upsert([], unique_fields=['device'])
+
+
+class WriteBufferTest(SimpleTestCase):
+    def test_rows_are_written_in_batches_and_on_close(self):
+        time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        with mock.patch.object(buffer, 'copy_rows', side_effect=lambda model, rows, *args: len(rows)) as copy_rows:
+            writes = buffer.WriteBuffer(Metric, DEFAULT_DB_ALIAS, max_rows=2, interval=60)
+            with writes:
+                for temperature in range(3):
+                    writes.put({'time': time, 'temperature': temperature})
+                self.assertTrue(writes.flush(timeout=5))
+                writes.put((time, 3.0, 1))
+        self.assertEqual([len(call[0][1]) for call in copy_rows.call_args_list], [2, 1, 1])
+        self.assertEqual(writes.written, 4)
+        with self.assertRaises(RuntimeError):
+            writes.put((time, 4.0, 1))
+        # nothing reads a flush marker once the worker stopped
+        self.assertTrue(writes.flush())
+
+    def test_producers_waiting_on_a_full_buffer_do_not_hold_the_lock(self):
+        writing, release = threading.Event(), threading.Event()
+
+        def copy_rows(model, rows, *args):
+            writing.set()
+            release.wait(5)
+            return len(rows)
+        with mock.patch.object(buffer, 'copy_rows', side_effect=copy_rows):
+            writes = buffer.WriteBuffer(Metric, DEFAULT_DB_ALIAS, max_rows=1, interval=60, max_pending=1)
+            writes.put(1)
+            self.assertTrue(writing.wait(5))
+            writes.put(2)
+            producer = threading.Thread(target=writes.put, args=(3,))
+            producer.start()
+            while producer.is_alive() and not writes._producers:
+                time.sleep(0.01)
+            with self.assertRaises(queue.Full):
+                asyncio.run(asyncio.wait_for(writes.aput(4, timeout=0.1), 5))
+            release.set()
+            producer.join(5)
+            writes.close(timeout=5)
+        self.assertEqual(writes.written, 3)
+
+    def test_manager_shares_the_buffer(self):
+        writes = Metric.timescale.buffered(max_rows=10)
+        self.addCleanup(writes.close)
+        self.assertIs(Metric.timescale.buffered(), writes)
+        self.assertEqual(writes.max_rows, 10)
+
+
+class AsyncIterateTest(SimpleTestCase):
+    def test_query_runs_on_a_named_cursor(self):
+        day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        aconnection = mock.MagicMock()
+        cursor = aconnection.cursor.return_value.__aenter__.return_value
+        cursor.execute = mock.AsyncMock()
+        cursor.fetchmany = mock.AsyncMock(side_effect=[[(day, 1.5)], []])
+
+        @asynccontextmanager
+        async def aconnect(connection):
+            yield aconnection
+        queryset = Metric.timescale.filter(device=1).time_bucket('time', '1 hour').annotate(avg=Avg('temperature'))
+        with mock.patch.object(aio, 'aconnect', aconnect), mock.patch.object(aio, 'psycopg') as psycopg:
+            mogrify = psycopg.AsyncClientCursor.return_value.mogrify
+            mogrify.return_value = 'SELECT ...'
+            rows = asyncio.run(queryset.ato_list(chunk_size=500))
+        self.assertEqual(rows, [{'bucket': day, 'avg': 1.5}])
+        sql, params = mogrify.call_args[0]
+        self.assertTrue(sql.startswith('SELECT time_bucket(%s, "tests_metric"."time") AS "bucket", AVG('))
+        self.assertEqual(params, ('1 hour', 1))
+        cursor.execute.assert_awaited_once_with('SELECT ...')
+        cursor.fetchmany.assert_awaited_with(500)
+        self.assertTrue(aconnection.cursor.call_args[1]['name'].startswith('_timescale_curs_'))
+
+    def test_psycopg2_falls_back_to_aiterator(self):
+        async def aiterator(queryset, chunk_size):
+            yield {'bucket': None}
+        queryset = Metric.timescale.time_bucket('time', '1 hour')
+        with mock.patch.object(aio, 'psycopg', None), \
+                mock.patch.object(type(queryset), 'aiterator', aiterator), \
+                mock.patch.object(aio, 'aconnect') as aconnect:
+            rows = asyncio.run(queryset.ato_list())
+        self.assertEqual(rows, [{'bucket': None}])
+        aconnect.assert_not_called()
+
+    @mock.patch('timescale.db.models.querysets.get_watermark')
+    def test_real_time_rows_are_merged(self, get_watermark):
+        day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        get_watermark.return_value = day + timedelta(minutes=20)
+        queryset = Metric.timescale.time_bucket('time', '20 minutes').annotate(
+            first=First('temperature', 'time')).real_time()
+
+        def execute_sql(compiler, *args, **kwargs):
+            sql, _ = compiler.as_sql()
+            if 'tests_metricaggregate' in sql:
+                return iter([[(day, 10.0)]])
+            return iter([[(day + timedelta(minutes=20), 15.0)]])
+        with mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql), \
+                mock.patch.object(aio, 'aconnect') as aconnect:
+            rows = asyncio.run(queryset.ato_list())
+        self.assertEqual(rows, [
+            {'bucket': day + timedelta(minutes=20), 'first': 15.0}, {'bucket': day, 'first': 10.0}])
+        aconnect.assert_not_called()
+
+    def test_pool_is_reused(self):
+        async def main():
+            for _ in range(2):
+                async with aio.aconnect(connections[DEFAULT_DB_ALIAS]) as aconnection:
+                    self.assertIs(aconnection, pool.connection.return_value.__aenter__.return_value)
+        pool_class = mock.MagicMock()
+        pool = pool_class.return_value
+        pool.open = mock.AsyncMock()
+        with mock.patch.object(aio, 'AsyncConnectionPool', pool_class):
+            asyncio.run(main())
+        pool_class.assert_called_once()
+        self.assertEqual(pool_class.call_args[1]['max_size'], 10)
+        pool.open.assert_awaited_once()
+
+    @override_settings(TIMESCALE_ASYNC_MAX_CONNECTIONS=1)
+    def test_connections_are_capped_without_pool(self):
+        opened = []
+
+        async def connect(connection):
+            opened.append(len(opened))
+            return mock.MagicMock()
+
+        async def query(delay):
+            async with aio.aconnect(connections[DEFAULT_DB_ALIAS]):
+                running.append(delay)
+                await asyncio.sleep(delay)
+                running.remove(delay)
+                return len(running)
+
+        async def main():
+            return await asyncio.gather(query(0.01), query(0.01))
+        running = []
+        with mock.patch.object(aio, 'AsyncConnectionPool', None), mock.patch.object(aio, 'connect', connect):
+            self.assertEqual(asyncio.run(main()), [0, 0])
+        self.assertEqual(len(opened), 2)
+
+
+class BackfillTest(SimpleTestCase):
+    def test_rows_are_grouped_by_compressed_chunk(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        end = start + timedelta(minutes=10)
+        chunks = [
+            Chunk('_timescaledb_internal', '_hyper_1_1_chunk', start, end, True),
+            # another space partition of the range, not compressed
+            Chunk('_timescaledb_internal', '_hyper_1_2_chunk', start, end, False),
+        ]
+        jobs = [Job(1000, 'policy_compression', True)]
+        with mock.patch.object(backfill, 'get_chunks', return_value=chunks), \
+                mock.patch.object(backfill, 'get_jobs', return_value=jobs), \
+                mock.patch.object(backfill, 'transaction'), \
+                mock.patch.object(backfill, '_copy_batch') as copy_batch, \
+                mock.patch.object(connection.SchemaEditorClass, 'execute') as execute:
+            count = Metric.timescale.backfill([
+                {'time': start + timedelta(minutes=1), 'temperature': 1.0},
+                {'time': end, 'temperature': 2.0},
+                {'time': start + timedelta(minutes=2), 'temperature': 3.0},
+            ])
+        self.assertEqual(count, 3)
+        self.assertEqual([[row[1] for row in call[0][2]] for call in copy_batch.call_args_list], [[2.0], [1.0, 3.0]])
+        statements = [call[0][0] for call in execute.call_args_list]
+        self.assertEqual(statements[0], 'SELECT alter_job(1000, scheduled => FALSE)')
+        self.assertEqual(statements[1:], [
+            'SELECT decompress_chunk(\'"_timescaledb_internal"."_hyper_1_1_chunk"\', true)',
+            'SELECT compress_chunk(\'"_timescaledb_internal"."_hyper_1_1_chunk"\', true)',
+            'SELECT alter_job(1000, scheduled => TRUE)',
+        ])
+
+    @isolate_apps('timescale.tests')
+    def test_model_without_partition_field_is_refused(self):
+        class Plain(models.Model):
+            time = models.DateTimeField()
+
+        with self.assertRaisesMessage(ValueError, 'tests.Plain is not a hypertable'):
+            backfill.backfill_rows(Plain, [], DEFAULT_DB_ALIAS)
+
+
+class NormaliseBucketTest(SimpleTestCase):
+    def test_normalise_bucket_in_place(self):
+        row = {'bucket': datetime(2024, 1, 1, tzinfo=timezone.utc), 'temperature__avg': 1.0}
+        self.assertIs(normalise_bucket(row), row)
+        self.assertEqual(row, {'bucket': '2024-01-01T00:00:00+00:00', 'temperature__avg': 1.0})
+
+    def test_normalise_bucket_ignores_rows_without_bucket(self):
+        self.assertEqual(normalise_bucket({'histogram': [1, 2]}), {'histogram': [1, 2]})
+
+
+@skipIf(columnar.np is None, 'numpy is not installed')
+class ToArraysTest(SimpleTestCase):
+    def execute_sql(self, chunks):
+        def execute_sql(compiler, *args, **kwargs):
+            compiler.as_sql()
+            return iter(chunks)
+        return mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql)
+
+    def test_to_arrays(self):
+        first, second = datetime(2024, 1, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 1, tzinfo=timezone.utc)
+        queryset = Metric.timescale.time_bucket('time', '1 hour').annotate(Avg('temperature'))
+        with self.execute_sql([[(first, 1.5)], [(second, None)]]):
+            arrays = queryset.to_arrays(batch_size=1)
+        self.assertEqual(list(arrays), ['bucket', 'temperature__avg'])
+        self.assertEqual(arrays['bucket'].dtype, columnar.np.dtype('datetime64[us]'))
+        self.assertEqual(arrays['bucket'].tolist(), [first.replace(tzinfo=None), second.replace(tzinfo=None)])
+        self.assertEqual(arrays['temperature__avg'][0], 1.5)
+        self.assertTrue(columnar.np.isnan(arrays['temperature__avg'][1]))
+
+
+@override_settings(TIMESCALE_REQUIRE_TIME_BOUND='raise')
+class TimeBoundTest(SimpleTestCase):
+    def test_between_is_sargable(self):
+        start, end = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 2, tzinfo=timezone.utc)
+        sql = str(Metric.timescale.between(start, end).time_bucket('time', '1 hour').query)
+        self.assertIn('"tests_metric"."time" >= 2024-01-01 00:00:00+00:00', sql)
+        self.assertIn('"tests_metric"."time" < 2024-01-02 00:00:00+00:00', sql)
+
+    def test_last(self):
+        sql = str(Metric.timescale.last('1 day').query)
+        self.assertIn('"tests_metric"."time" >= (now() - INTERVAL 1 day)', sql)
+
+    def test_bounded_queries_pass(self):
+        Metric.timescale.last('1 day').time_bucket('time', '1 hour')._check_time_bound()
+        Metric.timescale.filter(device=1).unbounded()._check_time_bound()
+
+    def test_unbounded_query_raises(self):
+        with self.assertRaises(UnboundedTimeRangeError):
+            list(Metric.timescale.filter(device=1).time_bucket('time', '1 hour'))
+        with self.assertRaises(UnboundedTimeRangeError):
+            Metric.timescale.filter(Q(device=1) | Q(time__gte=datetime(2024, 1, 1, tzinfo=timezone.utc)))._check_time_bound()
+
+
+class ParallelTest(SimpleTestCase):
+    def hour(self, hour):
+        return datetime(2024, 1, 1, hour, tzinfo=timezone.utc)
+
+    def test_split_time_range_on_chunk_boundaries(self):
+        chunks = [Chunk('public', f'chunk_{hour}', self.hour(hour), self.hour(hour + 1), False) for hour in range(10)]
+        self.assertEqual(split_time_range(chunks, self.hour(2), self.hour(7), 3), [
+            (self.hour(2), self.hour(4)), (self.hour(4), self.hour(6)), (self.hour(6), self.hour(7)),
+        ])
+
+    def test_merge_partial_aggregates(self):
+        queryset = Metric.timescale.time_bucket('time', '1 hour').values('bucket', 'device').annotate(
+            count=Count('id'), first=First('temperature', 'time'), last=Last('temperature', 'time'),
+            max=Max('temperature'),
+        )
+        merge_functions = get_merge_functions(queryset.query)
+        rows = merge_rows([
+            [{'bucket': self.hour(1), 'device': 1, 'count': 2, 'first': 1.0, 'last': 2.0, 'max': 3.0}],
+            [
+                {'bucket': self.hour(1), 'device': 1, 'count': 1, 'first': 5.0, 'last': 6.0, 'max': 4.0},
+                {'bucket': self.hour(2), 'device': 1, 'count': 1, 'first': 7.0, 'last': 7.0, 'max': 7.0},
+            ],
+        ], merge_functions)
+        self.assertEqual(sort_rows(rows, queryset.query.order_by), [
+            {'bucket': self.hour(2), 'device': 1, 'count': 1, 'first': 7.0, 'last': 7.0, 'max': 7.0},
+            {'bucket': self.hour(1), 'device': 1, 'count': 3, 'first': 1.0, 'last': 6.0, 'max': 4.0},
+        ])
+
+    def test_each_worker_reuses_its_connection(self):
+        chunks = [Chunk('public', f'chunk_{hour}', self.hour(hour), self.hour(hour + 1), False) for hour in range(8)]
+        queryset = Metric.timescale.time_bucket('time', '1 hour').annotate(count=Count('id'))
+
+        def execute_sql(compiler, *args, **kwargs):
+            compiler.as_sql()
+            return iter([[(self.hour(0), 1)]])
+        with mock.patch('timescale.db.models.parallel.get_chunks', return_value=chunks), \
+                mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql) as execute, \
+                mock.patch.object(type(connections[DEFAULT_DB_ALIAS]), 'close', autospec=True) as close:
+            rows = queryset.parallel(workers=2, start=self.hour(0), end=self.hour(8))
+        self.assertEqual(rows, [{'bucket': self.hour(0), 'count': 8}])
+        self.assertEqual((execute.call_count, close.call_count), (8, 2))
+
+    def test_parallel_refuses_transactions(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            with self.assertRaises(TransactionManagementError):
+                Metric.timescale.time_bucket('time', '1 hour').annotate(count=Count('id')).parallel()
+
+    def test_unmergeable_aggregate(self):
+        with self.assertRaises(ValueError):
+            get_merge_functions(Metric.timescale.time_bucket('time', '1 hour').annotate(Avg('temperature')).query)
+
+
+class ParseIntervalTest(SimpleTestCase):
+    def test_parse_interval(self):
+        self.assertEqual(parse_interval('20 minutes'), (0, timedelta(minutes=20)))
+        self.assertEqual(parse_interval('1 hour 30 mins'), (0, timedelta(minutes=90)))
+        self.assertEqual(parse_interval('1 year 2 days'), (12, timedelta(days=2)))
+        with self.assertRaises(ValueError):
+            parse_interval('1 fortnight')
+
+
+@override_settings(TIMESCALE_CONTINUOUS_AGGREGATE_ROUTING=True)
+class ContinuousAggregateRoutingTest(SimpleTestCase):
+    def test_same_bucket_reads_continuous_aggregate(self):
+        queryset = Metric.timescale.time_bucket('time', '20 minutes').values('bucket', 'device').annotate(
+            first_temperature=First('temperature', 'time'))
+        plan = queryset.continuous_aggregate_plan()
+        self.assertIs(plan.view.model, MetricAggregate)
+        self.assertFalse(plan.rollup)
+        self.assertEqual(
+            str(plan.queryset.query),
+            'SELECT "tests_metricaggregate"."device" AS "device", '
+            '"tests_metricaggregate"."first_temperature" AS "first_temperature", '
+            '"tests_metricaggregate"."time" AS "bucket" FROM "tests_metricaggregate" ORDER BY 3 DESC'
+        )
+
+    def test_wider_bucket_rolls_up_continuous_aggregate(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        queryset = Metric.timescale.filter(device=1, time__gte=start).time_bucket('time', '1 day').annotate(
+            temperature=Last('temperature', 'time'))
+        plan = queryset.continuous_aggregate_plan()
+        self.assertTrue(plan.rollup)
+        self.assertEqual(
+            str(plan.queryset.query),
+            'SELECT time_bucket(1 day, "tests_metricaggregate"."time") AS "bucket", '
+            'last("tests_metricaggregate"."last_temperature", "tests_metricaggregate"."time") AS "temperature" '
+            'FROM "tests_metricaggregate" WHERE ("tests_metricaggregate"."device" = 1 AND '
+            '"tests_metricaggregate"."time" >= 2024-01-01 00:00:00+00:00) GROUP BY 1 ORDER BY 1 DESC'
+        )
+
+    def test_incompatible_queries_are_not_routed(self):
+        first = First('temperature', 'time')
+        not_routed = [
+            Metric.timescale.time_bucket('time', '30 minutes').annotate(first=first),
+            Metric.timescale.time_bucket('time', '1 day').annotate(Avg('temperature')),
+            Metric.timescale.filter(temperature__gt=1).time_bucket('time', '1 day').annotate(first=first),
+            Metric.timescale.filter(time__gte=datetime(2024, 1, 1, 0, 5, tzinfo=timezone.utc)).time_bucket(
+                'time', '1 day').annotate(first=first),
+            Metric.timescale.time_bucket('time', '1 day').annotate(first=first).use_continuous_aggregates(False),
+        ]
+        for queryset in not_routed:
+            self.assertIsNone(queryset.continuous_aggregate_plan(), queryset.query)
+
+    def test_routing_is_opt_in(self):
+        queryset = Metric.timescale.time_bucket('time', '20 minutes').annotate(first=First('temperature', 'time'))
+        with override_settings(TIMESCALE_CONTINUOUS_AGGREGATE_ROUTING=False):
+            self.assertIsNone(queryset.continuous_aggregate_plan())
+            self.assertIsNotNone(queryset.use_continuous_aggregates().continuous_aggregate_plan())
+            self.assertIsNotNone(queryset.materialized_only().continuous_aggregate_plan())
+
+    def test_count_and_exists_are_routed(self):
+        queryset = Metric.timescale.time_bucket('time', '20 minutes').annotate(first=First('temperature', 'time'))
+        statements = []
+
+        def execute_sql(compiler, *args, **kwargs):
+            statements.append(compiler.as_sql()[0])
+            return (1,) if args and args[0] == 'single' else iter([[(1,)]])
+        with mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql):
+            queryset.count()
+            queryset.exists()
+        self.assertEqual(len(statements), 2)
+        for sql in statements:
+            self.assertIn('FROM "tests_metricaggregate"', sql)
+
+    def test_views_are_cleared_when_models_are_registered(self):
+        from timescale.db.models.routing import get_views
+        get_views()
+        with isolate_apps('timescale.tests'):
+            type('Other', (models.Model,), {'__module__': 'timescale.tests.models'})
+        self.assertEqual(get_views.cache_info().currsize, 0)
+
+    @mock.patch('timescale.db.models.querysets.get_watermark')
+    def test_real_time_reads_raw_rows_after_watermark(self, get_watermark):
+        day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        get_watermark.return_value = day + timedelta(hours=12)
+        queryset = Metric.timescale.filter(time__gte=day).time_bucket('time', '1 day').annotate(
+            last=Last('temperature', 'time'), first=First('temperature', 'time')).real_time()
+        results, statements = iter([[(day, 20.0, 10.0)]]), []
+
+        def execute_sql(compiler, *args, **kwargs):
+            statements.append(compiler.as_sql())
+            return iter([next(results, [(day, 25.0, 15.0)])])
+        with mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql):
+            rows = list(queryset)
+        self.assertEqual(rows, [{'bucket': day, 'last': 25.0, 'first': 10.0}])
+        self.assertIn('"tests_metricaggregate"."time" < %s', statements[0][0])
+        self.assertIn('"tests_metric"."time" >= %s', statements[1][0])
+
+    @mock.patch('timescale.db.models.querysets.get_merge_functions', side_effect=ValueError)
+    @mock.patch('timescale.db.models.querysets.get_watermark')
+    def test_real_time_concatenates_buckets_of_the_aggregate(self, get_watermark, get_merge_functions):
+        day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        get_watermark.return_value = day + timedelta(minutes=20)
+        queryset = Metric.timescale.time_bucket('time', '20 minutes').annotate(
+            first=First('temperature', 'time')).real_time()
+        results = iter([[(day, 10.0)], [(day + timedelta(minutes=20), 15.0)]])
+
+        def execute_sql(compiler, *args, **kwargs):
+            compiler.as_sql()
+            return iter([next(results)])
+        with mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql):
+            rows = list(queryset)
+        self.assertEqual(rows, [
+            {'bucket': day + timedelta(minutes=20), 'first': 15.0}, {'bucket': day, 'first': 10.0}])
+
+    @skipIf(columnar.np is None, 'numpy is not installed')
+    @mock.patch('timescale.db.models.querysets.get_watermark')
+    def test_real_time_exports_raw_rows_after_watermark(self, get_watermark):
+        day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        get_watermark.return_value = day + timedelta(minutes=20)
+        queryset = Metric.timescale.time_bucket('time', '20 minutes').annotate(
+            first=First('temperature', 'time')).real_time()
+
+        def execute_sql(compiler, *args, **kwargs):
+            sql, _ = compiler.as_sql()
+            if 'tests_metricaggregate' in sql:
+                return iter([[(day, 10.0)]])
+            return iter([[(day + timedelta(minutes=20), 15.0)]])
+        with mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql):
+            arrays = queryset.to_arrays()
+        self.assertEqual(arrays['first'].tolist(), [15.0, 10.0])
+
+    def test_materialized_only_on_aggregate_filters_on_watermark(self):
+        sql, params = MetricAggregate.timescale.materialized_only().query.sql_with_params()
+        self.assertIn('"tests_metricaggregate"."time" < (', sql)
+        self.assertIn('cagg_watermark', sql)
+        self.assertIn("'-infinity'::timestamptz", sql)
+        self.assertEqual(params, ('tests_metricaggregate',))
+        with self.assertRaises(ValueError):
+            MetricAggregate.timescale.real_time()
+
+
+class BucketCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches[DEFAULT_CACHE_ALIAS].clear()
+
+    def hour(self, hour):
+        return datetime(2024, 1, 1, hour, tzinfo=timezone.utc)
+
+    def fetch(self, queryset, rows):
+        statements = []
+
+        def execute_sql(compiler, *args, **kwargs):
+            statements.append(compiler.as_sql())
+            return iter([rows])
+        with mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql):
+            return list(queryset), statements
+
+    def test_only_open_bucket_is_fetched_again(self):
+        queryset = Metric.timescale.time_bucket('time', '1 hour').annotate(Count('id')).cache()
+        rows, _ = self.fetch(queryset, [(self.hour(2), 1), (self.hour(1), 5), (self.hour(0), 5)])
+        self.assertEqual(len(rows), 3)
+        rows, statements = self.fetch(queryset.all(), [(self.hour(3), 1), (self.hour(2), 4)])
+        self.assertEqual(rows, [
+            {'bucket': self.hour(3), 'id__count': 1},
+            {'bucket': self.hour(2), 'id__count': 4},
+            {'bucket': self.hour(1), 'id__count': 5},
+            {'bucket': self.hour(0), 'id__count': 5},
+        ])
+        sql, params = statements[0]
+        self.assertIn('WHERE "tests_metric"."time" >= %s', sql)
+        self.assertIn(self.hour(2), params)
+
+    def test_moving_window_expires_with_the_first_fetch(self):
+        queryset = Metric.timescale.last('3 hours').time_bucket('time', '1 hour').annotate(Count('id')).cache(600)
+        with mock.patch('timescale.db.models.cache.time.time', return_value=1000.0):
+            self.fetch(queryset, [(self.hour(2), 1), (self.hour(1), 5), (self.hour(0), 5)])
+        with mock.patch('timescale.db.models.cache.time.time', return_value=1500.0):
+            rows, _ = self.fetch(queryset.all(), [(self.hour(3), 1), (self.hour(2), 4)])
+        self.assertEqual([row['bucket'] for row in rows], [self.hour(hour) for hour in (3, 2, 1, 0)])
+        with mock.patch('timescale.db.models.cache.time.time', return_value=1600.0):
+            rows, statements = self.fetch(queryset.all(), [(self.hour(4), 1), (self.hour(3), 4), (self.hour(2), 4)])
+        # the entry expired 600 seconds after the first fetch, the buckets that left the window are gone
+        self.assertEqual([row['bucket'] for row in rows], [self.hour(hour) for hour in (4, 3, 2)])
+        self.assertNotIn(self.hour(3), statements[0][1])
+
+    def test_sliced_query_is_sliced_after_the_merge(self):
+        queryset = Metric.timescale.time_bucket('time', '1 hour').annotate(Count('id')).cache()
+        self.fetch(queryset, [(self.hour(2), 1), (self.hour(1), 5), (self.hour(0), 5)])
+        rows, statements = self.fetch(queryset.all()[:2], [(self.hour(3), 1), (self.hour(2), 4)])
+        self.assertEqual(rows, [{'bucket': self.hour(3), 'id__count': 1}, {'bucket': self.hour(2), 'id__count': 4}])
+        self.assertNotIn('LIMIT', statements[0][0])
+
+    def test_time_bucket_since_skips_unchanged_buckets(self):
+        def poll(cursor, rows):
+            def execute_sql(compiler, *args, **kwargs):
+                compiler.as_sql()
+                return iter([rows])
+            with mock.patch.object(SQLCompiler, 'execute_sql', autospec=True, side_effect=execute_sql):
+                return Metric.timescale.time_bucket_since('time', '1 hour', cursor, {'count': Count('id')})
+        rows, cursor = poll(None, [(self.hour(1), 3), (self.hour(0), 5)])
+        self.assertEqual(len(rows), 2)
+        rows, cursor = poll(cursor, [(self.hour(1), 3)])
+        self.assertEqual(rows, [])
+        rows, cursor = poll(cursor, [(self.hour(2), 1), (self.hour(1), 4)])
+        self.assertEqual(rows, [{'bucket': self.hour(2), 'count': 1}, {'bucket': self.hour(1), 'count': 4}])
+        with self.assertRaises(ValueError):
+            poll(cursor + 'x', [])
+
+
+class RefreshTest(SimpleTestCase):
+    def test_windows_are_bucket_aligned(self):
+        start = datetime(2024, 1, 1, 0, 5, tzinfo=timezone.utc)
+        windows = split_refresh_windows(
+            'tests_metricaggregate', start, start + timedelta(hours=1), '20 minutes', '50 minutes')
+        self.assertEqual([(window.start.minute, window.end.minute) for window in windows], [(0, 40), (40, 20)])
+
+    def test_refresh_skips_done_windows(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        done = [RefreshWindow('tests_metricaggregate', start, start + timedelta(days=2))]
+        callback = mock.Mock()
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'cursor') as cursor:
+            windows = MetricAggregate.refresh_continuous_aggregate(
+                start, start + timedelta(days=4), using='default', done=done, callback=callback)
+        execute = cursor.return_value.__enter__.return_value.execute
+        self.assertEqual(windows, [
+            RefreshWindow('tests_metricaggregate', start + timedelta(days=2), start + timedelta(days=4))])
+        execute.assert_called_once_with(
+            'CALL refresh_continuous_aggregate(%s, %s, %s)', ('tests_metricaggregate',) + windows[0][1:])
+        self.assertEqual(callback.call_args[0][0], windows[0])
+
+
+    def test_parallel_workers_reuse_their_connection(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        callback = mock.Mock()
+        with mock.patch.object(type(connections[DEFAULT_DB_ALIAS]), 'cursor') as cursor, \
+                mock.patch.object(type(connections[DEFAULT_DB_ALIAS]), 'close') as close:
+            windows = MetricAggregate.refresh_continuous_aggregate(
+                start, start + timedelta(days=8), using='default', workers=2, callback=callback)
+        self.assertEqual(len(windows), 4)
+        self.assertEqual(cursor.return_value.__enter__.return_value.execute.call_count, 4)
+        self.assertEqual(sorted(call[0][0] for call in callback.call_args_list), windows)
+        # once per worker, not once per window
+        self.assertEqual(close.call_count, 2)
+
+
+class RefreshCommandTest(SimpleTestCase):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def refresh(self, *args, fail=False, **options):
+        windows = [RefreshWindow('tests_metricaggregate', self.start + timedelta(days=day), self.start +
+                                 timedelta(days=day + 2)) for day in (0, 2)]
+
+        def refresh_in_windows(model, start, end, using, window, workers, done, callback):
+            for refresh in windows:
+                if refresh in done:
+                    continue
+                callback(refresh, 1.0)
+                if fail:
+                    raise InterruptedError
+            return windows
+
+        with mock.patch('timescale.db.models.models.refresh_in_windows', side_effect=refresh_in_windows) as refresh:
+            call_command('timescale_refresh', 'tests.MetricAggregate', *args, stdout=mock.Mock(), **options)
+        return windows, refresh.call_args[0]
+
+    def test_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'refresh.json')
+            with self.assertRaises(InterruptedError):
+                self.refresh(checkpoint=path, fail=True)
+            self.assertTrue(os.path.exists(path))
+            windows, (*_, done, _) = self.refresh(checkpoint=path)
+            self.assertEqual(done, windows[:1])
+            self.assertFalse(os.path.exists(path))
+
+    @override_settings(TIME_ZONE='Europe/Paris')
+    def test_naive_bounds_are_in_the_current_time_zone(self):
+        _, (_, start, end, *_) = self.refresh(start='2024-01-01T00:00', end='2024-01-05T00:00+00:00')
+        self.assertEqual(start, datetime(2024, 1, 1, tzinfo=ZoneInfo('Europe/Paris')))
+        self.assertEqual(end, datetime(2024, 1, 5, tzinfo=timezone.utc))
+
+
+class TimePairsPrefetchTest(SimpleTestCase):
+    def test_times_are_merged_by_chunk(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        times = [start, start + timedelta(minutes=5), start + timedelta(minutes=15), start + timedelta(hours=2),
+                 start + timedelta(hours=5), start + timedelta(hours=5, minutes=1)]
+        self.assertEqual(merge_time_ranges(times, timedelta(minutes=10)), [
+            (start, start + timedelta(minutes=15)), (start + timedelta(hours=2),) * 2,
+            (start + timedelta(hours=5), start + timedelta(hours=5, minutes=1)),
+        ])
+        self.assertEqual(merge_time_ranges(times, timedelta(minutes=10), max_ranges=2), [
+            (start, start + timedelta(hours=2)), (start + timedelta(hours=5), start + timedelta(hours=5, minutes=1)),
+        ])
+
+    @override_settings(TIMESCALE_PREFETCH_IN_LIMIT=1)
+    def test_pairs_are_unnested(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        pairs = [(1, start), (2, start + timedelta(minutes=1))]
+        sql, params = filter_time_pairs(Metric.objects.all(), Metric._meta.pk, pairs).query.sql_with_params()
+        self.assertIn(
+            'WHERE ("tests_metric"."time" >= %s AND "tests_metric"."time" <= %s AND (("tests_metric"."id", '
+            '"tests_metric"."time") IN (SELECT * FROM unnest(%s::integer[], %s::timestamp with time zone[]))))', sql)
+        self.assertEqual(sorted(zip(*params[2:])), pairs)
@@ -0,0 +1,476 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from django.db import DEFAULT_DB_ALIAS, InternalError, NotSupportedError, connections, models
+from django.db.migrations.state import ModelState, ProjectState
+from django.db.models.sql.compiler import SQLUpdateCompiler
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import isolate_apps
+from timescale.db.models.advisor import (
+    alter_chunk_interval_operation, get_candidates, get_segment_by_fields, recommend_chunk_interval)
+from timescale.db.migrations.autodetector import TimescaleAutodetector
+from timescale.db.migrations.operations import AlterTimescaleManagers, ReplaceForeignKeyIndex
+from timescale.db.models.expressions import Interval
+from timescale.db.models.fields import TimescaleDateTimeField
+from timescale.db.models.managers import ContinuousAggregateManager
+from timescale.db.models.related import TimescaleRelatedForeignKey
+from timescale.db.models.information import ChunkSize
+from timescale.tests.models import Metric, MetricAggregate, MetricCompressionManager, MetricMaterializedView
+
+
+class HypertableIntrospectionTest(SimpleTestCase):
+    def editor(self, rows, collect_sql=False):
+        connection = connections[DEFAULT_DB_ALIAS]
+        editor = connection.SchemaEditorClass(connection, collect_sql=collect_sql)
+        editor.deferred_sql = []
+        cursor = mock.patch.object(connection, 'cursor').start()
+        cursor.return_value.__enter__.return_value.fetchall.return_value = rows
+        self.addCleanup(mock.patch.stopall)
+        mock.patch.object(editor, 'execute').start()
+        return editor, cursor
+
+    def test_hypertables_are_loaded_once(self):
+        editor, cursor = self.editor([('public', 'tests_metric', 'time')])
+        editor._assert_is_hypertable(Metric)
+        with self.assertRaises(InternalError):
+            editor._assert_is_not_hypertable(Metric)
+        self.assertEqual(cursor.call_count, 1)
+        field = Metric._meta.get_field('time')
+        editor._set_chunk_time_interval(Metric, field)
+        editor._add_policies(Metric)
+        editor._remove_retention_policy(Metric)
+        editor.delete_model(Metric)
+        self.assertIsNone(editor.get_hypertable(Metric))
+        # creating hypertables, e.g. in an initial migration, does not query the metadata again
+        editor._create_hypertable(Metric, field)
+        self.assertEqual(editor.get_hypertable(Metric), ('public', 'tests_metric', 'time'))
+        self.assertEqual(cursor.call_count, 1)
+
+    def test_collected_sql_keeps_assertions(self):
+        editor, cursor = self.editor([], collect_sql=True)
+        editor._assert_is_hypertable(Metric)
+        self.assertIn('RAISE EXCEPTION', editor.execute.call_args[0][0])
+        cursor.assert_not_called()
+
+
+class FreshTableMigrationTest(SimpleTestCase):
+    def migrate(self, dependents=()):
+        connection = connections[DEFAULT_DB_ALIAS]
+        editor = connection.SchemaEditorClass(connection)
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.statements = statements = []
+        cursor = mock.patch.object(connection, 'cursor').start().return_value.__enter__.return_value
+        cursor.fetchone.side_effect = [(start, start + timedelta(minutes=25)), (3,), (None,)]
+        cursor.fetchall.side_effect = [[], [(name,) for name in dependents], []]
+        mock.patch.object(connection.introspection, 'get_constraints', side_effect=lambda cursor, table: {
+            f'{table}_pkey': {'primary_key': True, 'index': True, 'unique': True, 'columns': ['id']}}).start()
+        # transactions are recorded next to the statements, the migration is not atomic
+        mock.patch.object(connection, 'get_autocommit', return_value=True).start()
+        mock.patch.object(connection, 'set_autocommit', side_effect=lambda autocommit, **kwargs: (
+            None if autocommit else statements.append(('BEGIN', ())))).start()
+        mock.patch.object(connection, 'commit', side_effect=lambda: statements.append(('COMMIT', ()))).start()
+        mock.patch.object(editor, 'execute', side_effect=lambda sql, *params: statements.append(
+            (' '.join(str(sql).split()), params))).start()
+        self.addCleanup(mock.patch.stopall)
+        with override_settings(TIMESCALE_MIGRATE_HYPERTABLE_WITH_FRESH_TABLE=True):
+            editor._create_hypertable(Metric, Metric._meta.get_field('time'), should_migrate=True)
+        return start, statements
+
+    def test_rows_are_copied_in_windows_and_changes_replayed_under_lock(self):
+        start, statements = self.migrate()
+        self.assertEqual(statements[:4], [
+            ('CREATE TABLE "tests_metric_new" (LIKE "tests_metric" INCLUDING ALL)', ()),
+            ('ALTER TABLE "tests_metric_new" DROP CONSTRAINT "tests_metric_new_pkey"', ()),
+            ("SELECT create_hypertable( 'tests_metric_new', 'time', chunk_time_interval => interval '10 minutes', "
+             "migrate_data => false)", ()),
+            ('CREATE UNIQUE INDEX IF NOT EXISTS "tests_metric_id_time_d0fd9d7e_uniq" ON "tests_metric_new" ("id", "time")',
+             ()),
+        ])
+        # the old table keeps its primary key while rows are copied
+        self.assertFalse([sql for sql, _ in statements if sql.startswith('ALTER TABLE "tests_metric" ')])
+        position = statements.index(('BEGIN', ()))
+        self.assertEqual([sql.split(' ')[:3] for sql, _ in statements[position:position + 5]], [
+            ['BEGIN'], ['CREATE', 'UNLOGGED', 'TABLE'], ['CREATE', 'FUNCTION', '"tests_metric_log_changes"()'],
+            ['CREATE', 'TRIGGER', '"tests_metric_log_changes"'], ['COMMIT'],
+        ])
+        self.assertIn('ON "tests_metric" FOR EACH ROW', statements[position + 3][0])
+        copy = 'INSERT INTO "tests_metric_new" SELECT * FROM "tests_metric" WHERE "time" >= %s'
+        tail = start + timedelta(minutes=20)
+        self.assertEqual([(sql, params) for sql, params in statements if sql.startswith(copy)], [
+            (copy + ' AND "time" < %s', ((start, start + timedelta(minutes=10)),)),
+            (copy + ' AND "time" < %s', ((start + timedelta(minutes=10), tail),)),
+            (copy, ((tail,),)),
+        ])
+        replay = statements[-9][0]
+        self.assertIn('WHERE id <= 3 ORDER BY id', replay)
+        self.assertIn(
+            'DELETE FROM "tests_metric_new" WHERE ("id", "time") IN '
+            '(((change.old_row)."id", (change.old_row)."time"), ((change.new_row)."id", (change.new_row)."time"))',
+            replay)
+        # the second replay finds no new change
+        self.assertEqual(statements[-10:], [
+            ('BEGIN', ()), (replay, ()), ('COMMIT', ()),
+            ('BEGIN', ()),
+            ('LOCK TABLE "tests_metric" IN EXCLUSIVE MODE', ()),
+            ('DROP FUNCTION "tests_metric_log_changes"() CASCADE', ()),
+            ('DROP TABLE "tests_metric_changes"', ()),
+            ('DROP TABLE "tests_metric"', ()),
+            ('ALTER TABLE "tests_metric_new" RENAME TO "tests_metric"', ()),
+            ('COMMIT', ()),
+        ])
+
+    def test_dependent_views_fail_before_copying(self):
+        with self.assertRaisesMessage(NotSupportedError, 'tests_metric_view depend on it'):
+            self.migrate(dependents=['tests_metric_view'])
+        self.assertEqual(self.statements, [])
+
+
+class ChunkIntervalAdvisorTest(SimpleTestCase):
+    def test_recommendation_fills_memory_fraction(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        chunks = [
+            ChunkSize('_hyper_1_2_chunk', start + timedelta(minutes=10), start + timedelta(minutes=20),
+                      6000, 6 * 2 ** 20, 2 * 2 ** 20, 8 * 2 ** 20),
+            ChunkSize('_hyper_1_1_chunk', start, start + timedelta(minutes=10),
+                      6000, 6 * 2 ** 20, 2 * 2 ** 20, 8 * 2 ** 20),
+        ]
+        # 8 MiB per 10 minutes, 1 GiB * 0.25 is filled in 320 minutes
+        advice = recommend_chunk_interval(Metric, chunks, 2 ** 30, 0.25)
+        self.assertEqual((advice.current, advice.recommended), ('10 minutes', '4 hours'))
+        self.assertEqual(advice.rows_per_second, 10)
+        self.assertEqual(advice.row_bytes, 2 ** 20 / 1000)
+
+    @isolate_apps('timescale.tests')
+    def test_space_partitions_of_a_time_range_add_up(self):
+        class Reading(models.Model):
+            time = TimescaleDateTimeField(interval='10 minutes', partition_by=('device', 4))
+            device = models.IntegerField()
+
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        chunks = [
+            ChunkSize(f'_hyper_1_{index}_chunk', start + timedelta(minutes=minutes),
+                      start + timedelta(minutes=minutes + 10), 1500, 3 * 2 ** 19, 2 ** 19, 2 ** 21)
+            for index, minutes in enumerate([20] * 4 + [10] * 4 + [0] * 2)
+        ]
+        # the 4 partitions write 8 MiB per 10 minutes, the 2 chunks of the oldest range are a partial sample
+        advice = recommend_chunk_interval(Reading, chunks, 2 ** 30, 0.25)
+        self.assertEqual(advice.recommended, '4 hours')
+        self.assertEqual(advice.rows_per_second, 10)
+        self.assertEqual(advice.row_bytes, 2 ** 20 / 1000)
+
+    def test_alter_chunk_interval_operation(self):
+        operation = alter_chunk_interval_operation(Metric, '4 hours')
+        self.assertEqual((operation.model_name, operation.name, operation.field.interval), ('metric', 'time', '4 hours'))
+
+
+class SpacePartitioningTest(SimpleTestCase):
+    def editor(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        mock.patch.object(editor, 'execute').start()
+        mock.patch.object(editor, 'quote_value', side_effect=lambda value: f"'{value}'").start()
+        self.addCleanup(mock.patch.stopall)
+        return editor
+
+    def test_partition_by_is_normalised(self):
+        field = TimescaleDateTimeField(interval='1 day', partition_by=('device', '4'), tablespaces=['disk1'])
+        kwargs = field.deconstruct()[3]
+        self.assertEqual((kwargs['partition_by'], kwargs['tablespaces']), ((('device', 4),), ('disk1',)))
+        self.assertNotIn('partition_by', TimescaleDateTimeField(interval='1 day').deconstruct()[3])
+
+    def test_dimensions_are_altered(self):
+        editor = self.editor()
+        old_field = TimescaleDateTimeField(interval='10 minutes', partition_by=('device', 4), tablespaces=['disk1'])
+        new_field = TimescaleDateTimeField(interval='10 minutes', partition_by=('device', 8), tablespaces=['disk2'])
+        editor._alter_dimensions(Metric, old_field, new_field)
+        self.assertEqual([call[0][0] for call in editor.execute.call_args_list], [
+            "SELECT set_number_partitions('tests_metric', 8, 'device')",
+            "SELECT attach_tablespace('disk2', 'tests_metric', if_not_attached => true)",
+            "SELECT detach_tablespace('disk1', 'tests_metric', if_attached => true)",
+        ])
+        with self.assertRaises(NotSupportedError):
+            editor._alter_dimensions(Metric, new_field, TimescaleDateTimeField(interval='10 minutes'))
+
+
+class CompressionAnalysisTest(SimpleTestCase):
+    def test_candidates_need_enough_rows_per_segment(self):
+        candidates = get_candidates(Metric, 100000, {'device': 50, 'temperature': 90000})
+        self.assertEqual(candidates, [((), ('-time',)), (('device',), ('-time',))])
+        self.assertEqual([field.name for field in get_segment_by_fields(Metric)], ['device'])
+
+    def test_order_by_prefers_fields_uncorrelated_with_time(self):
+        cardinality = {'device': 50, 'site': 20, 'status': 5}
+        correlations = {
+            ('device',): {'site': 0.2, 'status': 0.95}, ('site',): {'device': 0.97, 'status': -0.98},
+            ('status',): {'device': 0.5, 'site': None},
+        }
+        candidates = get_candidates(Metric, 1000000, cardinality, 20, correlations)
+        self.assertIn((('device',), ('site', '-time')), candidates)
+        self.assertIn((('status',), ('site', '-time')), candidates)
+        self.assertEqual([order_by for segment_by, order_by in candidates if segment_by == ('site',)], [('-time',)])
+
+
+class SchemaEditorMixin:
+    """ A schema editor collecting the statements it executes. """
+    def editor(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        mock.patch.object(editor, 'execute').start()
+        # client side binding without a database
+        mock.patch.object(connection.ops, 'compose_sql', side_effect=lambda sql, params: sql % tuple(
+            editor.quote_value(param) for param in params)).start()
+        self.addCleanup(mock.patch.stopall)
+        return editor
+
+    def statements(self, editor):
+        return [' '.join(call[0][0].split()) for call in editor.execute.call_args_list]
+
+
+class PolicyTest(SchemaEditorMixin, SimpleTestCase):
+    def model_state(self, **compression):
+        return ModelState('tests', 'Metric', [('id', models.AutoField(primary_key=True))], managers=[
+            ('objects', models.Manager()),
+            ('compression', MetricCompressionManager(**compression)),
+        ])
+
+    def test_settings_are_deconstructed(self):
+        manager = MetricCompressionManager(compress_after=Interval('7 days'))
+        kwargs = manager.deconstruct()[4]
+        self.assertEqual((kwargs['compress_after'], kwargs['segment_by']), (Interval('7 days'), ['device']))
+        self.assertEqual(manager, MetricCompressionManager(**kwargs))
+        self.assertNotEqual(manager, MetricCompressionManager())
+        with self.assertRaises(TypeError):
+            MetricCompressionManager(drop_after=Interval('1 day'))
+
+    def test_policies_are_added(self):
+        editor = self.editor()
+        editor._add_policies(Metric)
+        compression, retention = self.statements(editor)
+        self.assertEqual(
+            compression,
+            'ALTER TABLE "tests_metric" SET (timescaledb.compress=true, '
+            'timescaledb.compress_orderby = \'"time" ASC\', timescaledb.compress_segmentby = \'"device"\', '
+            'timescaledb.compress_chunk_time_interval = \'1 hour\')'
+        )
+        self.assertRegex(
+            retention,
+            r"^SELECT add_retention_policy\( 'tests_metric' , drop_after => interval '1 day' , "
+            r"schedule_interval => interval '1 hour' , initial_start => '[^']+'::timestamptz , timezone => 'UTC' , "
+            r"if_not_exists => true \)$"
+        )
+
+    def test_changed_policy_is_replaced(self):
+        editor = self.editor()
+        from_state, to_state = ProjectState(), ProjectState()
+        from_state.add_model(self.model_state())
+        to_state.add_model(self.model_state(compress_after=Interval('7 days')))
+        operation = AlterTimescaleManagers('Metric', to_state.models['tests', 'metric'].managers)
+        operation.database_forwards('tests', editor, from_state, to_state)
+        self.assertEqual(self.statements(editor), [
+            "SELECT remove_compression_policy('tests_metric', if_exists => true)",
+            "SELECT add_compression_policy( 'tests_metric' , compress_after => interval '7 days' , "
+            "schedule_interval => interval '2 hours' , if_not_exists => true )",
+        ])
+
+    def test_autodetector_emits_policy_operation(self):
+        from_state, to_state = ProjectState(), ProjectState()
+        from_state.add_model(self.model_state())
+        to_state.add_model(self.model_state(compress_after=Interval('7 days')))
+        changes = TimescaleAutodetector(from_state, to_state)._detect_changes()
+        self.assertIsInstance(changes['tests'][0].operations[0], AlterTimescaleManagers)
+
+
+class ContinuousAggregateTest(SchemaEditorMixin, SimpleTestCase):
+
+    def test_view_is_created_from_queryset(self):
+        editor = self.editor()
+        editor.create_model(MetricAggregate)
+        create, compression, retention = self.statements(editor)
+        self.assertEqual(
+            create,
+            'CREATE MATERIALIZED VIEW "tests_metricaggregate" ("time", "device", "first_temperature", '
+            '"last_temperature") WITH ( timescaledb.continuous , timescaledb.materialized_only = true, '
+            'timescaledb.create_group_indexes = false, timescaledb.finalized = false ) AS SELECT '
+            'time_bucket(\'20 minutes\', "tests_metric"."time") AS "bucket", "tests_metric"."device" AS "device", '
+            'first("tests_metric"."temperature", "tests_metric"."time") AS "first_temperature", '
+            'last("tests_metric"."temperature", "tests_metric"."time") AS "last_temperature" '
+            'FROM "tests_metric" GROUP BY 2, 1 WITH NO DATA'
+        )
+        self.assertTrue(compression.startswith('ALTER MATERIALIZED VIEW "tests_metricaggregate" SET'))
+        self.assertEqual(connections[DEFAULT_DB_ALIAS].ops.compose_sql.call_args[0][1], ('20 minutes',))
+        editor.delete_model(MetricAggregate)
+        self.assertEqual(self.statements(editor)[-1], 'DROP MATERIALIZED VIEW "tests_metricaggregate"')
+
+    def test_finalized_is_only_sent_when_disabled(self):
+        editor = self.editor()
+        with mock.patch.object(MetricMaterializedView, 'finalized', True):
+            editor.create_model(MetricAggregate)
+        self.assertIn(
+            'timescaledb.materialized_only = true, timescaledb.create_group_indexes = false ) AS',
+            self.statements(editor)[0])
+        self.assertTrue(ContinuousAggregateManager.finalized)
+
+    def test_refresh_policy_is_added(self):
+        editor = self.editor()
+        manager = MetricMaterializedView(
+            start_offset=Interval('1 day'), end_offset=None, schedule_interval=Interval('1 hour'))
+        editor._add_refresh_policy(MetricAggregate, manager)
+        self.assertEqual(self.statements(editor), [
+            "SELECT add_continuous_aggregate_policy( 'tests_metricaggregate' , start_offset => interval '1 day' , "
+            "end_offset => NULL , schedule_interval => interval '1 hour' , if_not_exists => true )",
+        ])
+
+
+class DailyMaterializedView(ContinuousAggregateManager):
+    finalized = True
+
+    def create_materialized_view(self):
+        return MetricAggregate.timescale.time_bucket('time', '1 day').values('bucket', 'device')
+
+
+class HierarchicalContinuousAggregateTest(SchemaEditorMixin, SimpleTestCase):
+
+    def test_source_is_created_first(self):
+        to_state = ProjectState()
+        to_state.add_model(ModelState.from_model(MetricAggregate))
+        to_state.add_model(ModelState('tests', 'DailyAggregate', [
+            ('time', TimescaleDateTimeField(interval='28 days', primary_key=True)),
+            ('device', models.IntegerField()),
+        ], managers=[('continuous_aggregate', DailyMaterializedView())]))
+        changes = TimescaleAutodetector(ProjectState(), to_state)._detect_changes()
+        self.assertEqual([operation.name for operation in changes['tests'][0].operations],
+                         ['MetricAggregate', 'DailyAggregate'])
+
+    def test_source_must_be_finalized_with_whole_buckets(self):
+        editor = self.editor()
+        manager = DailyMaterializedView()
+        with self.assertRaisesRegex(NotSupportedError, 'must be finalized'):
+            editor._check_continuous_aggregate_source(MetricAggregate, manager, MetricAggregate, '1 day')
+        with mock.patch.object(MetricMaterializedView, 'finalized', True):
+            editor._check_continuous_aggregate_source(MetricAggregate, manager, MetricAggregate, '1 day')
+            with self.assertRaisesRegex(NotSupportedError, 'not a multiple'):
+                editor._check_continuous_aggregate_source(MetricAggregate, manager, MetricAggregate, '30 minutes')
+
+
+class TimeJoinIndexTest(SchemaEditorMixin, SimpleTestCase):
+
+    @isolate_apps('timescale.tests')
+    def test_both_sides_of_the_join_are_indexed(self):
+        class Run(models.Model):
+            time = TimescaleDateTimeField(interval='1 day', partition_by=('device', 4))
+            device = models.IntegerField()
+
+        class Sample(models.Model):
+            time = TimescaleDateTimeField(interval='1 day')
+            run = TimescaleRelatedForeignKey(Run, models.CASCADE)
+
+        editor = self.editor()
+        editor._create_time_join_indexes(Sample, Sample._meta.get_field('run'))
+        sample_index, run_index = self.statements(editor)
+        self.assertRegex(sample_index, r'^CREATE INDEX IF NOT EXISTS "tests_sample_run_id_time_\w+_time" '
+                                       r'ON "tests_sample" \("run_id", "time"\)$')
+        self.assertRegex(run_index, r'^CREATE UNIQUE INDEX IF NOT EXISTS "tests_run_id_time_device_\w+_uniq" '
+                                    r'ON "tests_run" \("id", "time", "device"\)$')
+
+    @isolate_apps('timescale.tests')
+    def test_join_index_replaces_the_key_index(self):
+        class Run(models.Model):
+            time = TimescaleDateTimeField(interval='1 day')
+
+        class Sample(models.Model):
+            recorded = TimescaleDateTimeField(interval='1 day')
+            time = models.DateTimeField()
+            run = TimescaleRelatedForeignKey(Run, models.CASCADE)
+
+        field = Sample._meta.get_field('run')
+        self.assertFalse(field.db_index)
+        self.assertIs(field.deconstruct()[3]['db_index'], False)
+        self.assertNotIn('db_index', TimescaleRelatedForeignKey(Run, models.CASCADE, db_index=True).deconstruct()[3])
+        editor = self.editor()
+        editor._create_time_join_indexes(Sample, field)
+        self.assertRegex(self.statements(editor)[0], r'ON "tests_sample" \("run_id", "recorded"\)$')
+
+    @isolate_apps('timescale.tests')
+    def test_operation_replaces_the_key_index(self):
+        class Run(models.Model):
+            time = TimescaleDateTimeField(interval='1 day')
+
+        class Sample(models.Model):
+            time = TimescaleDateTimeField(interval='1 day')
+            run = TimescaleRelatedForeignKey(Run, models.CASCADE)
+
+        operation = ReplaceForeignKeyIndex('sample', 'run')
+        state = mock.Mock()
+        state.apps.get_model.return_value = Sample
+        editor = self.editor()
+        operation.database_forwards('tests', editor, state, state)
+        drop, sample_index, run_index = self.statements(editor)
+        self.assertRegex(drop, r'^DROP INDEX IF EXISTS "tests_sample_run_id_\w+"$')
+        self.assertRegex(sample_index, r'^CREATE INDEX IF NOT EXISTS "tests_sample_run_id_time_\w+_time" ')
+        editor = self.editor()
+        operation.database_backwards('tests', editor, state, state)
+        create, drop_join = self.statements(editor)
+        self.assertEqual(create, f'CREATE INDEX IF NOT EXISTS {drop.split()[-1]} ON "tests_sample" ("run_id")')
+        self.assertEqual(drop_join, f'DROP INDEX IF EXISTS {sample_index.split()[5]}')
+
+    @isolate_apps('timescale.tests')
+    def test_altering_an_indexed_key_replaces_its_index(self):
+        class Run(models.Model):
+            time = TimescaleDateTimeField(interval='1 day')
+
+        class Sample(models.Model):
+            time = TimescaleDateTimeField(interval='1 day')
+            run = models.ForeignKey(Run, models.CASCADE)
+
+        old_field = Sample._meta.get_field('run')
+        new_field = TimescaleRelatedForeignKey(Run, models.CASCADE)
+        new_field.set_attributes_from_name('run')
+        new_field.model = Sample
+        editor = self.editor()
+        with mock.patch('django.db.backends.base.schema.BaseDatabaseSchemaEditor.alter_field') as alter_field:
+            editor.alter_field(Sample, old_field, new_field)
+        alter_field.assert_called_once()
+        sample_index, run_index = self.statements(editor)
+        self.assertRegex(sample_index, r'^CREATE INDEX IF NOT EXISTS "tests_sample_run_id_time_\w+_time" ')
+        # fields of the same class only get the index when it replaces the single column one
+        editor = self.editor()
+        with mock.patch('django.db.backends.base.schema.BaseDatabaseSchemaEditor.alter_field'):
+            editor.alter_field(Sample, new_field, new_field)
+        self.assertEqual(self.statements(editor), [])
+
+
+class PrimaryKeyTest(SchemaEditorMixin, SimpleTestCase):
+
+    def test_primary_key_is_replaced_by_unique_key_time_index(self):
+        editor = self.editor()
+        editor._drop_primary_key(Metric, Metric._meta.get_field('time'))
+        drop, index = self.statements(editor)
+        self.assertEqual(drop, 'ALTER TABLE "tests_metric" DROP CONSTRAINT "tests_metric_pkey"')
+        self.assertRegex(index, r'^CREATE UNIQUE INDEX IF NOT EXISTS "tests_metric_id_time_\w+_uniq" '
+                                r'ON "tests_metric" \("id", "time"\)$')
+
+    @isolate_apps('timescale.tests')
+    def test_composite_primary_key_with_time_is_kept(self):
+        class Reading(models.Model):
+            pk = models.CompositePrimaryKey('device', 'time')
+            device = models.IntegerField()
+            time = TimescaleDateTimeField(interval='1 day')
+
+        editor = self.editor()
+        editor._drop_primary_key(Reading, Reading._meta.get_field('time'))
+        self.assertEqual(self.statements(editor), [])
+
+    def test_update_filters_on_saved_time(self):
+        time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        metric = Metric.from_db('default', ['id', 'time', 'temperature', 'device'], [1, time, 20.0, 1])
+        metric.time = time + timedelta(hours=1)
+        statements = []
+
+        def execute_sql(compiler, *args, **kwargs):
+            statements.append(compiler.as_sql())
+            return 1
+        with mock.patch.object(SQLUpdateCompiler, 'execute_sql', autospec=True, side_effect=execute_sql):
+            metric.save()
+        sql, params = statements[0]
+        self.assertTrue(sql.endswith('WHERE ("tests_metric"."time" = %s AND "tests_metric"."id" = %s)'))
+        self.assertEqual(params[-2:], (time, 1))
+        self.assertEqual(metric._saved_time, time + timedelta(hours=1))
@@ -3,7 +3,8 @@
 SECRET_KEY = 'fake-key'
 
 INSTALLED_APPS = [
-    'timescale.tests'
+    'timescale',
+    'timescale.tests',
 ]
 
 DATABASES = {